@@ -84,8 +84,13 @@ from agents import (
     LongRunningAgent,
     MultiAgentOrchestrator,
     AgentPattern,
+    PlanResult,
     InMemorySessionService,
+    RemoteSessionService,
     MemoryBank,
+    MemoryLimits,
+    SQLiteBackend,
+    ShardedFileBackend,
     ObservabilitySystem,
     AgentEvaluator,
     A2AProtocol,
@@ -96,12 +101,56 @@ from agents.tools.mcp_tools import MCPToolRegistry, MCPWeatherTool, MCPCropRecom
 from agents.tools.openapi_tools import OpenAPIToolRegistry, OpenAPIWeatherTool, OpenAPICropTool
 
 
+def _env_limit(name: str, cast=int):
+    """Optional numeric limit from the environment; unset means no limit"""
+    value = os.getenv(name)
+    return cast(value) if value else None
+
+
 @st.cache_resource
 def initialize_agent_system():
     """Initialize the multi-agent system (cached for performance)"""
     # Initialize core components
-    memory_bank = MemoryBank(storage_path="data/memory_bank.json")
-    session_service = InMemorySessionService(memory_bank=memory_bank)
+    # Replicas sharing ./data need the multi-process SQLite engine (MEMORY_BACKEND=sqlite);
+    # it is also used whenever sessions live in a shared session store
+    session_store = os.getenv("SESSION_STORE")
+    if os.getenv("MEMORY_BACKEND", "sharded") == "sqlite" or session_store:
+        memory_backend = SQLiteBackend("data/memory_bank.db")
+    else:
+        memory_backend = ShardedFileBackend("data/memory_shards", legacy_path="data/memory_bank.json")
+    # Memory is unbounded unless limits are configured; evicted entries are only
+    # kept (in a SQLite spill store) when MEMORY_SPILL_DB is set
+    spill_db = os.getenv("MEMORY_SPILL_DB")
+    memory_bank = MemoryBank(
+        backend=memory_backend,
+        limits=MemoryLimits(
+            max_entries_per_session=_env_limit("MEMORY_MAX_ENTRIES_PER_SESSION"),
+            max_total_entries=_env_limit("MEMORY_MAX_TOTAL_ENTRIES"),
+            ttl_seconds=_env_limit("MEMORY_TTL_SECONDS", float),
+            policy=os.getenv("MEMORY_EVICTION_POLICY", "lru")
+        ),
+        spill_backend=SQLiteBackend(spill_db) if spill_db else None,
+        consolidation_interval=300.0
+    )
+    # Replicas behind a load balancer share sessions through a session store server
+    # (python -m agents.session_server); SESSION_STORE is its tcp:// or unix:// address,
+    # and tcp:// needs the same SESSION_STORE_KEY on the server and every replica.
+    # Context memory comes from this replica's memory bank, the one agents write to
+    if session_store:
+        store_key = os.getenv("SESSION_STORE_KEY")
+        session_service = RemoteSessionService(
+            session_store,
+            auth_key=store_key.encode("utf-8") if store_key else None,
+            memory_bank=memory_bank
+        )
+    else:
+        session_service = InMemorySessionService(
+            memory_bank=memory_bank,
+            token_budget=3000,
+            hibernate_dir="data/sessions",
+            hibernate_after=900,
+            max_resident=5000
+        )
     observability = ObservabilitySystem(log_level="INFO")
     evaluator = AgentEvaluator()
     a2a_protocol = A2AProtocol()
@@ -115,9 +164,10 @@ def initialize_agent_system():
     # Create agents
     chat_agent = ChatAgent(
         agent_id="chat_agent",
-        api_key=gemini_api_key
+        api_key=gemini_api_key,
+        memory_bank=memory_bank
     )
-    crop_agent = CropRecommendationAgent(agent_id="crop_agent")
+    crop_agent = CropRecommendationAgent(agent_id="crop_agent", memory_bank=memory_bank)
     disease_agent = DiseaseDetectionAgent(agent_id="disease_agent")
     long_running_agent = LongRunningAgent(
         agent_id="long_running_agent",
@@ -235,7 +285,15 @@ def process_with_agents(
         )
         
         # Extract final response
-        if isinstance(results, list):
+        if isinstance(results, PlanResult):
+            # DAG execution - the last node combines the others' outputs
+            final_response = results.final.content
+            agent_system["observability"].record_metric(
+                "critical_path_ms",
+                results.critical_path_ms,
+                tags={"path": " -> ".join(results.critical_path)}
+            )
+        elif isinstance(results, list):
             final_response = results[-1].content if results else "No response generated"
         elif isinstance(results, dict):
             # Parallel execution - combine results
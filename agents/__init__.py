@@ -7,8 +7,19 @@ from .crop_agent import CropRecommendationAgent
 from .disease_agent import DiseaseDetectionAgent
 from .long_running_agent import LongRunningAgent
 from .orchestrator import MultiAgentOrchestrator, AgentPattern
+from .execution_plan import ExecutionPlan, PlanNode, PlanResult
 from .session_manager import InMemorySessionService
+from .conversation_history import ConversationHistory
+from .context_compaction import ContextCompactor, ExtractiveSummarizer
+from .session_hibernation import SessionHibernator
+from .session_server import SessionStoreServer, RemoteSessionService
 from .memory_bank import MemoryBank
+from .memory_backends import MemoryBackend, InMemoryBackend, ShardedFileBackend, SQLiteBackend
+from .memory_eviction import MemoryLimits, EvictionPolicy, LRUPolicy, LFUPolicy, TTLPolicy
+from .memory_retrieval import MemoryRetriever
+from .memory_indexes import HashIndex, SortedIndex
+from .memory_consolidation import MemoryConsolidator
+from .serialization import Serializer, get_serializer
 from .observability import ObservabilitySystem
 from .evaluation import AgentEvaluator
 from .a2a_protocol import A2AProtocol, MessageType
@@ -24,8 +35,32 @@ __all__ = [
     "LongRunningAgent",
     "MultiAgentOrchestrator",
     "AgentPattern",
+    "ExecutionPlan",
+    "PlanNode",
+    "PlanResult",
     "InMemorySessionService",
+    "ConversationHistory",
+    "ContextCompactor",
+    "ExtractiveSummarizer",
+    "SessionHibernator",
+    "SessionStoreServer",
+    "RemoteSessionService",
     "MemoryBank",
+    "MemoryBackend",
+    "InMemoryBackend",
+    "ShardedFileBackend",
+    "SQLiteBackend",
+    "MemoryLimits",
+    "EvictionPolicy",
+    "LRUPolicy",
+    "LFUPolicy",
+    "TTLPolicy",
+    "MemoryRetriever",
+    "HashIndex",
+    "SortedIndex",
+    "MemoryConsolidator",
+    "Serializer",
+    "get_serializer",
     "ObservabilitySystem",
     "AgentEvaluator",
     "A2AProtocol",
@@ -6,6 +6,7 @@ from abc import ABC, abstractmethod
 from typing import Dict, List, Any, Optional
 from dataclasses import dataclass, field
 from datetime import datetime
+import asyncio
 import json
 import logging
 from enum import Enum
@@ -51,6 +52,18 @@ class AgentContext:
     conversation_history: List[Dict[str, Any]] = field(default_factory=list)
     memory: Dict[str, Any] = field(default_factory=dict)
     state: Dict[str, Any] = field(default_factory=dict)
+    # Bank behind a read-only memory view; memory writes go through it
+    memory_bank: Any = field(default=None, repr=False, compare=False)
+    
+    def __reduce__(self):
+        # Session services hand out live read-only views; pickle plain snapshots instead
+        return (AgentContext, (
+            self.session_id,
+            self.user_id,
+            list(self.conversation_history),
+            dict(self.memory),
+            dict(self.state)
+        ))
 
 
 class BaseAgent(ABC):
@@ -116,6 +129,15 @@ class BaseAgent(ABC):
         """
         pass
     
+    async def aprocess(self, message: AgentMessage, context: AgentContext) -> AgentMessage:
+        """
+        Async counterpart of process
+        By default runs the synchronous process in the event loop's executor;
+        agents doing async I/O (e.g. LLM calls) override it so they hold no thread
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.process, message, context)
+    
     def execute_tool(self, tool_name: str, parameters: Dict[str, Any]) -> Any:
         """Execute a tool by name"""
         self.log_trace("tool_execution_start", {
@@ -142,19 +164,33 @@ class BaseAgent(ABC):
         
         raise ValueError(f"Tool '{tool_name}' not found")
     
+    def _memory_bank_for(self, context: AgentContext) -> Any:
+        """The agent's memory bank, else the one behind the context's memory view"""
+        return self.memory_bank or context.memory_bank
+    
     def get_memory(self, key: str, context: AgentContext) -> Any:
         """Retrieve memory from memory bank"""
-        if self.memory_bank:
-            return self.memory_bank.get(context.session_id, key)
+        memory_bank = self._memory_bank_for(context)
+        if memory_bank:
+            return memory_bank.get(context.session_id, key)
         return context.memory.get(key)
     
     def store_memory(self, key: str, value: Any, context: AgentContext):
         """Store memory in memory bank"""
-        if self.memory_bank:
-            self.memory_bank.store(context.session_id, key, value)
+        memory_bank = self._memory_bank_for(context)
+        if memory_bank:
+            memory_bank.store(context.session_id, key, value)
         else:
             context.memory[key] = value
     
+    def store_memories(self, items: Dict[str, Any], context: AgentContext):
+        """Store several memories in one batch"""
+        memory_bank = self._memory_bank_for(context)
+        if memory_bank:
+            memory_bank.store_many(context.session_id, items)
+        else:
+            context.memory.update(items)
+    
     def pause(self):
         """Pause agent execution (for long-running operations)"""
         if self.state == AgentState.RUNNING:
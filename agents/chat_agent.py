@@ -1,6 +1,7 @@
 """
 Chat Agent - LLM-powered conversational agent for agricultural queries
 """
+import asyncio
 import uuid
 from google.genai import types
 from google.adk.agents import LlmAgent
@@ -12,10 +13,11 @@ from google.adk.tools.mcp_tool.mcp_session_manager import StdioConnectionParams
 from mcp import StdioServerParameters
 from google.adk.apps.app import App, ResumabilityConfig
 from google.adk.tools.function_tool import FunctionTool
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple
 import google.generativeai as genai
 from agents.base_agent import BaseAgent, AgentMessage, AgentContext, AgentState
 from agents.tools.builtin_tools import GoogleSearchTool, CalculatorTool
+from agents.memory_retrieval import rank_memories
 
 print("✅ ADK components imported successfully.")
 
@@ -31,7 +33,10 @@ class ChatAgent(BaseAgent):
         agent_id: str = "chat_agent",
         llm_model: Any = None,
         api_key: str = None,
-        tools: list = None
+        tools: list = None,
+        memory_bank: Any = None,
+        memory_top_k: int = 5,
+        memory_token_budget: int = 400
     ):
         # Initialize LLM using google-generativeai
         # Always use GenerativeModel, not ADK Gemini class
@@ -59,89 +64,123 @@ class ChatAgent(BaseAgent):
             agent_id=agent_id,
             agent_name="Agricultural Chat Assistant",
             llm_model=llm_model,
-            tools=tools
+            tools=tools,
+            memory_bank=memory_bank
         )
+        
+        # Prompt memory is chosen by relevance to the user message, not insertion order
+        self.memory_top_k = memory_top_k
+        self.memory_token_budget = memory_token_budget
     
     def process(self, message: AgentMessage, context: AgentContext) -> AgentMessage:
         """Process chat message and generate response"""
+        start_time = __import__('time').time()
+        try:
+            prompt = self._begin(message, context)
+            response_text = self._generate(prompt)
+            return self._complete(message, context, response_text, start_time)
+        except Exception as e:
+            return self._fail(message, context, e)
+    
+    async def aprocess(self, message: AgentMessage, context: AgentContext) -> AgentMessage:
+        """Async variant of process; the LLM call is awaited instead of blocking a thread"""
+        start_time = __import__('time').time()
+        try:
+            prompt = self._begin(message, context)
+            response_text = await self._agenerate(prompt)
+            return self._complete(message, context, response_text, start_time)
+        except Exception as e:
+            return self._fail(message, context, e)
+    
+    def _begin(self, message: AgentMessage, context: AgentContext) -> str:
+        """Mark the request as started and build its prompt"""
         self.state = AgentState.RUNNING
         self.update_metrics("total_requests", 1)
         
-        start_time = __import__('time').time()
+        self.log_trace("chat_processing_start", {
+            "message": message.content[:100],
+            "session_id": context.session_id
+        })
         
-        try:
-            self.log_trace("chat_processing_start", {
-                "message": message.content[:100],
-                "session_id": context.session_id
-            })
-            
-            # Get conversation history from context
-            conversation_history = context.conversation_history[-10:]  # Last 10 messages
-            
-            # Build prompt with context
-            prompt = self._build_prompt(message.content, conversation_history, context)
-            
-            # Generate response using LLM
-            if self.llm_model:
-                # Ensure we're using GenerativeModel with generate_content method
-                if hasattr(self.llm_model, 'generate_content'):
-                    response = self.llm_model.generate_content(prompt)
-                    response_text = response.text
-                else:
-                    # Fallback if wrong model type is passed
-                    response_text = "Error: LLM model is not properly configured. Please provide a valid API key."
-                    self.log_trace("llm_model_error", {"error": "Model does not have generate_content method"})
-            else:
-                response_text = "I'm a chat agent. Please configure the LLM model to get responses."
-            
-            # Enhanced tool integration - only use real tools, filter out demo content
-            # Use tools for calculations and real-time data, but skip demo search results
-            if any(keyword in message.content.lower() for keyword in ['calculate', 'compute', 'roi', 'profit', 'cost']):
-                try:
-                    # Use calculator for financial analysis
-                    if 'calculate' in message.content.lower() or 'compute' in message.content.lower():
-                        # Extract calculation expressions if present
-                        import re
-                        calc_expressions = re.findall(r'[\d+\-*/().\s]+', message.content)
-                        if calc_expressions:
-                            calc_result = self.execute_tool("calculator", {"expression": calc_expressions[0]})
-                            if calc_result.get("success"):
-                                response_text += f"\n\n**Quick Calculation**: {calc_result.get('result')}\n"
-                except:
-                    pass
-            
-            # Remove any demo/placeholder content that might have been generated
-            response_text = self._clean_demo_content(response_text)
-            
-            response_time = __import__('time').time() - start_time
-            self.update_metrics("average_response_time", response_time)
-            self.update_metrics("successful_requests", 1)
-            
-            self.log_trace("chat_processing_success", {
-                "response_length": len(response_text),
-                "response_time": response_time
-            })
-            
-            self.state = AgentState.COMPLETED
-            
-            return AgentMessage(
-                sender=self.agent_id,
-                receiver=message.sender,
-                content=response_text,
-                session_id=context.session_id
-            )
-            
-        except Exception as e:
-            self.state = AgentState.ERROR
-            self.update_metrics("failed_requests", 1)
-            self.log_trace("chat_processing_error", {"error": str(e)})
-            
-            return AgentMessage(
-                sender=self.agent_id,
-                receiver=message.sender,
-                content=f"I encountered an error: {str(e)}",
-                session_id=context.session_id
-            )
+        # Get conversation history from context
+        conversation_history = context.conversation_history[-10:]  # Last 10 messages
+        
+        # Build prompt with context
+        return self._build_prompt(message.content, conversation_history, context)
+    
+    def _generate(self, prompt: str) -> str:
+        """Generate response using LLM"""
+        if not self.llm_model:
+            return "I'm a chat agent. Please configure the LLM model to get responses."
+        
+        # Ensure we're using GenerativeModel with generate_content method
+        if hasattr(self.llm_model, 'generate_content'):
+            response = self.llm_model.generate_content(prompt)
+            return response.text
+        
+        # Fallback if wrong model type is passed
+        self.log_trace("llm_model_error", {"error": "Model does not have generate_content method"})
+        return "Error: LLM model is not properly configured. Please provide a valid API key."
+    
+    async def _agenerate(self, prompt: str) -> str:
+        """Generate response using the LLM's async API, falling back to a worker thread"""
+        if self.llm_model and hasattr(self.llm_model, 'generate_content_async'):
+            response = await self.llm_model.generate_content_async(prompt)
+            return response.text
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._generate, prompt)
+    
+    def _complete(self, message: AgentMessage, context: AgentContext, response_text: str, start_time: float) -> AgentMessage:
+        """Post-process the LLM output and record metrics"""
+        # Enhanced tool integration - only use real tools, filter out demo content
+        # Use tools for calculations and real-time data, but skip demo search results
+        if any(keyword in message.content.lower() for keyword in ['calculate', 'compute', 'roi', 'profit', 'cost']):
+            try:
+                # Use calculator for financial analysis
+                if 'calculate' in message.content.lower() or 'compute' in message.content.lower():
+                    # Extract calculation expressions if present
+                    import re
+                    calc_expressions = re.findall(r'[\d+\-*/().\s]+', message.content)
+                    if calc_expressions:
+                        calc_result = self.execute_tool("calculator", {"expression": calc_expressions[0]})
+                        if calc_result.get("success"):
+                            response_text += f"\n\n**Quick Calculation**: {calc_result.get('result')}\n"
+            except:
+                pass
+        
+        # Remove any demo/placeholder content that might have been generated
+        response_text = self._clean_demo_content(response_text)
+        
+        response_time = __import__('time').time() - start_time
+        self.update_metrics("average_response_time", response_time)
+        self.update_metrics("successful_requests", 1)
+        
+        self.log_trace("chat_processing_success", {
+            "response_length": len(response_text),
+            "response_time": response_time
+        })
+        
+        self.state = AgentState.COMPLETED
+        
+        return AgentMessage(
+            sender=self.agent_id,
+            receiver=message.sender,
+            content=response_text,
+            session_id=context.session_id
+        )
+    
+    def _fail(self, message: AgentMessage, context: AgentContext, error: Exception) -> AgentMessage:
+        """Record a failed request and build the error reply"""
+        self.state = AgentState.ERROR
+        self.update_metrics("failed_requests", 1)
+        self.log_trace("chat_processing_error", {"error": str(error)})
+        
+        return AgentMessage(
+            sender=self.agent_id,
+            receiver=message.sender,
+            content=f"I encountered an error: {str(error)}",
+            session_id=context.session_id
+        )
     
     def _format_search_results(self, search_result: Dict[str, Any]) -> str:
         """Format search results in a readable way - filters out demo/placeholder content"""
@@ -232,14 +271,21 @@ RESPONSE STRUCTURE:
 
 """
         
-        # Add memory context if available
-        if context.memory:
+        # Add the memories most relevant to this message
+        memories = self._select_memories(user_message, context)
+        if memories:
             prompt += "**LEARNED CONTEXT FROM PREVIOUS INTERACTIONS:**\n"
-            for key, value in list(context.memory.items())[:5]:
+            for key, value in memories:
                 prompt += f"- {key}: {value}\n"
             prompt += "\n"
         
+        # Add the rolling summary of turns folded out of the history
+        summary = getattr(context.conversation_history, "summary", None)
+        if summary:
+            prompt += f"**EARLIER CONVERSATION SUMMARY:**\n{summary.get('content', '')}\n\n"
+        
         # Add conversation history for continuity
+        history = [msg for msg in history if not msg.get("metadata", {}).get("summary")]
         if history:
             prompt += "**CONVERSATION HISTORY:**\n"
             for msg in history[-5:]:
@@ -263,6 +309,26 @@ Begin your response:"""
         
         return prompt
     
+    def _select_memories(self, user_message: str, context: AgentContext) -> List[Tuple[str, Any]]:
+        """Top-k memories for the user message within the prompt token budget"""
+        if self.memory_bank is not None and hasattr(self.memory_bank, "retrieve"):
+            memories = self.memory_bank.retrieve(
+                context.session_id,
+                user_message,
+                top_k=self.memory_top_k,
+                token_budget=self.memory_token_budget
+            )
+            if memories:
+                return memories
+        if context.memory:
+            return rank_memories(
+                context.memory,
+                user_message,
+                top_k=self.memory_top_k,
+                token_budget=self.memory_token_budget
+            )
+        return []
+    
     def _clean_demo_content(self, text: str) -> str:
         """Remove all demo, placeholder, and example content from response"""
         import re
@@ -0,0 +1,217 @@
+"""
+Token-budget Context Compaction
+Folds the oldest conversation turns into a rolling extractive summary on a
+background thread once a session's history exceeds its token budget
+"""
+from typing import Dict, Any, Optional, List, Set
+from collections import Counter
+import logging
+import math
+import re
+import threading
+import time
+from agents.memory_index import tokenize
+from agents.memory_retrieval import estimate_tokens
+from agents.conversation_history import message_tokens
+
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+|\n+")
+SUMMARY_PREFIX = "Summary of earlier conversation: "
+
+
+class ExtractiveSummarizer:
+    """
+    Local sentence-scoring summarizer
+    Sentences are scored by the TF-IDF weight of their terms across the input,
+    so words repeated in every sentence count for little and recurring topics win
+    """
+    
+    def __init__(self, min_words: int = 3):
+        self.min_words = min_words
+    
+    def sentences(self, text: str) -> List[str]:
+        """Split text into sentences"""
+        return [s.strip() for s in SENTENCE_PATTERN.split(text) if s and s.strip()]
+    
+    def summarize(self, texts: List[str], max_tokens: int) -> str:
+        """Pick the highest-scoring sentences that fit in max_tokens, in original order"""
+        candidates: List[str] = []
+        seen: Set[str] = set()
+        for text in texts:
+            for sentence in self.sentences(text):
+                if sentence not in seen:
+                    seen.add(sentence)
+                    candidates.append(sentence)
+        
+        terms = [tokenize(sentence) for sentence in candidates]
+        frequency: Counter = Counter()
+        document_frequency: Counter = Counter()
+        for tokens in terms:
+            frequency.update(tokens)
+            document_frequency.update(set(tokens))
+        
+        total = len(candidates)
+        scored = []
+        for i, tokens in enumerate(terms):
+            if len(tokens) < self.min_words:
+                continue
+            weight = sum(
+                math.log1p(frequency[t]) * math.log(1 + total / document_frequency[t])
+                for t in set(tokens)
+            )
+            # Later sentences reflect where the conversation ended up
+            recency = 1.0 + 0.25 * (i / max(total - 1, 1))
+            scored.append((weight / math.sqrt(len(tokens)) * recency, i))
+        
+        chosen = []
+        budget = max_tokens
+        for _, i in sorted(scored, reverse=True):
+            cost = estimate_tokens(candidates[i])
+            if cost <= budget:
+                chosen.append(i)
+                budget -= cost
+        return " ".join(candidates[i] for i in sorted(chosen))
+
+
+class ContextCompactor:
+    """
+    Background token-budget compaction for InMemorySessionService
+    The request path only marks a session as over budget; folding and
+    summarizing happen on a daemon thread
+    """
+    
+    def __init__(
+        self,
+        session_service,
+        token_budget: int = 3000,
+        target_ratio: float = 0.75,
+        keep_recent: int = 6,
+        summary_tokens: int = 300,
+        summarizer: Optional[ExtractiveSummarizer] = None
+    ):
+        self.session_service = session_service
+        self.token_budget = token_budget
+        self.target_tokens = int(token_budget * target_ratio)
+        self.keep_recent = keep_recent
+        self.summary_tokens = summary_tokens
+        self.summarizer = summarizer or ExtractiveSummarizer()
+        self.logger = logging.getLogger("session_manager.compaction")
+        
+        self.pending: Set[str] = set()
+        self._pending_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {
+            "passes": 0,
+            "sessions_compacted": 0,
+            "messages_folded": 0,
+            "tokens_saved": 0,
+            "conflicts": 0,
+            "time_spent": 0.0
+        }
+    
+    def over_budget(self, history) -> bool:
+        """Whether a history needs folding"""
+        return history.tokens > self.token_budget and len(history.recent) > self.keep_recent
+    
+    def schedule(self, session_id: str):
+        """Queue a session for compaction (cheap; called on the request path)"""
+        with self._pending_lock:
+            self.pending.add(session_id)
+        self._wake.set()
+    
+    def start(self):
+        """Run compaction on a daemon thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="context-compactor", daemon=True)
+            self._thread.start()
+    
+    def stop(self):
+        """Stop the background thread"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+    
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait()
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.run_once()
+            except Exception as e:
+                self.logger.error(f"Error compacting context: {e}")
+    
+    def run_once(self) -> int:
+        """Compact every queued session; returns how many were compacted"""
+        with self._pending_lock:
+            pending, self.pending = self.pending, set()
+        
+        compacted = 0
+        for session_id in pending:
+            if self.compact_session(session_id):
+                compacted += 1
+        self.stats["passes"] += 1
+        return compacted
+    
+    def compact_session(self, session_id: str) -> bool:
+        """Fold the oldest turns of one session into its rolling summary"""
+        started = time.perf_counter()
+        shard = self.session_service.shard_for(session_id)
+        
+        with shard.lock:
+            session = shard.sessions.get(session_id)
+            history = session["conversation_history"] if session else None
+            if history is None or not self.over_budget(history):
+                return False
+            
+            # Fold oldest turns until the history, with a full-size summary in place
+            # of the current one, is back under the target
+            excess = history.tokens - message_tokens(history.summary) + self.summary_tokens - self.target_tokens
+            foldable = len(history.recent) - self.keep_recent
+            turns = []
+            for message in history.oldest(foldable):
+                if excess <= 0:
+                    break
+                turns.append(message)
+                excess -= message_tokens(message)
+            previous = history.summary
+        
+        # Summarize outside the lock so the request path never waits on it
+        texts = [previous["content"][len(SUMMARY_PREFIX):]] if previous else []
+        texts.extend(str(m.get("content", "")) for m in turns)
+        folded_count = len(turns) + (previous["metadata"].get("folded_messages", 0) if previous else 0)
+        summary = {
+            "role": "system",
+            "content": SUMMARY_PREFIX + self.summarizer.summarize(texts, self.summary_tokens),
+            "timestamp": time.time(),
+            "metadata": {"summary": True, "folded_messages": folded_count}
+        }
+        
+        with shard.lock:
+            if not history.fold(turns, summary):
+                self.stats["conflicts"] += 1
+                self.schedule(session_id)
+                return False
+        
+        saved = sum(message_tokens(m) for m in turns) + message_tokens(previous) - message_tokens(summary)
+        elapsed = time.perf_counter() - started
+        self.stats["sessions_compacted"] += 1
+        self.stats["messages_folded"] += len(turns)
+        self.stats["tokens_saved"] += saved
+        self.stats["time_spent"] += elapsed
+        self.logger.debug(
+            f"Folded {len(turns)} messages of session {session_id} into summary "
+            f"({saved} tokens saved, {elapsed * 1000:.1f}ms)"
+        )
+        return True
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Compaction metrics"""
+        stats = dict(self.stats)
+        stats["pending"] = len(self.pending)
+        stats["token_budget"] = self.token_budget
+        return stats
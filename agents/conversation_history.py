@@ -0,0 +1,165 @@
+"""
+Bounded Conversation History
+Ring buffer of recent turns behind a pinned first message, readable as a list
+"""
+from typing import Dict, Any, Optional, List, Iterable, Iterator
+from collections import deque
+from collections.abc import Sequence
+from itertools import islice
+from agents.memory_retrieval import estimate_tokens
+
+Message = Dict[str, Any]
+
+
+def message_tokens(message: Optional[Message]) -> int:
+    """Estimated prompt tokens for one message"""
+    if message is None:
+        return 0
+    return estimate_tokens(str(message.get("content", "")))
+
+
+class ConversationHistory(Sequence):
+    """
+    Pinned first (system/initial) message, an optional rolling summary of
+    folded turns, then a deque of recent turns
+    Appends and evictions are O(1); slices and indexing behave like a list.
+    fork() shares the deque copy-on-write, so a fork is O(1) until one side writes
+    """
+    
+    def __init__(self, max_messages: int = 50, messages: Optional[Iterable[Message]] = None):
+        if max_messages < 2:
+            raise ValueError("max_messages must be at least 2")
+        self.max_messages = max_messages
+        self.first: Optional[Message] = None
+        self.summary: Optional[Message] = None
+        self.recent: deque = deque(maxlen=max_messages - 1)
+        self.evicted = 0
+        self.tokens = 0
+        self.appended = 0
+        self._shared = False
+        for message in messages or ():
+            self.append(message)
+    
+    def append(self, message: Message) -> Optional[Message]:
+        """Add a message, returning the turn it pushed out (if any)"""
+        self._own()
+        self.appended += 1
+        self.tokens += message_tokens(message)
+        if self.first is None:
+            self.first = message
+            return None
+        
+        dropped = self.recent[0] if len(self.recent) == self.recent.maxlen else None
+        self.recent.append(message)
+        if dropped is not None:
+            self.evicted += 1
+            self.tokens -= message_tokens(dropped)
+        return dropped
+    
+    def compact(self, keep_recent: int) -> int:
+        """Drop all but the first message and the last keep_recent turns"""
+        self._own()
+        dropped = 0
+        while len(self.recent) > keep_recent:
+            self.tokens -= message_tokens(self.recent.popleft())
+            dropped += 1
+        self.evicted += dropped
+        return dropped
+    
+    def oldest(self, count: int) -> List[Message]:
+        """The count oldest recent turns, i.e. the next candidates for folding"""
+        return list(islice(self.recent, count))
+    
+    def fold(self, turns: List[Message], summary: Message) -> bool:
+        """
+        Replace the given oldest turns with a new rolling summary
+        Returns False (and changes nothing) if those turns are no longer at the front
+        """
+        if len(turns) > len(self.recent) or any(a is not b for a, b in zip(turns, self.recent)):
+            return False
+        self._own()
+        for _ in turns:
+            self.tokens -= message_tokens(self.recent.popleft())
+        self.tokens += message_tokens(summary) - message_tokens(self.summary)
+        self.summary = summary
+        return True
+    
+    def fork(self) -> "ConversationHistory":
+        """O(1) copy; the deque is shared until either history is modified"""
+        child = ConversationHistory.__new__(ConversationHistory)
+        child.__dict__.update(self.__dict__)
+        child._shared = self._shared = True
+        return child
+    
+    def _own(self):
+        """Take a private copy of a deque shared with a fork before mutating it"""
+        if self._shared:
+            self.recent = deque(self.recent, maxlen=self.recent.maxlen)
+            self._shared = False
+    
+    def since(self, appended: int) -> List[Message]:
+        """Messages appended after the append count was `appended` (those still held)"""
+        count = self.appended - appended
+        if count <= 0:
+            return []
+        messages = self.tail(min(count, len(self.recent)))
+        if appended == 0 and self.first is not None:
+            messages.insert(0, self.first)
+        return messages
+    
+    def _head(self) -> List[Message]:
+        return [m for m in (self.first, self.summary) if m is not None]
+    
+    def tail(self, n: int) -> List[Message]:
+        """Last n messages in order, without copying the rest of the buffer"""
+        if n <= 0:
+            return []
+        if n > len(self.recent):
+            return list(self)[-n:]
+        latest = list(islice(reversed(self.recent), n))
+        latest.reverse()
+        return latest
+    
+    def clear(self):
+        """Remove every message"""
+        self.first = None
+        self.summary = None
+        self.recent = deque(maxlen=self.recent.maxlen)
+        self._shared = False
+        self.tokens = 0
+    
+    def __len__(self) -> int:
+        return len(self.recent) + (self.first is not None) + (self.summary is not None)
+    
+    def __iter__(self) -> Iterator[Message]:
+        yield from self._head()
+        yield from self.recent
+    
+    def __reversed__(self) -> Iterator[Message]:
+        yield from reversed(self.recent)
+        yield from reversed(self._head())
+    
+    def __getitem__(self, index):
+        size = len(self)
+        if isinstance(index, slice):
+            start, stop, step = index.indices(size)
+            if step == 1 and stop == size:
+                return self.tail(stop - start)
+            return [self[i] for i in range(start, stop, step)]
+        
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("conversation history index out of range")
+        head = self._head()
+        if index < len(head):
+            return head[index]
+        return self.recent[index - len(head)]
+    
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (ConversationHistory, list)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+    
+    def __repr__(self) -> str:
+        return f"ConversationHistory({list(self)!r}, max_messages={self.max_messages})"
@@ -1,6 +1,7 @@
 """
 Crop Recommendation Agent - Specialized agent for crop recommendations
 """
+from typing import Any
 from agents.base_agent import BaseAgent, AgentMessage, AgentContext, AgentState
 from agents.tools.agricultural_tools import CropRecommendationTool, WeatherDataTool, SoilAnalysisTool, MarketPriceTool
 
@@ -15,7 +16,8 @@ class CropRecommendationAgent(BaseAgent):
         self,
         agent_id: str = "crop_agent",
         model_path: str = None,
-        tools: list = None
+        tools: list = None,
+        memory_bank: Any = None
     ):
         # Initialize tools
         if tools is None:
@@ -29,7 +31,8 @@ class CropRecommendationAgent(BaseAgent):
         super().__init__(
             agent_id=agent_id,
             agent_name="Crop Recommendation Specialist",
-            tools=tools
+            tools=tools,
+            memory_bank=memory_bank
         )
     
     def process(self, message: AgentMessage, context: AgentContext) -> AgentMessage:
@@ -93,6 +96,15 @@ class CropRecommendationAgent(BaseAgent):
                 {"crop_name": recommended_crop}
             )
             
+            # Persist the results of this turn in a single memory write
+            self.store_memories({
+                "crop_params": params,
+                "recommended_crop": recommended_crop,
+                "soil_analysis": soil_analysis,
+                "weather": weather_data,
+                "market_price": market_price
+            }, context)
+            
             # Build comprehensive response
             response = self._format_response(
                 crop_recommendation,
@@ -4,9 +4,9 @@ Evaluates agent performance and quality
 """
 from typing import Dict, Any, List, Optional
 from datetime import datetime
-import json
 import logging
 from dataclasses import dataclass, asdict
+from agents.serialization import serializer_for_path
 
 
 @dataclass
@@ -254,7 +254,8 @@ class AgentEvaluator:
         
         return scores_by_type
     
-    def export_evaluations(self, filepath: str):
-        """Export evaluations to JSON file"""
-        with open(filepath, 'w') as f:
-            json.dump([e.to_dict() for e in self.evaluations], f, indent=2)
+    def export_evaluations(self, filepath: str) -> int:
+        """Stream evaluations to a JSON file (msgpack for .msgpack paths)"""
+        serializer = serializer_for_path(filepath)
+        with open(filepath, 'wb') as f:
+            return serializer.write_stream((e.to_dict() for e in list(self.evaluations)), f)
@@ -0,0 +1,152 @@
+"""
+Execution Plans
+Agent routes as dependency graphs, so independent agents can run concurrently
+"""
+from typing import Dict, List, Any, Iterable, Tuple
+from dataclasses import dataclass, field
+from agents.base_agent import AgentMessage
+
+
+@dataclass
+class PlanNode:
+    """One agent in a plan and the agents whose outputs it consumes"""
+    agent_id: str
+    depends_on: List[str] = field(default_factory=list)
+
+
+@dataclass
+class PlanResult:
+    """Outcome of running an execution plan"""
+    messages: List[AgentMessage]              # initial message, then outputs in plan order
+    outputs: Dict[str, AgentMessage]
+    timings: Dict[str, float]                 # per-agent wall time (ms)
+    critical_path: List[str]
+    critical_path_ms: float
+    wall_time_ms: float
+    
+    @property
+    def final(self) -> AgentMessage:
+        """Output of the last node in plan order (the aggregator for fan-in plans)"""
+        return self.messages[-1]
+
+
+class ExecutionPlan:
+    """
+    Directed acyclic graph of agents
+    A node runs once all of its dependencies have finished and receives their
+    merged outputs; nodes without dependencies receive the request itself
+    """
+    
+    def __init__(self, nodes: Iterable[PlanNode] = ()):
+        self.nodes: Dict[str, PlanNode] = {}
+        for node in nodes:
+            self.add(node.agent_id, node.depends_on)
+    
+    @classmethod
+    def chain(cls, agent_ids: List[str]) -> "ExecutionPlan":
+        """Each agent depends on the one before it (the sequential pattern)"""
+        plan = cls()
+        previous = None
+        for agent_id in dict.fromkeys(agent_ids):
+            plan.add(agent_id, [previous] if previous else [])
+            previous = agent_id
+        return plan
+    
+    @classmethod
+    def parallel(cls, agent_ids: List[str]) -> "ExecutionPlan":
+        """Independent agents (the parallel pattern)"""
+        plan = cls()
+        for agent_id in dict.fromkeys(agent_ids):
+            plan.add(agent_id)
+        return plan
+    
+    @classmethod
+    def fan_in(cls, agent_ids: List[str]) -> "ExecutionPlan":
+        """All agents but the last run independently; the last one combines their outputs"""
+        agent_ids = list(dict.fromkeys(agent_ids))
+        plan = cls.parallel(agent_ids[:-1])
+        if agent_ids:
+            plan.add(agent_ids[-1], agent_ids[:-1])
+        return plan
+    
+    def add(self, agent_id: str, depends_on: Iterable[str] = ()) -> "ExecutionPlan":
+        """Add a node; dependencies may be added later but must exist before the plan runs"""
+        if agent_id in self.nodes:
+            raise ValueError(f"Agent {agent_id} is already in the plan")
+        self.nodes[agent_id] = PlanNode(agent_id, list(dict.fromkeys(depends_on)))
+        return self
+    
+    def without(self, agent_id: str) -> "ExecutionPlan":
+        """Copy of the plan with a node removed; its dependents inherit its dependencies"""
+        removed = self.nodes[agent_id].depends_on
+        plan = ExecutionPlan()
+        for node in self.nodes.values():
+            if node.agent_id == agent_id:
+                continue
+            depends_on = []
+            for dependency in node.depends_on:
+                depends_on.extend(removed if dependency == agent_id else [dependency])
+            plan.add(node.agent_id, depends_on)
+        return plan
+    
+    def dependents(self) -> Dict[str, List[str]]:
+        """Reverse edges: agent -> agents that consume its output"""
+        edges = {agent_id: [] for agent_id in self.nodes}
+        for node in self.nodes.values():
+            for dependency in node.depends_on:
+                edges[dependency].append(node.agent_id)
+        return edges
+    
+    def order(self) -> List[str]:
+        """Topological order, stable with respect to insertion; raises ValueError if invalid"""
+        for node in self.nodes.values():
+            for dependency in node.depends_on:
+                if dependency not in self.nodes:
+                    raise ValueError(f"Agent {node.agent_id} depends on unknown agent {dependency}")
+        
+        waiting = {agent_id: len(node.depends_on) for agent_id, node in self.nodes.items()}
+        dependents = self.dependents()
+        ready = [agent_id for agent_id, count in waiting.items() if count == 0]
+        order = []
+        while ready:
+            agent_id = ready.pop(0)
+            order.append(agent_id)
+            for dependent in dependents[agent_id]:
+                waiting[dependent] -= 1
+                if waiting[dependent] == 0:
+                    ready.append(dependent)
+        
+        if len(order) != len(self.nodes):
+            cycle = sorted(set(self.nodes) - set(order))
+            raise ValueError(f"Execution plan has a dependency cycle among: {cycle}")
+        return order
+    
+    def critical_path(self, timings: Dict[str, float]) -> Tuple[List[str], float]:
+        """Longest dependency chain by measured wall time, and its total"""
+        finish: Dict[str, float] = {}
+        via: Dict[str, Any] = {}
+        for agent_id in self.order():
+            slowest = max(self.nodes[agent_id].depends_on, key=lambda d: finish[d], default=None)
+            finish[agent_id] = timings.get(agent_id, 0.0) + (finish[slowest] if slowest else 0.0)
+            via[agent_id] = slowest
+        
+        if not finish:
+            return [], 0.0
+        agent_id = max(finish, key=finish.get)
+        total = finish[agent_id]
+        path = []
+        while agent_id is not None:
+            path.append(agent_id)
+            agent_id = via[agent_id]
+        path.reverse()
+        return path, total
+    
+    def __len__(self) -> int:
+        return len(self.nodes)
+    
+    def __repr__(self) -> str:
+        edges = ", ".join(
+            f"{node.agent_id}<-[{', '.join(node.depends_on)}]" if node.depends_on else node.agent_id
+            for node in self.nodes.values()
+        )
+        return f"ExecutionPlan({edges})"
@@ -0,0 +1,1263 @@
+"""
+Storage Backends for the Memory Bank
+Pluggable engines behind MemoryBank: in-memory (JSON snapshot/journal),
+lazily paged per-session shards, and SQLite
+"""
+from abc import ABC, abstractmethod
+from typing import Dict, Any, Optional, List, Iterator, Callable, Tuple
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from agents.memory_index import InvertedIndex, tokenize, rank_score
+from agents.serialization import json_codec
+
+Ops = List[Tuple[str, str, Optional[str], Optional[Dict[str, Any]]]]
+Versions = Dict[Tuple[str, str], int]
+
+
+class VersionConflictError(Exception):
+    """Raised when an optimistic write finds a different version than expected"""
+    
+    def __init__(self, session_id: str, key: str, expected: int, actual: int):
+        super().__init__(f"Version conflict on {session_id}/{key}: expected {expected}, found {actual}")
+        self.session_id = session_id
+        self.key = key
+        self.expected = expected
+        self.actual = actual
+
+
+def entry_version(entry: Optional[Dict[str, Any]]) -> int:
+    """Version of an entry; 0 means absent and entries written before versioning count as 1"""
+    if entry is None:
+        return 0
+    return entry.get("version", 1)
+
+
+class MemoryJournal:
+    """
+    Append-only write-ahead journal for the memory bank
+    Mutations are appended as compact JSON lines and periodically
+    folded into the snapshot file by a background compactor
+    """
+    
+    def __init__(
+        self,
+        snapshot_path: str,
+        lock: Optional[threading.RLock] = None,
+        compact_interval: float = 30.0,
+        compact_threshold: int = 1000
+    ):
+        self.snapshot_path = snapshot_path
+        self.journal_path = f"{snapshot_path}.journal"
+        self.rotated_path = f"{self.journal_path}.old"
+        self.compact_interval = compact_interval
+        self.compact_threshold = compact_threshold
+        self.lock = lock or threading.RLock()
+        # Serializes whole compactions, which write the snapshot outside self.lock
+        self._compact_lock = threading.Lock()
+        self.pending_records = 0
+        self.compactions = 0
+        self.logger = logging.getLogger("memory_bank.journal")
+        
+        self._file = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def open(self):
+        """Open the journal file for appending"""
+        directory = os.path.dirname(self.journal_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.journal_path, 'a', encoding='utf-8')
+    
+    def append(self, record: Dict[str, Any]):
+        """Append a single mutation record"""
+        self.append_many([record])
+    
+    def append_many(self, records: List[Dict[str, Any]]):
+        """Append several mutation records with a single write"""
+        if not records:
+            return
+        payload = "".join(json_codec.dumps_text(record) + "\n" for record in records)
+        with self.lock:
+            if self._file is None:
+                self.open()
+            self._file.write(payload)
+            self._file.flush()
+            self.pending_records += len(records)
+            should_compact = self.pending_records >= self.compact_threshold
+        if should_compact:
+            self._wake.set()
+    
+    def replay(self) -> Iterator[Dict[str, Any]]:
+        """Yield records from the rotated and active journal files, oldest first"""
+        for path in (self.rotated_path, self.journal_path):
+            if not os.path.exists(path):
+                continue
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        yield json_codec.loads(line)
+                    except ValueError:
+                        # A torn final write from a crash; everything before it is intact
+                        self.logger.warning(f"Skipping malformed journal record in {path}")
+    
+    def compact(self, snapshot_fn: Callable[[], Any]):
+        """
+        Fold the journal into the snapshot file
+        snapshot_fn runs after rotation, outside the lock, and must return a
+        consistent copy of the state as a dict or as encoded JSON text. It may
+        already include records from the new journal; replaying those again
+        on load is harmless because every record type is idempotent
+        """
+        with self._compact_lock:
+            with self.lock:
+                if self.pending_records == 0 and not os.path.exists(self.rotated_path):
+                    return
+                if self._file is not None:
+                    self._file.close()
+                if os.path.exists(self.journal_path) and not os.path.exists(self.rotated_path):
+                    os.replace(self.journal_path, self.rotated_path)
+                self.open()
+                self.pending_records = 0
+            data = snapshot_fn()
+            
+            # Encode and write the snapshot outside the lock so mutations keep flowing
+            tmp_path = f"{self.snapshot_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(data if isinstance(data, str) else json_codec.dumps_text(data))
+            os.replace(tmp_path, self.snapshot_path)
+            
+            with self.lock:
+                if os.path.exists(self.rotated_path):
+                    os.remove(self.rotated_path)
+                self.compactions += 1
+            self.logger.debug(f"Compacted journal into {self.snapshot_path}")
+    
+    def start_compactor(self, snapshot_fn: Callable[[], Any]):
+        """Start the background compaction thread"""
+        if self._thread is not None:
+            return
+        
+        def run():
+            while not self._stop.is_set():
+                self._wake.wait(self.compact_interval)
+                self._wake.clear()
+                try:
+                    self.compact(snapshot_fn)
+                except Exception as e:
+                    self.logger.error(f"Error compacting journal: {e}")
+        
+        self._thread = threading.Thread(target=run, name="memory-journal-compactor", daemon=True)
+        self._thread.start()
+    
+    def close(self, snapshot_fn: Optional[Callable[[], Any]] = None):
+        """Stop the compactor, optionally folding the journal one last time"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if snapshot_fn is not None:
+            self.compact(snapshot_fn)
+        with self.lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def search_session(
+    session: Dict[str, Dict[str, Any]],
+    index: Optional[InvertedIndex],
+    query: str,
+    ranked: bool = False,
+    limit: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """Substring search over one session's entries, narrowed by its inverted index"""
+    # Postings narrow the scan to keys sharing the query's tokens
+    candidates = index.candidates(query) if index is not None else None
+    in_order = True
+    if candidates is None:
+        keys = list(session)
+    elif len(candidates) * 4 >= len(session):
+        # Broad queries: filtering the session keeps its order without a sort
+        keys = [key for key in session if key in candidates]
+    else:
+        keys = [key for key in candidates if key in session]
+        in_order = False
+    
+    query_lower = query.lower()
+    if candidates is not None and tokenize(query_lower) == [query_lower]:
+        # A single-word query is a substring of every candidate's indexed terms
+        matched = keys
+    else:
+        matched = []
+        for key in keys:
+            entry = session[key]
+            if query_lower in key.lower() or query_lower in str(entry["value"]).lower():
+                matched.append(key)
+    if not in_order:
+        # Only the verified matches need putting back into write order
+        matched.sort(key=lambda k: session[k].get("timestamp") or "")
+    
+    scores = None
+    if ranked:
+        now = datetime.now()
+        relevance = index.relevance(query, set(matched)) if index is not None else {}
+        scores = {
+            key: rank_score(
+                relevance.get(key, 1.0),
+                session[key].get("timestamp"),
+                session[key].get("access_count", 0),
+                now
+            )
+            for key in matched
+        }
+        matched.sort(key=lambda k: scores[k], reverse=True)
+    
+    results = []
+    for key in matched[:limit]:
+        entry = session[key]
+        result = {
+            "key": key,
+            "value": entry["value"],
+            "metadata": entry.get("metadata", {}),
+            "timestamp": entry.get("timestamp")
+        }
+        if scores is not None:
+            result["score"] = scores[key]
+        results.append(result)
+    return results
+
+
+class MemoryBackend(ABC):
+    """
+    Base class for memory bank storage engines
+    Entries are dicts with value, metadata, timestamp and access statistics
+    """
+    
+    name = "base"
+    # Lazy backends page sessions in on demand, so callers should avoid full scans
+    lazy = False
+    # Shared backends are written by several processes and publish a change feed
+    shared = False
+    
+    @property
+    def location(self) -> Optional[str]:
+        """Where the backend persists data, if anywhere"""
+        return None
+    
+    @abstractmethod
+    def put(self, session_id: str, key: str, entry: Dict[str, Any]):
+        """Insert or replace an entry, setting entry["version"] to the stored version"""
+        pass
+    
+    @abstractmethod
+    def get_entry(self, session_id: str, key: str) -> Optional[Dict[str, Any]]:
+        """Get a single entry, or None if missing"""
+        pass
+    
+    @abstractmethod
+    def touch(self, session_id: str, key: str, count_delta: int, last_accessed: str):
+        """Record access statistics for an entry"""
+        pass
+    
+    def touch_many(self, records: List[Tuple[str, str, int, str]]):
+        """Apply a batch of (session_id, key, count_delta, last_accessed) access records"""
+        for session_id, key, count_delta, last_accessed in records:
+            self.touch(session_id, key, count_delta, last_accessed)
+    
+    @abstractmethod
+    def get_values(self, session_id: str) -> Dict[str, Any]:
+        """Get key -> value for every entry in a session"""
+        pass
+    
+    @abstractmethod
+    def get_entries(self, session_id: str) -> Dict[str, Dict[str, Any]]:
+        """Get key -> entry for every entry in a session"""
+        pass
+    
+    @abstractmethod
+    def delete(self, session_id: str, key: Optional[str] = None):
+        """Delete an entry, or the whole session when key is None"""
+        pass
+    
+    def apply_batch(self, ops: Ops, expected: Optional[Versions] = None):
+        """
+        Apply ("set", session_id, key, entry) / ("del", session_id, key, None) ops
+        expected maps (session_id, key) -> version the caller read (0 for absent);
+        a mismatch raises VersionConflictError and nothing is applied.
+        Engines override this to apply the batch atomically with one flush
+        """
+        if expected:
+            self.check_versions(expected)
+        for op, session_id, key, entry in ops:
+            if op == "set":
+                self.put(session_id, key, entry)
+            else:
+                self.delete(session_id, key)
+    
+    def check_versions(self, expected: Versions):
+        """Raise VersionConflictError unless every entry is at its expected version"""
+        for (session_id, key), version in expected.items():
+            actual = entry_version(self.get_entry(session_id, key))
+            if actual != version:
+                raise VersionConflictError(session_id, key, version, actual)
+    
+    def change_cursor(self) -> int:
+        """Position of the latest change in the change feed"""
+        return 0
+    
+    def changes_since(self, cursor: int) -> Tuple[int, Optional[List[Tuple[str, str, str]]]]:
+        """
+        (new cursor, [(session_id, key, op), ...]) for changes after cursor
+        Changes is None when the feed no longer reaches back to cursor
+        """
+        return cursor, []
+    
+    @abstractmethod
+    def search(
+        self,
+        session_id: str,
+        query: str,
+        ranked: bool = False,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Case-insensitive substring search over keys and values
+        When ranked, results carry a score and are ordered by it
+        """
+        pass
+    
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        """Get total_sessions and total_entries"""
+        pass
+    
+    @abstractmethod
+    def iter_entries(self) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+        """Yield (session_id, key, entry) for every stored entry"""
+        pass
+    
+    def save(self):
+        """Flush state to durable storage"""
+        pass
+    
+    def load(self):
+        """Load state from durable storage"""
+        pass
+    
+    def close(self):
+        """Release resources"""
+        pass
+
+
+class InMemoryBackend(MemoryBackend):
+    """
+    Dictionary-backed storage persisted to a JSON snapshot
+    Optionally uses a MemoryJournal instead of rewriting the snapshot per mutation
+    """
+    
+    name = "memory"
+    
+    def __init__(
+        self,
+        storage_path: Optional[str] = None,
+        journal: bool = False,
+        compact_interval: float = 30.0,
+        compact_threshold: int = 1000
+    ):
+        self.storage_path = storage_path
+        self.memory: Dict[str, Dict[str, Any]] = defaultdict(dict)
+        self.indexes: Dict[str, InvertedIndex] = {}
+        self.logger = logging.getLogger("memory_bank.memory")
+        self.lock = threading.RLock()
+        
+        # Encoded JSON per session; only sessions changed since the last save are re-encoded.
+        # Stored entries are never mutated in place (touches replace them), so a shallow
+        # copy of a session taken under the lock can be encoded after releasing it
+        self._fragments: Dict[str, str] = {}
+        self._dirty: set = set()
+        self._save_lock = threading.RLock()
+        self.total_entries = 0
+        
+        self.journal: Optional[MemoryJournal] = None
+        if storage_path and journal:
+            self.journal = MemoryJournal(
+                storage_path,
+                lock=self.lock,
+                compact_interval=compact_interval,
+                compact_threshold=compact_threshold
+            )
+        
+        if storage_path:
+            self.load()
+        
+        if self.journal:
+            self.journal.start_compactor(self._snapshot)
+    
+    @property
+    def location(self) -> Optional[str]:
+        return self.storage_path
+    
+    def put(self, session_id: str, key: str, entry: Dict[str, Any]):
+        self.apply_batch([("set", session_id, key, entry)])
+    
+    def apply_batch(self, ops: Ops, expected: Optional[Versions] = None):
+        with self.lock:
+            if expected:
+                self.check_versions(expected)
+            records = []
+            for op, session_id, key, entry in ops:
+                if op == "set":
+                    session = self.memory[session_id]
+                    previous = session.get(key)
+                    if previous is None:
+                        self.total_entries += 1
+                    entry["version"] = entry_version(previous) + 1
+                    session[key] = entry
+                    self.indexes.setdefault(session_id, InvertedIndex()).add(key, entry["value"])
+                    records.append({"op": "set", "s": session_id, "k": key, "e": entry})
+                else:
+                    self._remove(session_id, key)
+                    records.append({"op": "del", "s": session_id, "k": key})
+                self._dirty.add(session_id)
+            # A multi-op batch is one journal line, so replay applies all of it or none
+            self._persist([{"op": "batch", "ops": records}] if len(records) > 1 else records)
+        if not self.journal:
+            self.save()
+    
+    def _remove(self, session_id: str, key: Optional[str]):
+        if key:
+            if self.memory.get(session_id, {}).pop(key, None) is not None:
+                self.total_entries -= 1
+            if session_id in self.indexes:
+                self.indexes[session_id].remove(key)
+        else:
+            self.total_entries -= len(self.memory.pop(session_id, None) or {})
+            self.indexes.pop(session_id, None)
+    
+    def get_entry(self, session_id: str, key: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            session = self.memory.get(session_id)
+            return session.get(key) if session else None
+    
+    def touch(self, session_id: str, key: str, count_delta: int, last_accessed: str):
+        self.touch_many([(session_id, key, count_delta, last_accessed)])
+    
+    def touch_many(self, records: List[Tuple[str, str, int, str]]):
+        with self.lock:
+            journal_records = []
+            for session_id, key, count_delta, last_accessed in records:
+                entry = self.memory.get(session_id, {}).get(key)
+                if entry is None:
+                    continue
+                access_count = entry.get("access_count", 0) + count_delta
+                self.memory[session_id][key] = dict(entry, access_count=access_count, last_accessed=last_accessed)
+                self._dirty.add(session_id)
+                journal_records.append({
+                    "op": "touch",
+                    "s": session_id,
+                    "k": key,
+                    "n": access_count,
+                    "t": last_accessed
+                })
+            self._persist(journal_records)
+        if journal_records and not self.journal:
+            self.save()
+    
+    def get_values(self, session_id: str) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                key: entry["value"]
+                for key, entry in self.memory.get(session_id, {}).items()
+            }
+    
+    def get_entries(self, session_id: str) -> Dict[str, Dict[str, Any]]:
+        with self.lock:
+            return dict(self.memory.get(session_id, {}))
+    
+    def delete(self, session_id: str, key: Optional[str] = None):
+        self.apply_batch([("del", session_id, key, None)])
+    
+    def search(
+        self,
+        session_id: str,
+        query: str,
+        ranked: bool = False,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        with self.lock:
+            session = self.memory.get(session_id)
+            if not session:
+                return []
+            return search_session(session, self.indexes.get(session_id), query, ranked, limit)
+    
+    def iter_entries(self) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+        with self.lock:
+            items = [
+                (session_id, key, entry)
+                for session_id, data in self.memory.items()
+                for key, entry in data.items()
+            ]
+        return iter(items)
+    
+    def stats(self) -> Dict[str, Any]:
+        stats = {
+            "total_sessions": len(self.memory),
+            "total_entries": self.total_entries
+        }
+        if self.journal:
+            stats["journal_pending_records"] = self.journal.pending_records
+            stats["journal_compactions"] = self.journal.compactions
+        return stats
+    
+    def _persist(self, records: List[Dict[str, Any]]):
+        """
+        Append mutations to the journal; called under the lock so journal order
+        matches apply order. Without a journal, callers save after releasing the lock
+        """
+        if not records or not self.journal:
+            return
+        try:
+            self.journal.append_many(records)
+        except Exception as e:
+            self.logger.error(f"Error appending to memory journal: {e}")
+    
+    @staticmethod
+    def _serializable_session(data: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """Persisted form of one session's entries"""
+        serializable = {}
+        for key, entry in data.items():
+            serializable[key] = {
+                "value": entry["value"],
+                "metadata": entry.get("metadata", {}),
+                "timestamp": entry.get("timestamp"),
+                "access_count": entry.get("access_count", 0),
+                "version": entry_version(entry)
+            }
+            if entry.get("expires_at") is not None:
+                serializable[key]["expires_at"] = entry["expires_at"]
+        return serializable
+    
+    def _snapshot(self) -> str:
+        """
+        Encode memory as JSON text, re-encoding only sessions changed since the last call
+        Changed sessions are copied under the lock and encoded outside it
+        """
+        with self._save_lock:
+            with self.lock:
+                changed = {session_id: dict(self.memory.get(session_id) or {}) for session_id in self._dirty}
+                self._dirty.clear()
+            for session_id, data in changed.items():
+                if data:
+                    self._fragments[session_id] = json_codec.dumps_text(self._serializable_session(data))
+                else:
+                    self._fragments.pop(session_id, None)
+            parts = [
+                f"{json_codec.dumps_text(session_id)}:{fragment}"
+                for session_id, fragment in self._fragments.items()
+            ]
+        return "{" + ",".join(parts) + "}"
+    
+    def _apply_record(self, record: Dict[str, Any]):
+        """Apply a journal record to in-memory state"""
+        op = record.get("op")
+        session_id = record.get("s")
+        key = record.get("k")
+        if op == "batch":
+            for child in record.get("ops", []):
+                self._apply_record(child)
+        elif op == "set":
+            self.memory[session_id][key] = record["e"]
+        elif op == "touch":
+            entry = self.memory.get(session_id, {}).get(key)
+            if entry is not None:
+                entry["access_count"] = record.get("n", entry.get("access_count", 0))
+                entry["last_accessed"] = record.get("t")
+        elif op == "del":
+            if key:
+                self.memory.get(session_id, {}).pop(key, None)
+            else:
+                self.memory.pop(session_id, None)
+    
+    def save(self):
+        """Save memory to disk"""
+        if not self.storage_path:
+            return
+        if self.journal:
+            try:
+                self.journal.compact(self._snapshot)
+            except Exception as e:
+                self.logger.error(f"Error compacting memory journal: {e}")
+            return
+        try:
+            # Writers serialize on the save lock only; the snapshot lands via an atomic rename
+            with self._save_lock:
+                snapshot = self._snapshot()
+                tmp_path = f"{self.storage_path}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(snapshot)
+                os.replace(tmp_path, self.storage_path)
+        except Exception as e:
+            self.logger.error(f"Error saving memory: {e}")
+    
+    def load(self):
+        """Load memory from disk"""
+        if not self.storage_path:
+            return
+        try:
+            with open(self.storage_path, 'rb') as f:
+                data = json_codec.loads(f.read())
+                self.memory = defaultdict(dict, data)
+            self.logger.info(f"Loaded memory from {self.storage_path}")
+        except FileNotFoundError:
+            self.logger.info("Memory file not found, starting fresh")
+        except Exception as e:
+            self.logger.error(f"Error loading memory: {e}")
+        
+        if self.journal:
+            replayed = 0
+            for record in self.journal.replay():
+                self._apply_record(record)
+                replayed += 1
+            self.journal.pending_records = replayed
+            if replayed:
+                self.logger.info(f"Replayed {replayed} journal records")
+        
+        self._rebuild_indexes()
+    
+    def _rebuild_indexes(self):
+        """Build search postings for every loaded session"""
+        with self.lock:
+            self._fragments = {}
+            self._dirty = set(self.memory)
+            self.total_entries = sum(len(data) for data in self.memory.values())
+            self.indexes = {}
+            for session_id, data in self.memory.items():
+                index = InvertedIndex()
+                for key, entry in data.items():
+                    index.add(key, entry["value"])
+                self.indexes[session_id] = index
+    
+    def close(self):
+        """Flush pending journal records into the snapshot and stop background work"""
+        if self.journal:
+            self.journal.close(self._snapshot)
+
+
+class ShardedFileBackend(MemoryBackend):
+    """
+    Lazily paged storage with one file per session under hash-bucket directories
+    Startup reads only a small index; sessions are paged in on first use,
+    written back when dirty and paged out after sitting idle
+    """
+    
+    name = "sharded"
+    lazy = True
+    
+    def __init__(
+        self,
+        directory: str,
+        shard_count: int = 256,
+        idle_timeout: float = 600.0,
+        flush_interval: float = 1.0,
+        legacy_path: Optional[str] = None
+    ):
+        self.directory = directory
+        self.index_path = os.path.join(directory, "index.json")
+        self.shard_count = shard_count
+        self.idle_timeout = idle_timeout
+        self.flush_interval = flush_interval
+        self.logger = logging.getLogger("memory_bank.sharded")
+        self.lock = threading.RLock()
+        self._flush_lock = threading.RLock()
+        
+        # session_id -> entry count for every session on disk or in memory
+        self.session_index: Dict[str, int] = {}
+        self.total_entries = 0
+        
+        # Working set of paged-in sessions
+        self.resident: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.indexes: Dict[str, InvertedIndex] = {}
+        self.last_used: Dict[str, float] = {}
+        self.dirty: set = set()
+        self.index_dirty = False
+        self.page_ins = 0
+        self.page_outs = 0
+        
+        os.makedirs(directory, exist_ok=True)
+        self.load()
+        if legacy_path and not self.session_index and os.path.exists(legacy_path):
+            self._import_legacy(legacy_path)
+        
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run_pager, name="memory-shard-pager", daemon=True)
+        self._thread.start()
+    
+    @property
+    def location(self) -> Optional[str]:
+        return self.directory
+    
+    def _session_path(self, session_id: str) -> str:
+        digest = hashlib.sha1(session_id.encode("utf-8")).hexdigest()
+        bucket = int(digest[:8], 16) % self.shard_count
+        return os.path.join(self.directory, f"{bucket:03x}", f"{digest}.json")
+    
+    @staticmethod
+    def _write_atomic(path: str, data: Any):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(json_codec.dumps(data))
+        os.replace(tmp_path, path)
+    
+    def _read_session(self, session_id: str) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self._session_path(session_id), 'rb') as f:
+                return json_codec.loads(f.read())
+        except FileNotFoundError:
+            return {}
+    
+    def _page_in(self, session_id: str, create: bool = False) -> Optional[Dict[str, Dict[str, Any]]]:
+        """Return the resident copy of a session, loading it from disk if needed"""
+        session = self.resident.get(session_id)
+        if session is None:
+            if session_id in self.session_index:
+                session = self._read_session(session_id)
+                self.page_ins += 1
+            elif create:
+                session = {}
+            else:
+                return None
+            self.resident[session_id] = session
+            index = InvertedIndex()
+            for key, entry in session.items():
+                index.add(key, entry["value"])
+            self.indexes[session_id] = index
+        self.last_used[session_id] = time.monotonic()
+        return session
+    
+    def _page_out(self, session_id: str):
+        """Write a session back if dirty and drop it from memory"""
+        if session_id in self.dirty:
+            self._flush_session(session_id)
+        self.resident.pop(session_id, None)
+        self.indexes.pop(session_id, None)
+        self.last_used.pop(session_id, None)
+        self.page_outs += 1
+    
+    def _flush_session(self, session_id: str):
+        session = self.resident.get(session_id)
+        path = self._session_path(session_id)
+        if session:
+            self._write_atomic(path, session)
+        elif os.path.exists(path):
+            os.remove(path)
+        self.dirty.discard(session_id)
+    
+    def _set_count(self, session_id: str, count: int):
+        previous = self.session_index.get(session_id, 0)
+        if count:
+            self.session_index[session_id] = count
+        else:
+            self.session_index.pop(session_id, None)
+        self.total_entries += count - previous
+        self.index_dirty = True
+    
+    def put(self, session_id: str, key: str, entry: Dict[str, Any]):
+        with self.lock:
+            session = self._page_in(session_id, create=True)
+            entry["version"] = entry_version(session.get(key)) + 1
+            session[key] = entry
+            self.indexes[session_id].add(key, entry["value"])
+            self._set_count(session_id, len(session))
+            self.dirty.add(session_id)
+    
+    def get_entry(self, session_id: str, key: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            session = self._page_in(session_id)
+            return session.get(key) if session else None
+    
+    def touch(self, session_id: str, key: str, count_delta: int, last_accessed: str):
+        with self.lock:
+            session = self._page_in(session_id)
+            entry = session.get(key) if session else None
+            if entry is None:
+                return
+            access_count = entry.get("access_count", 0) + count_delta
+            session[key] = dict(entry, access_count=access_count, last_accessed=last_accessed)
+            self.dirty.add(session_id)
+    
+    def touch_many(self, records: List[Tuple[str, str, int, str]]):
+        with self.lock:
+            for session_id, key, count_delta, last_accessed in records:
+                # Stats for sessions that were paged out are applied on disk via a page-in
+                self.touch(session_id, key, count_delta, last_accessed)
+    
+    def get_values(self, session_id: str) -> Dict[str, Any]:
+        with self.lock:
+            session = self._page_in(session_id) or {}
+            return {key: entry["value"] for key, entry in session.items()}
+    
+    def get_entries(self, session_id: str) -> Dict[str, Dict[str, Any]]:
+        with self.lock:
+            return dict(self._page_in(session_id) or {})
+    
+    def apply_batch(self, ops: Ops, expected: Optional[Versions] = None):
+        # Changes only reach disk on the next flush, so holding the lock makes the batch atomic
+        with self.lock:
+            super().apply_batch(ops, expected)
+    
+    def delete(self, session_id: str, key: Optional[str] = None):
+        with self.lock:
+            session = self._page_in(session_id)
+            if session is None:
+                return
+            if key:
+                session.pop(key, None)
+                self.indexes[session_id].remove(key)
+            else:
+                session.clear()
+                self.indexes[session_id] = InvertedIndex()
+            self._set_count(session_id, len(session))
+            self.dirty.add(session_id)
+    
+    def search(
+        self,
+        session_id: str,
+        query: str,
+        ranked: bool = False,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        with self.lock:
+            session = self._page_in(session_id)
+            if not session:
+                return []
+            return search_session(session, self.indexes.get(session_id), query, ranked, limit)
+    
+    def iter_entries(self) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+        with self.lock:
+            session_ids = list(self.session_index)
+        # Sessions that are not resident are read transiently so the working set stays small
+        for session_id in session_ids:
+            with self.lock:
+                session = self.resident.get(session_id)
+                session = dict(session) if session is not None else None
+            if session is None:
+                session = self._read_session(session_id)
+            for key, entry in session.items():
+                yield session_id, key, entry
+    
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "total_sessions": len(self.session_index),
+                "total_entries": self.total_entries,
+                "resident_sessions": len(self.resident),
+                "dirty_sessions": len(self.dirty),
+                "page_ins": self.page_ins,
+                "page_outs": self.page_outs
+            }
+    
+    def _run_pager(self):
+        """Background loop: flush dirty sessions and page out idle ones"""
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.save()
+                self.page_out_idle()
+            except Exception as e:
+                self.logger.error(f"Error in shard pager: {e}")
+    
+    def page_out_idle(self):
+        """Evict sessions that have not been used within idle_timeout"""
+        cutoff = time.monotonic() - self.idle_timeout
+        with self._flush_lock, self.lock:
+            idle = [sid for sid, used in self.last_used.items() if used < cutoff]
+            for session_id in idle:
+                self._page_out(session_id)
+        if idle:
+            self.logger.debug(f"Paged out {len(idle)} idle sessions")
+    
+    def save(self):
+        """
+        Write dirty sessions and the index to disk
+        Copies are taken under the lock and written after releasing it; the flush
+        lock keeps saves and page-outs from writing a session out of order
+        """
+        with self._flush_lock:
+            with self.lock:
+                sessions = {session_id: dict(self.resident[session_id]) for session_id in self.dirty if session_id in self.resident}
+                self.dirty.clear()
+                index = None
+                if self.index_dirty:
+                    index = {"shard_count": self.shard_count, "sessions": dict(self.session_index)}
+                    self.index_dirty = False
+            for session_id, session in sessions.items():
+                path = self._session_path(session_id)
+                if session:
+                    self._write_atomic(path, session)
+                elif os.path.exists(path):
+                    os.remove(path)
+            if index is not None:
+                self._write_atomic(self.index_path, index)
+    
+    def load(self):
+        """Read the session index; session data stays on disk until used"""
+        try:
+            with open(self.index_path, 'rb') as f:
+                data = json_codec.loads(f.read())
+        except FileNotFoundError:
+            self.logger.info("Memory shard index not found, starting fresh")
+            return
+        except Exception as e:
+            self.logger.error(f"Error loading memory shard index: {e}")
+            return
+        
+        with self.lock:
+            self.shard_count = data.get("shard_count", self.shard_count)
+            self.session_index = dict(data.get("sessions", {}))
+            self.total_entries = sum(self.session_index.values())
+        self.logger.info(f"Loaded shard index with {len(self.session_index)} sessions")
+    
+    def _import_legacy(self, legacy_path: str):
+        """Split an existing JSON snapshot (and journal) into per-session shards"""
+        legacy = InMemoryBackend(legacy_path, journal=os.path.exists(f"{legacy_path}.journal"))
+        try:
+            with self.lock:
+                for session_id, data in legacy.memory.items():
+                    if not data:
+                        continue
+                    self._write_atomic(self._session_path(session_id), data)
+                    self._set_count(session_id, len(data))
+            self.save()
+            self.logger.info(f"Imported {len(self.session_index)} sessions from {legacy_path}")
+        finally:
+            if legacy.journal:
+                legacy.journal.close()
+    
+    def close(self):
+        self._stop.set()
+        self._thread.join(timeout=5)
+        self.save()
+
+
+class SQLiteBackend(MemoryBackend):
+    """
+    SQLite storage engine with one row per session/key
+    Runs in WAL mode so readers never block the writer; lookups, search
+    and stats are answered by indexed queries instead of dictionary scans.
+    Safe to share between processes: batches are IMMEDIATE transactions,
+    rows carry a version for optimistic writes and triggers fill a change feed
+    """
+    
+    name = "sqlite"
+    shared = True
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS memory (
+            session_id TEXT NOT NULL,
+            key TEXT NOT NULL,
+            value TEXT NOT NULL,
+            metadata TEXT NOT NULL,
+            timestamp TEXT,
+            access_count INTEGER NOT NULL DEFAULT 0,
+            last_accessed TEXT,
+            expires_at REAL,
+            search_text TEXT NOT NULL,
+            version INTEGER NOT NULL DEFAULT 1,
+            UNIQUE (session_id, key)
+        );
+        CREATE TABLE IF NOT EXISTS memory_sessions (
+            session_id TEXT PRIMARY KEY,
+            entry_count INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TRIGGER IF NOT EXISTS memory_count_insert AFTER INSERT ON memory BEGIN
+            INSERT INTO memory_sessions (session_id, entry_count) VALUES (NEW.session_id, 1)
+            ON CONFLICT(session_id) DO UPDATE SET entry_count = entry_count + 1;
+        END;
+        CREATE TRIGGER IF NOT EXISTS memory_count_delete AFTER DELETE ON memory BEGIN
+            UPDATE memory_sessions SET entry_count = entry_count - 1 WHERE session_id = OLD.session_id;
+            DELETE FROM memory_sessions WHERE session_id = OLD.session_id AND entry_count <= 0;
+        END;
+    """
+    
+    # Created after the version column migration, since the update trigger watches it
+    CHANGE_FEED_SCHEMA = """
+        CREATE TABLE IF NOT EXISTS memory_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            key TEXT NOT NULL,
+            op TEXT NOT NULL
+        );
+        CREATE TRIGGER IF NOT EXISTS memory_change_insert AFTER INSERT ON memory BEGIN
+            INSERT INTO memory_changes (session_id, key, op) VALUES (NEW.session_id, NEW.key, 'set');
+        END;
+        CREATE TRIGGER IF NOT EXISTS memory_change_update AFTER UPDATE OF version ON memory BEGIN
+            INSERT INTO memory_changes (session_id, key, op) VALUES (NEW.session_id, NEW.key, 'set');
+        END;
+        CREATE TRIGGER IF NOT EXISTS memory_change_delete AFTER DELETE ON memory BEGIN
+            INSERT INTO memory_changes (session_id, key, op) VALUES (OLD.session_id, OLD.key, 'del');
+        END;
+    """
+    
+    # Statements are constant strings so sqlite3's statement cache reuses the prepared form
+    SQL_UPSERT = """
+        INSERT INTO memory (session_id, key, value, metadata, timestamp, access_count, last_accessed, expires_at, search_text)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(session_id, key) DO UPDATE SET
+            value = excluded.value,
+            metadata = excluded.metadata,
+            timestamp = excluded.timestamp,
+            access_count = excluded.access_count,
+            last_accessed = excluded.last_accessed,
+            expires_at = excluded.expires_at,
+            search_text = excluded.search_text,
+            version = memory.version + 1
+    """
+    SQL_GET = """
+        SELECT value, metadata, timestamp, access_count, last_accessed, expires_at, version
+        FROM memory WHERE session_id = ? AND key = ?
+    """
+    SQL_VERSION = "SELECT version FROM memory WHERE session_id = ? AND key = ?"
+    SQL_ITER = """
+        SELECT session_id, key, value, metadata, timestamp, access_count, last_accessed, expires_at, version
+        FROM memory ORDER BY rowid
+    """
+    SQL_TOUCH = """
+        UPDATE memory SET access_count = access_count + ?, last_accessed = ?
+        WHERE session_id = ? AND key = ?
+    """
+    SQL_VALUES = "SELECT key, value FROM memory WHERE session_id = ? ORDER BY rowid"
+    SQL_ENTRIES = """
+        SELECT key, value, metadata, timestamp, access_count, last_accessed, expires_at, version
+        FROM memory WHERE session_id = ? ORDER BY rowid
+    """
+    SQL_DELETE_KEY = "DELETE FROM memory WHERE session_id = ? AND key = ?"
+    SQL_DELETE_SESSION = "DELETE FROM memory WHERE session_id = ?"
+    SQL_SEARCH = """
+        SELECT key, value, metadata, timestamp, access_count, search_text FROM memory
+        WHERE session_id = ? AND instr(search_text, ?) > 0
+        ORDER BY rowid
+    """
+    SQL_STATS = "SELECT COUNT(*), COALESCE(SUM(entry_count), 0) FROM memory_sessions"
+    SQL_CHANGE_CURSOR = "SELECT COALESCE(MAX(seq), 0) FROM memory_changes"
+    SQL_CHANGE_FLOOR = "SELECT MIN(seq) FROM memory_changes"
+    SQL_CHANGES = "SELECT seq, session_id, key, op FROM memory_changes WHERE seq > ? ORDER BY seq LIMIT ?"
+    SQL_PRUNE_CHANGES = "DELETE FROM memory_changes WHERE seq <= (SELECT MAX(seq) FROM memory_changes) - ?"
+    
+    def __init__(self, db_path: str, timeout: float = 30.0, change_retention: int = 100000):
+        self.db_path = db_path
+        self.change_retention = change_retention
+        self.logger = logging.getLogger("memory_bank.sqlite")
+        self.lock = threading.RLock()
+        
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        # One shared connection serialized by the lock; Streamlit calls in from many threads
+        self.conn = sqlite3.connect(
+            db_path,
+            timeout=timeout,
+            check_same_thread=False,
+            isolation_level=None,
+            cached_statements=256
+        )
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(memory)")}
+        if "version" not in columns:
+            self.conn.execute("ALTER TABLE memory ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+        self.conn.executescript(self.CHANGE_FEED_SCHEMA)
+    
+    @property
+    def location(self) -> Optional[str]:
+        return self.db_path
+    
+    @staticmethod
+    def _encode(value: Any) -> str:
+        return json_codec.dumps_text(value)
+    
+    @staticmethod
+    def _search_text(key: str, value: Any) -> str:
+        # NUL separator keeps a query from matching across the key/value boundary
+        return f"{key.lower()}\x00{str(value).lower()}"
+    
+    def put(self, session_id: str, key: str, entry: Dict[str, Any]):
+        with self.lock:
+            self.conn.execute(self.SQL_UPSERT, (
+                session_id,
+                key,
+                self._encode(entry["value"]),
+                self._encode(entry.get("metadata", {})),
+                entry.get("timestamp"),
+                entry.get("access_count", 0),
+                entry.get("last_accessed"),
+                entry.get("expires_at"),
+                self._search_text(key, entry["value"])
+            ))
+            entry["version"] = self.conn.execute(self.SQL_VERSION, (session_id, key)).fetchone()[0]
+    
+    def get_entry(self, session_id: str, key: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            row = self.conn.execute(self.SQL_GET, (session_id, key)).fetchone()
+        if row is None:
+            return None
+        return self._decode_entry(row)
+    
+    @staticmethod
+    def _decode_entry(row: Tuple) -> Dict[str, Any]:
+        """Build an entry dict from (value, metadata, timestamp, access_count, last_accessed, expires_at, version)"""
+        entry = {
+            "value": json_codec.loads(row[0]),
+            "metadata": json_codec.loads(row[1]),
+            "timestamp": row[2],
+            "access_count": row[3],
+            "version": row[6]
+        }
+        if row[4]:
+            entry["last_accessed"] = row[4]
+        if row[5] is not None:
+            entry["expires_at"] = row[5]
+        return entry
+    
+    def touch(self, session_id: str, key: str, count_delta: int, last_accessed: str):
+        with self.lock:
+            self.conn.execute(self.SQL_TOUCH, (count_delta, last_accessed, session_id, key))
+    
+    def touch_many(self, records: List[Tuple[str, str, int, str]]):
+        with self.lock:
+            self.conn.execute("BEGIN")
+            try:
+                self.conn.executemany(self.SQL_TOUCH, [
+                    (count_delta, last_accessed, session_id, key)
+                    for session_id, key, count_delta, last_accessed in records
+                ])
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+    
+    def get_values(self, session_id: str) -> Dict[str, Any]:
+        with self.lock:
+            rows = self.conn.execute(self.SQL_VALUES, (session_id,)).fetchall()
+        return {key: json_codec.loads(value) for key, value in rows}
+    
+    def get_entries(self, session_id: str) -> Dict[str, Dict[str, Any]]:
+        with self.lock:
+            rows = self.conn.execute(self.SQL_ENTRIES, (session_id,)).fetchall()
+        return {row[0]: self._decode_entry(row[1:]) for row in rows}
+    
+    def delete(self, session_id: str, key: Optional[str] = None):
+        with self.lock:
+            if key:
+                self.conn.execute(self.SQL_DELETE_KEY, (session_id, key))
+            else:
+                self.conn.execute(self.SQL_DELETE_SESSION, (session_id,))
+    
+    def apply_batch(self, ops: Ops, expected: Optional[Versions] = None):
+        with self.lock:
+            # IMMEDIATE takes the write lock up front so version checks and writes
+            # are atomic against other processes too
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                super().apply_batch(ops, expected)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+    
+    def search(
+        self,
+        session_id: str,
+        query: str,
+        ranked: bool = False,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        with self.lock:
+            rows = self.conn.execute(self.SQL_SEARCH, (session_id, query.lower())).fetchall()
+        
+        results = []
+        query_tokens = tokenize(query)
+        now = datetime.now()
+        for key, value, metadata, timestamp, access_count, search_text in rows:
+            result = {
+                "key": key,
+                "value": json_codec.loads(value),
+                "metadata": json_codec.loads(metadata),
+                "timestamp": timestamp
+            }
+            if ranked:
+                relevance = sum(search_text.count(token) for token in query_tokens) or 1.0
+                result["score"] = rank_score(relevance, timestamp, access_count, now)
+            results.append(result)
+        
+        if ranked:
+            results.sort(key=lambda r: r["score"], reverse=True)
+        return results[:limit]
+    
+    def iter_entries(self) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+        with self.lock:
+            cursor = self.conn.cursor()
+            cursor.execute(self.SQL_ITER)
+        while True:
+            with self.lock:
+                rows = cursor.fetchmany(500)
+            if not rows:
+                break
+            for row in rows:
+                yield row[0], row[1], self._decode_entry(row[2:])
+    
+    def check_versions(self, expected: Versions):
+        with self.lock:
+            for (session_id, key), version in expected.items():
+                row = self.conn.execute(self.SQL_VERSION, (session_id, key)).fetchone()
+                actual = row[0] if row else 0
+                if actual != version:
+                    raise VersionConflictError(session_id, key, version, actual)
+    
+    def change_cursor(self) -> int:
+        with self.lock:
+            return self.conn.execute(self.SQL_CHANGE_CURSOR).fetchone()[0]
+    
+    def changes_since(self, cursor: int, limit: int = 10000) -> Tuple[int, Optional[List[Tuple[str, str, str]]]]:
+        with self.lock:
+            floor = self.conn.execute(self.SQL_CHANGE_FLOOR).fetchone()[0]
+            rows = self.conn.execute(self.SQL_CHANGES, (cursor, limit)).fetchall()
+        # Records after cursor were pruned, so the caller has to resync from scratch
+        if floor is not None and floor > cursor + 1:
+            return self.change_cursor(), None
+        if not rows:
+            return cursor, []
+        return rows[-1][0], [(session_id, key, op) for _, session_id, key, op in rows]
+    
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            total_sessions, total_entries = self.conn.execute(self.SQL_STATS).fetchone()
+            change_cursor = self.conn.execute(self.SQL_CHANGE_CURSOR).fetchone()[0]
+        return {
+            "total_sessions": total_sessions,
+            "total_entries": total_entries,
+            "change_cursor": change_cursor
+        }
+    
+    def save(self):
+        """Trim the change feed to the retention window"""
+        with self.lock:
+            self.conn.execute(self.SQL_PRUNE_CHANGES, (self.change_retention,))
+    
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -2,11 +2,179 @@
 Memory Bank for Long-term Memory Storage
 Implements persistent memory for agents across sessions
 """
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple, Callable, Iterable, Iterator
+from contextlib import contextmanager
+from itertools import chain
 from datetime import datetime
-import json
+import heapq
 import logging
-from collections import defaultdict
+import threading
+import time
+from agents.memory_backends import MemoryBackend, InMemoryBackend, VersionConflictError, entry_version
+from agents.memory_eviction import MemoryLimits, EvictionPolicy, create_policy
+from agents.memory_retrieval import MemoryRetriever
+from agents.memory_indexes import IndexSet, SecondaryIndex, matches
+from agents.memory_consolidation import MemoryConsolidator
+from agents.serialization import json_codec
+
+
+class AccessStats:
+    """
+    Buffered access counters for memory entries
+    Reads record here instead of mutating entries; a background thread
+    flushes the aggregated deltas to the backend on an interval or threshold
+    """
+    
+    def __init__(
+        self,
+        flush_fn: Callable[[List[Tuple[str, str, int, str]]], None],
+        flush_interval: float = 5.0,
+        flush_threshold: int = 500
+    ):
+        self.flush_fn = flush_fn
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self.pending: Dict[Tuple[str, str], List[float]] = {}
+        self.flushes = 0
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger("memory_bank.access_stats")
+        
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if flush_interval > 0:
+            self._thread = threading.Thread(target=self._run, name="memory-access-flusher", daemon=True)
+            self._thread.start()
+    
+    def record(self, session_id: str, key: str):
+        """Count one read of an entry"""
+        item = (session_id, key)
+        now = time.time()
+        with self.lock:
+            counters = self.pending.get(item)
+            if counters is None:
+                self.pending[item] = [1, now]
+            else:
+                counters[0] += 1
+                counters[1] = now
+            pending = len(self.pending)
+        if pending >= self.flush_threshold:
+            self._wake.set()
+    
+    def discard(self, session_id: str, key: Optional[str] = None):
+        """Drop buffered counters for a deleted entry or session"""
+        with self.lock:
+            if key:
+                self.pending.pop((session_id, key), None)
+            else:
+                for item in [item for item in self.pending if item[0] == session_id]:
+                    del self.pending[item]
+    
+    def flush(self):
+        """Push buffered counters to the backend"""
+        with self.lock:
+            if not self.pending:
+                return
+            pending, self.pending = self.pending, {}
+        records = [
+            (session_id, key, int(count), datetime.fromtimestamp(last_accessed).isoformat())
+            for (session_id, key), (count, last_accessed) in pending.items()
+        ]
+        self.flush_fn(records)
+        self.flushes += 1
+    
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                self.logger.error(f"Error flushing access stats: {e}")
+    
+    def close(self):
+        """Stop the flusher and push anything still buffered"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+
+
+class SessionLocks:
+    """
+    Striped per-session locks
+    A fixed pool keeps memory bounded; sessions hashing to the same stripe share a lock
+    """
+    
+    def __init__(self, stripes: int = 64):
+        self.locks = [threading.RLock() for _ in range(stripes)]
+    
+    def for_session(self, session_id: str) -> threading.RLock:
+        """Lock guarding a session"""
+        return self.locks[hash(session_id) % len(self.locks)]
+    
+    @contextmanager
+    def hold(self, session_ids: Iterable[str]):
+        """Hold the locks of several sessions, acquired in stripe order so callers cannot deadlock"""
+        stripes = sorted({hash(session_id) % len(self.locks) for session_id in session_ids})
+        for stripe in stripes:
+            self.locks[stripe].acquire()
+        try:
+            yield
+        finally:
+            for stripe in reversed(stripes):
+                self.locks[stripe].release()
+
+
+class MemoryTransaction:
+    """
+    Buffered batch of memory writes
+    Nothing is visible until the transaction commits; an exception discards it
+    """
+    
+    def __init__(self, bank: "MemoryBank"):
+        self.bank = bank
+        self.ops: List[Tuple[str, str, Optional[str], Optional[Dict[str, Any]]]] = []
+        self.expected: Dict[Tuple[str, str], int] = {}
+    
+    def store(
+        self,
+        session_id: str,
+        key: str,
+        value: Any,
+        metadata: Optional[Dict[str, Any]] = None,
+        ttl: Optional[float] = None,
+        expected_version: Optional[int] = None
+    ):
+        """Queue a store; with expected_version the commit fails if the entry changed"""
+        self.ops.append(("set", session_id, key, self.bank._make_entry(value, metadata, ttl)))
+        if expected_version is not None:
+            self.expected[(session_id, key)] = expected_version
+    
+    def store_many(
+        self,
+        session_id: str,
+        items: Dict[str, Any],
+        metadata: Optional[Dict[str, Any]] = None,
+        ttl: Optional[float] = None
+    ):
+        """Queue several stores for one session"""
+        for key, value in items.items():
+            self.store(session_id, key, value, metadata, ttl)
+    
+    def put(self, session_id: str, key: str, entry: Dict[str, Any], expected_version: Optional[int] = None):
+        """Queue a prebuilt entry as is, keeping its timestamp and access statistics"""
+        self.ops.append(("set", session_id, key, entry))
+        if expected_version is not None:
+            self.expected[(session_id, key)] = expected_version
+    
+    def delete(self, session_id: str, key: Optional[str] = None, expected_version: Optional[int] = None):
+        """Queue a delete of an entry or a whole session"""
+        self.ops.append(("del", session_id, key, None))
+        if expected_version is not None and key:
+            self.expected[(session_id, key)] = expected_version
 
 
 class MemoryBank:
@@ -15,116 +183,650 @@ class MemoryBank:
     Stores and retrieves information across sessions
     """
     
-    def __init__(self, storage_path: Optional[str] = None):
+    def __init__(
+        self,
+        storage_path: Optional[str] = None,
+        journal: bool = False,
+        compact_interval: float = 30.0,
+        compact_threshold: int = 1000,
+        backend: Optional[MemoryBackend] = None,
+        limits: Optional[MemoryLimits] = None,
+        spill_backend: Optional[MemoryBackend] = None,
+        access_flush_interval: float = 5.0,
+        access_flush_threshold: int = 500,
+        refresh_interval: Optional[float] = 2.0,
+        consolidation_interval: Optional[float] = None
+    ):
         self.storage_path = storage_path
-        self.memory: Dict[str, Dict[str, Any]] = defaultdict(dict)
         self.logger = logging.getLogger("memory_bank")
+        # Writes and reads of a session serialize on its stripe; the global lock is only
+        # needed for cross-session state (eviction bookkeeping, index builds, resync).
+        # Lock order is always session stripes first, then the global lock
+        self._lock = threading.RLock()
+        self.session_locks = SessionLocks()
+        self._refresh_lock = threading.Lock()
+        
+        # Default engine keeps everything in a dict persisted to storage_path
+        self.backend = backend or InMemoryBackend(
+            storage_path,
+            journal=journal,
+            compact_interval=compact_interval,
+            compact_threshold=compact_threshold
+        )
+        
+        # Reads never write; access statistics are buffered and flushed in batches
+        self.access_stats = AccessStats(
+            self.backend.touch_many,
+            flush_interval=access_flush_interval,
+            flush_threshold=access_flush_threshold
+        )
+        
+        # Capacity limits; evicted entries go to spill_backend when one is given
+        self.limits = limits if limits is not None and limits.enabled() else None
+        self.spill_backend = spill_backend
+        self.eviction_stats = {"evicted": 0, "expired": 0, "spilled": 0, "restored": 0}
+        self._policy: Optional[EvictionPolicy] = None
+        self._session_policies: Dict[str, EvictionPolicy] = {}
+        self._entry_sizes: Dict[Tuple[str, str], int] = {}
+        self._total_bytes = 0
+        self._expiry_heap: List[Tuple[float, str, str]] = []
+        self._tracked_sessions: set = set()
+        if self.limits:
+            self._init_eviction()
+        
+        # Change listeners see every applied set/del; the retriever is the first.
+        # generation is bumped when derived state is rebuilt without per-key notifications
+        self._listeners: List[Callable[[str, str, Optional[str], Optional[Dict[str, Any]]], None]] = []
+        self.generation = 0
+        self.retriever = MemoryRetriever()
+        self.subscribe(self.retriever.on_change)
+        self.secondary_indexes = IndexSet()
+        self.subscribe(self.secondary_indexes.on_change)
+        
+        # Backends shared with other processes publish a change feed; following it
+        # keeps this process's derived state (retriever, indexes, eviction) current
+        self._change_cursor = self.backend.change_cursor()
+        self._refresh_stop = threading.Event()
+        self._refresh_thread: Optional[threading.Thread] = None
+        if self.backend.shared and refresh_interval:
+            self._refresh_thread = threading.Thread(
+                target=self._follow_changes,
+                args=(refresh_interval,),
+                name="memory-change-follower",
+                daemon=True
+            )
+            self._refresh_thread.start()
         
-        # Load existing memory if storage path provided
-        if storage_path:
-            self.load()
-    
-    def store(self, session_id: str, key: str, value: Any, metadata: Optional[Dict[str, Any]] = None):
-        """Store a value in memory bank"""
-        if session_id not in self.memory:
-            self.memory[session_id] = {}
+        # Optional background merge of near-duplicate entries in recently written sessions
+        self.consolidator: Optional[MemoryConsolidator] = None
+        if consolidation_interval:
+            self.consolidator = MemoryConsolidator(self, interval=consolidation_interval)
+            self.consolidator.start()
+    
+    @property
+    def memory(self) -> Dict[str, Dict[str, Any]]:
+        """Raw session -> key -> entry mapping (in-memory backend only)"""
+        return getattr(self.backend, "memory", {})
+    
+    def store(
+        self,
+        session_id: str,
+        key: str,
+        value: Any,
+        metadata: Optional[Dict[str, Any]] = None,
+        ttl: Optional[float] = None,
+        expected_version: Optional[int] = None
+    ) -> int:
+        """
+        Store a value in memory bank, optionally expiring after ttl seconds
+        With expected_version (from get_versioned; 0 for a new key) the write is
+        rejected with VersionConflictError if another writer got there first.
+        Returns the new version
+        """
+        entry = self._make_entry(value, metadata, ttl)
+        expected = {(session_id, key): expected_version} if expected_version is not None else None
+        self._apply_ops([("set", session_id, key, entry)], expected)
+        self.logger.debug(f"Stored memory: {session_id}/{key}")
+        return entry_version(entry)
+    
+    def update(
+        self,
+        session_id: str,
+        key: str,
+        fn: Callable[[Any], Any],
+        default: Any = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        retries: int = 10
+    ) -> Any:
+        """Read-modify-write a value with optimistic retries; returns the stored value"""
+        for attempt in range(retries):
+            value, version = self.get_versioned(session_id, key, default)
+            new_value = fn(value)
+            try:
+                self.store(session_id, key, new_value, metadata, expected_version=version)
+                return new_value
+            except VersionConflictError:
+                if attempt == retries - 1:
+                    raise
+                time.sleep(0.001 * (attempt + 1))
+    
+    def store_many(
+        self,
+        session_id: str,
+        items: Dict[str, Any],
+        metadata: Optional[Dict[str, Any]] = None,
+        ttl: Optional[float] = None
+    ):
+        """Store several values for a session with a single persistence flush"""
+        with self.transaction() as txn:
+            txn.store_many(session_id, items, metadata, ttl)
+        self.logger.debug(f"Stored {len(items)} memories: {session_id}")
+    
+    def get_many(self, session_id: str, keys: Iterable[str]) -> Dict[str, Any]:
+        """Retrieve several values for a session; missing keys are omitted"""
+        missing = object()
+        values = {}
+        for key in keys:
+            value = self.get(session_id, key, missing)
+            if value is not missing:
+                values[key] = value
+        return values
+    
+    def delete_many(self, session_id: str, keys: Iterable[str]):
+        """Delete several entries from a session with a single persistence flush"""
+        with self.transaction() as txn:
+            for key in keys:
+                txn.delete(session_id, key)
+    
+    @contextmanager
+    def transaction(self) -> Iterator[MemoryTransaction]:
+        """
+        Group writes into one atomic batch
         
-        self.memory[session_id][key] = {
+        with memory_bank.transaction() as txn:
+            txn.store(session_id, "crop", "Cotton")
+            txn.delete(session_id, "old_crop")
+        """
+        txn = MemoryTransaction(self)
+        yield txn
+        if txn.ops:
+            self._apply_ops(txn.ops, txn.expected or None)
+    
+    def _make_entry(self, value: Any, metadata: Optional[Dict[str, Any]], ttl: Optional[float]) -> Dict[str, Any]:
+        """Build a fresh memory entry"""
+        entry = {
             "value": value,
             "metadata": metadata or {},
             "timestamp": datetime.now().isoformat(),
             "access_count": 0
         }
-        
-        self.logger.debug(f"Stored memory: {session_id}/{key}")
-        self.save()
+        if ttl is None and self.limits:
+            ttl = self.limits.ttl_seconds
+        if ttl is not None:
+            entry["expires_at"] = time.time() + ttl
+        return entry
+    
+    def _apply_ops(
+        self,
+        ops: List[Tuple[str, str, Optional[str], Optional[Dict[str, Any]]]],
+        expected: Optional[Dict[Tuple[str, str], int]] = None
+    ):
+        """Apply a batch of set/del ops to the backend and the bookkeeping around it"""
+        session_ids = list(dict.fromkeys(op[1] for op in ops))
+        with self._guard(session_ids):
+            for session_id in session_ids:
+                self._ensure_tracked(session_id)
+            for op, session_id, key, _ in ops:
+                if op == "del":
+                    self.access_stats.discard(session_id, key)
+            
+            self.backend.apply_batch(ops, expected)
+            for op in ops:
+                self._notify(*op)
+            
+            last_set = None
+            for op, session_id, key, entry in ops:
+                if op == "set":
+                    last_set = (session_id, key)
+                    if self.limits:
+                        self._track(session_id, key, entry)
+                    continue
+                if self.spill_backend is not None:
+                    self.spill_backend.delete(session_id, key)
+                if self.limits:
+                    if key:
+                        self._untrack((session_id, key))
+                    else:
+                        policy = self._session_policies.get(session_id)
+                        for item in (list(policy) if policy else []):
+                            self._untrack(item)
+            
+            if self.limits:
+                self._expire_due()
+                for session_id in session_ids:
+                    self._enforce_limits(session_id, exclude=last_set)
     
     def get(self, session_id: str, key: str, default: Any = None) -> Any:
         """Retrieve a value from memory bank"""
-        if session_id in self.memory and key in self.memory[session_id]:
-            memory_entry = self.memory[session_id][key]
-            memory_entry["access_count"] = memory_entry.get("access_count", 0) + 1
-            memory_entry["last_accessed"] = datetime.now().isoformat()
-            self.save()
-            return memory_entry["value"]
-        return default
+        memory_entry = self._read(session_id, key)
+        return memory_entry["value"] if memory_entry is not None else default
+    
+    def get_versioned(self, session_id: str, key: str, default: Any = None) -> Tuple[Any, int]:
+        """Retrieve (value, version); version is 0 when the key does not exist"""
+        memory_entry = self._read(session_id, key)
+        if memory_entry is None:
+            return default, 0
+        return memory_entry["value"], entry_version(memory_entry)
+    
+    def _read(self, session_id: str, key: str) -> Optional[Dict[str, Any]]:
+        """Look up a live entry, restoring spilled and dropping expired ones, and count the access"""
+        with self._guard([session_id]):
+            self._ensure_tracked(session_id)
+            memory_entry = self.backend.get_entry(session_id, key)
+            if memory_entry is None and self.spill_backend is not None:
+                memory_entry = self._restore(session_id, key)
+            if memory_entry is None:
+                return None
+            
+            if self._is_expired(memory_entry):
+                self._evict((session_id, key), "expired")
+                return None
+            
+            self.access_stats.record(session_id, key)
+            if self.limits:
+                item = (session_id, key)
+                if item not in self._entry_sizes:
+                    # Written by another process and not yet seen on the change feed
+                    self._track(session_id, key, memory_entry)
+                    self._enforce_limits(session_id, exclude=item)
+                self._policy.access(item)
+                self._session_policies[session_id].access(item)
+            return memory_entry
     
     def get_all(self, session_id: str) -> Dict[str, Any]:
         """Get all memory for a session"""
-        return {
-            key: entry["value"]
-            for key, entry in self.memory.get(session_id, {}).items()
-        }
+        if self.limits:
+            with self._guard([session_id]):
+                self._ensure_tracked(session_id)
+                self._expire_due()
+        return self.backend.get_values(session_id)
     
     def delete(self, session_id: str, key: Optional[str] = None):
         """Delete memory entry or entire session"""
+        self._apply_ops([("del", session_id, key, None)])
         if key:
-            if session_id in self.memory and key in self.memory[session_id]:
-                del self.memory[session_id][key]
-                self.logger.debug(f"Deleted memory: {session_id}/{key}")
+            self.logger.debug(f"Deleted memory: {session_id}/{key}")
         else:
-            if session_id in self.memory:
-                del self.memory[session_id]
-                self.logger.debug(f"Deleted session: {session_id}")
-        self.save()
-    
-    def search(self, session_id: str, query: str) -> List[Dict[str, Any]]:
-        """Search memory entries by query"""
-        results = []
-        if session_id in self.memory:
-            query_lower = query.lower()
-            for key, entry in self.memory[session_id].items():
-                value_str = str(entry["value"]).lower()
-                if query_lower in key.lower() or query_lower in value_str:
-                    results.append({
-                        "key": key,
-                        "value": entry["value"],
-                        "metadata": entry.get("metadata", {}),
-                        "timestamp": entry.get("timestamp")
-                    })
+            self.logger.debug(f"Deleted session: {session_id}")
+    
+    def search(
+        self,
+        session_id: str,
+        query: str,
+        ranked: bool = False,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Search memory entries by query
+        ranked=True orders results by term frequency, recency and access count
+        """
+        if self.limits:
+            with self._guard([session_id]):
+                self._ensure_tracked(session_id)
+                self._expire_due()
+        return self.backend.search(session_id, query, ranked=ranked, limit=limit)
+    
+    def retrieve(
+        self,
+        session_id: str,
+        query: str,
+        top_k: int = 5,
+        token_budget: Optional[int] = None
+    ) -> List[Tuple[str, Any]]:
+        """
+        Memories most relevant to query as (key, value) pairs
+        BM25 matches come first, then recent entries, within top_k and token_budget
+        """
+        with self._guard([session_id]):
+            memory = self.get_all(session_id)
+            return self.retriever.select(session_id, query, memory, top_k=top_k, token_budget=token_budget)
+    
+    def create_index(self, field: str, kind: str = "hash") -> SecondaryIndex:
+        """
+        Index a metadata field (or timestamp) across all sessions
+        kind="hash" serves equality lookups, kind="sorted" also serves ranges
+        """
+        with self._lock:
+            entries = self.backend.iter_entries()
+            if self.spill_backend is not None:
+                entries = chain(entries, self.spill_backend.iter_entries())
+            index = self.secondary_indexes.create(field, kind, entries)
+        self.logger.info(f"Created {kind} index on {field}: {len(index)} entries")
+        return index
+    
+    def drop_index(self, field: str):
+        """Remove a secondary index"""
+        self.secondary_indexes.drop(field)
+    
+    def query(
+        self,
+        where: Optional[Dict[str, Any]] = None,
+        ranges: Optional[Dict[str, Tuple[Any, Any]]] = None,
+        session_id: Optional[str] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Find entries across sessions by metadata
+        where maps field -> value (or a list of accepted values),
+        ranges maps field -> (low, high) with None for an open end;
+        at least one condition must be backed by an index
+        
+        memory_bank.query(where={"district": "Salem", "crop": "Cotton"},
+                          ranges={"timestamp": ("2024-06-01", None)})
+        """
+        with self._lock:
+            items, where_rest, ranges_rest = self.secondary_indexes.match(where, ranges)
+            if items is None:
+                raise ValueError("Query needs at least one indexed field; call create_index first")
+            
+            results = []
+            for item_session, key in sorted(items):
+                if session_id is not None and item_session != session_id:
+                    continue
+                entry = self._peek(item_session, key)
+                if entry is None or self._is_expired(entry) or not matches(entry, where_rest, ranges_rest):
+                    continue
+                results.append({
+                    "session_id": item_session,
+                    "key": key,
+                    "value": entry["value"],
+                    "metadata": entry.get("metadata", {}),
+                    "timestamp": entry.get("timestamp")
+                })
+                if limit is not None and len(results) >= limit:
+                    break
         return results
     
-    def save(self):
-        """Save memory to disk"""
-        if self.storage_path:
+    def query_sessions(
+        self,
+        where: Optional[Dict[str, Any]] = None,
+        ranges: Optional[Dict[str, Tuple[Any, Any]]] = None
+    ) -> List[str]:
+        """Session ids with at least one matching entry; answered from indexes alone when possible"""
+        with self._lock:
+            items, where_rest, ranges_rest = self.secondary_indexes.match(where, ranges)
+            if items is None:
+                raise ValueError("Query needs at least one indexed field; call create_index first")
+            if not where_rest and not ranges_rest:
+                return sorted({item_session for item_session, _ in items})
+        return sorted({result["session_id"] for result in self.query(where, ranges)})
+    
+    def _peek(self, session_id: str, key: str) -> Optional[Dict[str, Any]]:
+        """Read an entry from the primary or spill backend without counting an access"""
+        entry = self.backend.get_entry(session_id, key)
+        if entry is None and self.spill_backend is not None:
+            entry = self.spill_backend.get_entry(session_id, key)
+        return entry
+    
+    def refresh(self) -> int:
+        """
+        Catch up with writes made by other processes through the backend change feed
+        Returns the number of changed entries applied
+        """
+        with self._refresh_lock:
+            cursor, changes = self.backend.changes_since(self._change_cursor)
+            if changes is None:
+                with self._lock:
+                    self._resync()
+                self._change_cursor = cursor
+                return 0
+            
+            changed = list(dict.fromkeys((session_id, key) for session_id, key, _ in changes))
+            for session_id, key in changed:
+                # Re-read under the session lock so notifications cannot overtake a local write
+                with self._guard([session_id]):
+                    entry = self.backend.get_entry(session_id, key)
+                    if entry is None:
+                        self.access_stats.discard(session_id, key)
+                        self._notify("del", session_id, key, None)
+                        if self.limits:
+                            self._untrack((session_id, key))
+                    else:
+                        self._notify("set", session_id, key, entry)
+                        if self.limits and (not self.backend.lazy or session_id in self._tracked_sessions):
+                            self._track(session_id, key, entry)
+            if self.limits:
+                with self._lock:
+                    self._expire_due()
+            self._change_cursor = cursor
+        if changed:
+            self.logger.debug(f"Refreshed {len(changed)} changed memories")
+        return len(changed)
+    
+    def _resync(self):
+        """Rebuild derived state after falling behind the change feed"""
+        self.logger.warning("Change feed truncated past our cursor; rebuilding derived memory state")
+        self.generation += 1
+        with self.retriever.lock:
+            self.retriever.sessions.clear()
+        for field, index in list(self.secondary_indexes.indexes.items()):
+            self.create_index(field, index.kind)
+        if self.limits:
+            self._session_policies = {}
+            self._entry_sizes = {}
+            self._total_bytes = 0
+            self._expiry_heap = []
+            self._tracked_sessions = set()
+            self._init_eviction()
+    
+    def _follow_changes(self, interval: float):
+        while not self._refresh_stop.wait(interval):
             try:
-                # Convert to JSON-serializable format
-                serializable = {}
-                for session_id, data in self.memory.items():
-                    serializable[session_id] = {}
-                    for key, entry in data.items():
-                        serializable[session_id][key] = {
-                            "value": entry["value"],
-                            "metadata": entry.get("metadata", {}),
-                            "timestamp": entry.get("timestamp"),
-                            "access_count": entry.get("access_count", 0)
-                        }
-                
-                with open(self.storage_path, 'w') as f:
-                    json.dump(serializable, f, indent=2)
+                self.refresh()
             except Exception as e:
-                self.logger.error(f"Error saving memory: {e}")
+                self.logger.error(f"Error following memory change feed: {e}")
+    
+    @contextmanager
+    def _guard(self, session_ids: Iterable[str]):
+        """Lock the given sessions, plus the global lock when eviction bookkeeping is shared"""
+        with self.session_locks.hold(session_ids):
+            if self.limits:
+                with self._lock:
+                    yield
+            else:
+                yield
+    
+    def _count(self, name: str):
+        """Bump an eviction counter"""
+        with self._lock:
+            self.eviction_stats[name] += 1
+    
+    def subscribe(self, listener: Callable[[str, str, Optional[str], Optional[Dict[str, Any]]], None]):
+        """Register listener(op, session_id, key, entry); op is set, del or spill"""
+        self._listeners.append(listener)
+    
+    def _notify(self, op: str, session_id: str, key: Optional[str], entry: Optional[Dict[str, Any]]):
+        """Tell listeners about an applied change"""
+        for listener in self._listeners:
+            listener(op, session_id, key, entry)
+    
+    @staticmethod
+    def _entry_size(key: str, value: Any) -> int:
+        """Approximate serialized size of an entry in bytes"""
+        return len(key) + len(json_codec.dumps(value))
+    
+    @staticmethod
+    def _is_expired(entry: Dict[str, Any]) -> bool:
+        expires_at = entry.get("expires_at")
+        return expires_at is not None and expires_at <= time.time()
+    
+    def _init_eviction(self):
+        """Seed eviction bookkeeping from entries already in the backend"""
+        self._policy = create_policy(self.limits.policy)
+        if self.backend.lazy:
+            # Sessions are seeded on first use so startup does not page everything in
+            return
+        self._seed(self.backend.iter_entries())
+        for session_id in list(self._session_policies):
+            self._enforce_limits(session_id)
+    
+    def _ensure_tracked(self, session_id: str):
+        """Seed bookkeeping for a session of a lazy backend on first use"""
+        if not self.limits or not self.backend.lazy or session_id in self._tracked_sessions:
+            return
+        self._tracked_sessions.add(session_id)
+        entries = self.backend.get_entries(session_id)
+        self._seed((session_id, key, entry) for key, entry in entries.items())
+        self._enforce_limits(session_id)
+    
+    def _seed(self, entries):
+        """Track existing (session_id, key, entry) triples, oldest use first"""
+        ordered = sorted(
+            entries,
+            key=lambda item: item[2].get("last_accessed") or item[2].get("timestamp") or ""
+        )
+        for session_id, key, entry in ordered:
+            self._track(session_id, key, entry)
+            access_count = entry.get("access_count", 0)
+            if self.limits.policy == "lfu" and access_count:
+                self._policy.insert((session_id, key), count=access_count + 1)
+                self._session_policies[session_id].insert((session_id, key), count=access_count + 1)
+        self._expire_due()
+    
+    def _track(self, session_id: str, key: str, entry: Dict[str, Any]):
+        """Register a stored entry with the eviction policies"""
+        item = (session_id, key)
+        expires_at = entry.get("expires_at")
+        
+        size = self._entry_size(key, entry["value"])
+        self._total_bytes += size - self._entry_sizes.get(item, 0)
+        self._entry_sizes[item] = size
+        
+        if session_id not in self._session_policies:
+            self._session_policies[session_id] = create_policy(self.limits.policy)
+        if self.limits.policy == "lfu":
+            # Entries carrying access history (e.g. merged by consolidation) keep their frequency
+            count = entry.get("access_count", 0) + 1
+            self._policy.insert(item, expires_at, count=count)
+            self._session_policies[session_id].insert(item, expires_at, count=count)
+        else:
+            self._policy.insert(item, expires_at)
+            self._session_policies[session_id].insert(item, expires_at)
+        
+        if expires_at is not None:
+            heapq.heappush(self._expiry_heap, (expires_at, session_id, key))
+    
+    def _untrack(self, item: Tuple[str, str]):
+        """Forget an entry in the eviction bookkeeping"""
+        self._total_bytes -= self._entry_sizes.pop(item, 0)
+        self._policy.remove(item)
+        policy = self._session_policies.get(item[0])
+        if policy is not None:
+            policy.remove(item)
+            if not len(policy):
+                del self._session_policies[item[0]]
+    
+    def _evict(self, item: Tuple[str, str], reason: str = "evicted"):
+        """Remove an entry, spilling it first when evicted for capacity"""
+        session_id, key = item
+        spilled = False
+        if reason == "evicted" and self.spill_backend is not None:
+            entry = self.backend.get_entry(session_id, key)
+            if entry is not None:
+                self.spill_backend.put(session_id, key, entry)
+                self._count("spilled")
+                spilled = True
+        self.access_stats.discard(session_id, key)
+        self.backend.delete(session_id, key)
+        self._notify("spill" if spilled else "del", session_id, key, None)
+        if self.limits:
+            self._untrack(item)
+        self._count(reason)
+        self.logger.debug(f"Memory {reason}: {session_id}/{key}")
+    
+    def _restore(self, session_id: str, key: str) -> Optional[Dict[str, Any]]:
+        """Bring a spilled entry back into the primary backend"""
+        entry = self.spill_backend.get_entry(session_id, key)
+        if entry is None:
+            return None
+        self.spill_backend.delete(session_id, key)
+        if self._is_expired(entry):
+            return None
+        self.backend.put(session_id, key, entry)
+        self._notify("set", session_id, key, entry)
+        self._count("restored")
+        if self.limits:
+            self._track(session_id, key, entry)
+            self._enforce_limits(session_id, exclude=(session_id, key))
+        return entry
+    
+    def _expire_due(self):
+        """Drop entries whose TTL has passed"""
+        now = time.time()
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            expires_at, session_id, key = heapq.heappop(self._expiry_heap)
+            entry = self.backend.get_entry(session_id, key)
+            # Skip stale heap records for entries that were overwritten or deleted
+            if entry is not None and entry.get("expires_at") == expires_at:
+                self._evict((session_id, key), "expired")
+    
+    def _enforce_limits(self, session_id: str, exclude: Optional[Tuple[str, str]] = None):
+        """Evict until the session and the whole bank are within limits"""
+        limits = self.limits
+        session_policy = self._session_policies.get(session_id)
+        if limits.max_entries_per_session is not None and session_policy is not None:
+            while len(session_policy) > limits.max_entries_per_session:
+                victim = session_policy.victim(exclude)
+                if victim is None:
+                    break
+                self._evict(victim)
+        
+        while (
+            (limits.max_total_entries is not None and len(self._policy) > limits.max_total_entries) or
+            (limits.max_bytes is not None and self._total_bytes > limits.max_bytes)
+        ):
+            victim = self._policy.victim(exclude)
+            if victim is None:
+                break
+            self._evict(victim)
+    
+    def save(self):
+        """Save memory to disk"""
+        self.access_stats.flush()
+        self.backend.save()
     
     def load(self):
         """Load memory from disk"""
-        if self.storage_path:
-            try:
-                with open(self.storage_path, 'r') as f:
-                    data = json.load(f)
-                    self.memory = defaultdict(dict, data)
-                self.logger.info(f"Loaded memory from {self.storage_path}")
-            except FileNotFoundError:
-                self.logger.info("Memory file not found, starting fresh")
-            except Exception as e:
-                self.logger.error(f"Error loading memory: {e}")
+        self.backend.load()
+    
+    def close(self):
+        """Flush pending writes and release backend resources"""
+        self._refresh_stop.set()
+        if self._refresh_thread is not None:
+            self._refresh_thread.join(timeout=5)
+        if self.consolidator is not None:
+            self.consolidator.stop()
+        self.access_stats.close()
+        self.backend.close()
+        if self.spill_backend is not None:
+            self.spill_backend.close()
     
     def get_stats(self) -> Dict[str, Any]:
         """Get memory bank statistics"""
-        total_sessions = len(self.memory)
-        total_entries = sum(len(session_data) for session_data in self.memory.values())
-        
-        return {
-            "total_sessions": total_sessions,
-            "total_entries": total_entries,
-            "storage_path": self.storage_path
+        stats = {
+            "backend": self.backend.name,
+            "storage_path": self.storage_path or self.backend.location
         }
+        stats.update(self.backend.stats())
+        stats["pending_access_records"] = len(self.access_stats.pending)
+        stats["retriever"] = {"sessions": len(self.retriever.sessions), "dropped": self.retriever.dropped}
+        if self.limits or self.spill_backend is not None:
+            with self._lock:
+                stats["evictions"] = dict(self.eviction_stats)
+                stats["total_bytes"] = self._total_bytes
+        if self.consolidator is not None:
+            stats["consolidation"] = dict(self.consolidator.stats)
+        indexes = self.secondary_indexes.describe()
+        if indexes:
+            stats["indexes"] = indexes
+        return stats
@@ -0,0 +1,253 @@
+"""
+Memory Consolidation
+Background deduplication of near-duplicate memory entries per session
+using character shingles, MinHash signatures and LSH banding
+"""
+from typing import Dict, Any, Optional, List, Set
+from datetime import datetime
+import logging
+import threading
+import time
+import zlib
+import numpy as np
+from agents.memory_index import tokenize
+from agents.memory_backends import VersionConflictError, entry_version
+
+# Hashes are reduced modulo a Mersenne prime so a * h + b fits in uint64
+MERSENNE_PRIME = (1 << 31) - 1
+
+
+class MinHasher:
+    """MinHash signatures over character shingles of normalized text"""
+    
+    def __init__(self, num_perm: int = 64, shingle_size: int = 3, seed: int = 7):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, MERSENNE_PRIME, size=num_perm).astype(np.uint64)
+        self.b = rng.randint(0, MERSENNE_PRIME, size=num_perm).astype(np.uint64)
+    
+    def shingles(self, value: Any) -> Set[str]:
+        """Character shingles of the normalized text of value"""
+        text = " ".join(tokenize(str(value)))
+        if len(text) <= self.shingle_size:
+            return {text}
+        return {text[i:i + self.shingle_size] for i in range(len(text) - self.shingle_size + 1)}
+    
+    def signature(self, shingles: Set[str]) -> np.ndarray:
+        """Minimum of each permutation hash over the shingles"""
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode("utf-8")) % MERSENNE_PRIME for shingle in shingles),
+            dtype=np.uint64,
+            count=len(shingles)
+        )
+        permuted = (hashes[:, None] * self.a + self.b) % MERSENNE_PRIME
+        return permuted.min(axis=0)
+
+
+def jaccard(first: Set[str], second: Set[str]) -> float:
+    """Exact Jaccard similarity of two shingle sets"""
+    if not first and not second:
+        return 1.0
+    return len(first & second) / len(first | second)
+
+
+class MemoryConsolidator:
+    """
+    Periodic merge of near-duplicate entries within a session
+    Entries are duplicates when their values are similar (MinHash/LSH candidates
+    confirmed by exact Jaccard) and their keys are similar too. Only sessions
+    written since the last pass are scanned; in each cluster the newest entry
+    survives and records the others in its metadata
+    """
+    
+    def __init__(
+        self,
+        memory_bank: Any,
+        threshold: float = 0.7,
+        key_threshold: float = 0.5,
+        num_perm: int = 64,
+        bands: int = 16,
+        interval: float = 300.0,
+        min_entries: int = 2
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.memory_bank = memory_bank
+        self.threshold = threshold
+        self.key_threshold = key_threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.interval = interval
+        self.min_entries = min_entries
+        self.hasher = MinHasher(num_perm=num_perm)
+        self.logger = logging.getLogger("memory_bank.consolidation")
+        
+        self.dirty: Set[str] = set()
+        self.lock = threading.Lock()
+        self.stats = {"passes": 0, "sessions_scanned": 0, "entries_merged": 0, "conflicts": 0}
+        
+        # Writes made by the consolidator itself must not re-mark the session dirty
+        self._local = threading.local()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        memory_bank.subscribe(self.on_change)
+    
+    def on_change(self, op: str, session_id: str, key: Optional[str], entry: Optional[Dict[str, Any]]):
+        """MemoryBank listener: remember which sessions were written"""
+        if getattr(self._local, "active", False):
+            return
+        with self.lock:
+            if op == "set":
+                self.dirty.add(session_id)
+            elif op == "del" and not key:
+                self.dirty.discard(session_id)
+    
+    def start(self):
+        """Run passes on a daemon thread every interval seconds"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="memory-consolidator", daemon=True)
+            self._thread.start()
+    
+    def stop(self):
+        """Stop the background thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                self.logger.error(f"Error consolidating memory: {e}")
+    
+    def run_once(self) -> Dict[str, int]:
+        """Consolidate every session touched since the last pass"""
+        with self.lock:
+            sessions, self.dirty = self.dirty, set()
+        
+        # Merges carry access counts over to the survivor, so buffered reads must land first
+        if sessions:
+            self.memory_bank.access_stats.flush()
+        
+        merged = 0
+        for session_id in sessions:
+            try:
+                merged += self.consolidate_session(session_id)
+            except VersionConflictError:
+                # A concurrent write won; the session is dirty again and retried next pass
+                self.stats["conflicts"] += 1
+                with self.lock:
+                    self.dirty.add(session_id)
+        
+        self.stats["passes"] += 1
+        self.stats["sessions_scanned"] += len(sessions)
+        self.stats["entries_merged"] += merged
+        if merged:
+            self.logger.info(f"Consolidated {merged} memories across {len(sessions)} sessions")
+        return {"sessions": len(sessions), "merged": merged}
+    
+    def consolidate_session(self, session_id: str) -> int:
+        """Merge near-duplicate entries of one session; returns how many were removed"""
+        now = time.time()
+        entries = {
+            key: entry
+            for key, entry in self.memory_bank.backend.get_entries(session_id).items()
+            if entry.get("expires_at") is None or entry["expires_at"] > now
+        }
+        if len(entries) < self.min_entries:
+            return 0
+        
+        clusters = self._clusters(entries)
+        if not clusters:
+            return 0
+        
+        removed = 0
+        self._local.active = True
+        try:
+            with self.memory_bank.transaction() as txn:
+                for cluster in clusters:
+                    removed += self._merge(txn, session_id, cluster, entries)
+        finally:
+            self._local.active = False
+        return removed
+    
+    def _clusters(self, entries: Dict[str, Dict[str, Any]]) -> List[List[str]]:
+        """Groups of keys whose entries are near duplicates"""
+        keys = list(entries)
+        shingles = [self.hasher.shingles(entries[key]["value"]) for key in keys]
+        key_shingles = [self.hasher.shingles(key) for key in keys]
+        signatures = [self.hasher.signature(s) for s in shingles]
+        
+        parent = list(range(len(keys)))
+        
+        def find(node: int) -> int:
+            while parent[node] != node:
+                parent[node] = parent[parent[node]]
+                node = parent[node]
+            return node
+        
+        def similar(i: int, j: int) -> bool:
+            return (
+                jaccard(shingles[i], shingles[j]) >= self.threshold
+                and jaccard(key_shingles[i], key_shingles[j]) >= self.key_threshold
+            )
+        
+        # LSH banding: entries sharing a band are candidates. Each member is checked
+        # against one representative per cluster already in the bucket rather than
+        # every other member, so large buckets of duplicates stay linear
+        for band in range(self.bands):
+            buckets: Dict[bytes, List[int]] = {}
+            start = band * self.rows
+            for position, signature in enumerate(signatures):
+                buckets.setdefault(signature[start:start + self.rows].tobytes(), []).append(position)
+            for members in buckets.values():
+                if len(members) < 2:
+                    continue
+                representatives: List[int] = []
+                for member in members:
+                    root = find(member)
+                    for representative in representatives:
+                        if find(representative) == root:
+                            break
+                        if similar(member, representative):
+                            parent[root] = find(representative)
+                            break
+                    else:
+                        representatives.append(member)
+        
+        groups: Dict[int, List[str]] = {}
+        for position, key in enumerate(keys):
+            groups.setdefault(find(position), []).append(key)
+        return [group for group in groups.values() if len(group) > 1]
+    
+    def _merge(self, txn: Any, session_id: str, cluster: List[str], entries: Dict[str, Dict[str, Any]]) -> int:
+        """
+        Keep the newest entry of a cluster and fold the rest into its provenance
+        The survivor keeps its timestamp and takes the summed access counts and latest
+        access of the cluster, so LRU/LFU eviction still sees how the fact was used
+        """
+        cluster.sort(key=lambda key: entries[key].get("timestamp") or "")
+        keep = cluster[-1]
+        kept = entries[keep]
+        
+        metadata = dict(kept.get("metadata") or {})
+        provenance = list(metadata.get("consolidated_from", []))
+        for key in cluster[:-1]:
+            provenance.append({"key": key, "timestamp": entries[key].get("timestamp")})
+            provenance.extend((entries[key].get("metadata") or {}).get("consolidated_from", []))
+            txn.delete(session_id, key, expected_version=entry_version(entries[key]))
+        metadata["consolidated_from"] = provenance
+        metadata["consolidated_at"] = datetime.now().isoformat()
+        
+        merged = dict(kept, metadata=metadata)
+        merged.pop("version", None)
+        merged["access_count"] = sum(entries[key].get("access_count", 0) for key in cluster)
+        accessed = [entries[key]["last_accessed"] for key in cluster if entries[key].get("last_accessed")]
+        if accessed:
+            merged["last_accessed"] = max(accessed)
+        txn.put(session_id, keep, merged, expected_version=entry_version(kept))
+        self.logger.debug(f"Merged {cluster[:-1]} into {session_id}/{keep}")
+        return len(cluster) - 1
@@ -0,0 +1,235 @@
+"""
+Eviction Policies for the Memory Bank
+Capacity limits and O(1) bookkeeping for deciding which entries to drop
+"""
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Tuple, Hashable
+from dataclasses import dataclass
+from collections import OrderedDict
+import heapq
+import itertools
+
+
+@dataclass
+class MemoryLimits:
+    """Capacity limits for a memory bank; None disables a limit"""
+    max_entries_per_session: Optional[int] = None
+    max_total_entries: Optional[int] = None
+    max_bytes: Optional[int] = None
+    ttl_seconds: Optional[float] = None
+    policy: str = "lru"
+    
+    def enabled(self) -> bool:
+        return any(limit is not None for limit in (
+            self.max_entries_per_session,
+            self.max_total_entries,
+            self.max_bytes,
+            self.ttl_seconds
+        ))
+
+
+class EvictionPolicy(ABC):
+    """
+    Base class for eviction policies
+    Items are opaque hashables, e.g. (session_id, key) tuples
+    """
+    
+    name = "base"
+    
+    @abstractmethod
+    def insert(self, item: Hashable, expires_at: Optional[float] = None):
+        """Track a newly stored (or overwritten) item"""
+        pass
+    
+    @abstractmethod
+    def access(self, item: Hashable):
+        """Record a read of an item"""
+        pass
+    
+    @abstractmethod
+    def remove(self, item: Hashable):
+        """Stop tracking an item"""
+        pass
+    
+    @abstractmethod
+    def victim(self, exclude: Optional[Hashable] = None) -> Optional[Hashable]:
+        """Next item to evict, skipping exclude"""
+        pass
+    
+    @abstractmethod
+    def __len__(self) -> int:
+        pass
+    
+    @abstractmethod
+    def __iter__(self):
+        pass
+
+
+class LRUPolicy(EvictionPolicy):
+    """Least recently used, driven by get/store order"""
+    
+    name = "lru"
+    
+    def __init__(self):
+        self.order: "OrderedDict[Hashable, None]" = OrderedDict()
+    
+    def insert(self, item: Hashable, expires_at: Optional[float] = None):
+        self.order[item] = None
+        self.order.move_to_end(item)
+    
+    def access(self, item: Hashable):
+        if item in self.order:
+            self.order.move_to_end(item)
+    
+    def remove(self, item: Hashable):
+        self.order.pop(item, None)
+    
+    def victim(self, exclude: Optional[Hashable] = None) -> Optional[Hashable]:
+        for item in self.order:
+            if item != exclude:
+                return item
+        return None
+    
+    def __len__(self) -> int:
+        return len(self.order)
+    
+    def __iter__(self):
+        return iter(list(self.order))
+
+
+class LFUPolicy(EvictionPolicy):
+    """
+    Least frequently used with O(1) updates
+    Items live in per-frequency buckets; ties break by least recent use
+    """
+    
+    name = "lfu"
+    
+    def __init__(self):
+        self.freq: Dict[Hashable, int] = {}
+        self.buckets: Dict[int, "OrderedDict[Hashable, None]"] = {}
+        self.min_freq = 0
+    
+    def _unlink(self, item: Hashable) -> int:
+        count = self.freq[item]
+        bucket = self.buckets[count]
+        del bucket[item]
+        if not bucket:
+            del self.buckets[count]
+            if self.min_freq == count:
+                self.min_freq = count + 1
+        return count
+    
+    def _link(self, item: Hashable, count: int):
+        self.freq[item] = count
+        self.buckets.setdefault(count, OrderedDict())[item] = None
+    
+    def insert(self, item: Hashable, expires_at: Optional[float] = None, count: int = 1):
+        if item in self.freq:
+            count = max(count, self._unlink(item))
+        self._link(item, count)
+        if len(self.freq) == 1 or count < self.min_freq or self.min_freq not in self.buckets:
+            self.min_freq = count
+    
+    def access(self, item: Hashable):
+        if item not in self.freq:
+            return
+        count = self._unlink(item)
+        self._link(item, count + 1)
+    
+    def remove(self, item: Hashable):
+        if item not in self.freq:
+            return
+        self._unlink(item)
+        del self.freq[item]
+        if self.buckets and self.min_freq not in self.buckets:
+            self.min_freq = min(self.buckets)
+    
+    def victim(self, exclude: Optional[Hashable] = None) -> Optional[Hashable]:
+        if not self.freq:
+            return None
+        for item in self.buckets.get(self.min_freq, ()):
+            if item != exclude:
+                return item
+        # Only reached when exclude is alone in the lowest bucket
+        for count in sorted(c for c in self.buckets if c != self.min_freq):
+            for item in self.buckets[count]:
+                if item != exclude:
+                    return item
+        return None
+    
+    def __len__(self) -> int:
+        return len(self.freq)
+    
+    def __iter__(self):
+        return iter(list(self.freq))
+
+
+class TTLPolicy(EvictionPolicy):
+    """
+    Soonest-to-expire first; items without a TTL go last in insertion order
+    Uses a heap with lazy deletion, so updates are O(log n)
+    """
+    
+    name = "ttl"
+    
+    def __init__(self):
+        self.heap = []
+        self.live: Dict[Hashable, Tuple[float, int]] = {}
+        self._counter = itertools.count()
+    
+    def insert(self, item: Hashable, expires_at: Optional[float] = None):
+        marker = (expires_at if expires_at is not None else float("inf"), next(self._counter))
+        self.live[item] = marker
+        heapq.heappush(self.heap, (marker[0], marker[1], item))
+        if len(self.heap) > 2 * len(self.live) + 64:
+            self.heap = [(m[0], m[1], i) for i, m in self.live.items()]
+            heapq.heapify(self.heap)
+    
+    def access(self, item: Hashable):
+        pass
+    
+    def remove(self, item: Hashable):
+        self.live.pop(item, None)
+    
+    def _prune(self):
+        """Drop stale heap entries left behind by removals and re-inserts"""
+        while self.heap:
+            expires_at, seq, item = self.heap[0]
+            if self.live.get(item) == (expires_at, seq):
+                return
+            heapq.heappop(self.heap)
+    
+    def victim(self, exclude: Optional[Hashable] = None) -> Optional[Hashable]:
+        self._prune()
+        if not self.heap:
+            return None
+        top = self.heap[0]
+        if top[2] != exclude:
+            return top[2]
+        heapq.heappop(self.heap)
+        self._prune()
+        runner_up = self.heap[0][2] if self.heap else None
+        heapq.heappush(self.heap, top)
+        return runner_up
+    
+    def __len__(self) -> int:
+        return len(self.live)
+    
+    def __iter__(self):
+        return iter(list(self.live))
+
+
+POLICIES = {
+    LRUPolicy.name: LRUPolicy,
+    LFUPolicy.name: LFUPolicy,
+    TTLPolicy.name: TTLPolicy
+}
+
+
+def create_policy(name: str) -> EvictionPolicy:
+    """Instantiate an eviction policy by name"""
+    try:
+        return POLICIES[name.lower()]()
+    except KeyError:
+        raise ValueError(f"Unknown eviction policy '{name}'. Available: {', '.join(POLICIES)}")
@@ -0,0 +1,165 @@
+"""
+Inverted Index for Memory Bank Search
+Incrementally maintained token postings that answer substring queries
+without rescanning every stored value
+"""
+from typing import Dict, Any, Optional, List, Set
+from datetime import datetime
+import math
+import re
+
+
+TOKEN_PATTERN = re.compile(r"[^\W_]+")
+GRAM_SIZE = 3
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase word tokens"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def grams(term: str) -> Set[str]:
+    """Character trigrams of a vocabulary term"""
+    return {term[i:i + GRAM_SIZE] for i in range(len(term) - GRAM_SIZE + 1)}
+
+
+def recency_weight(timestamp: Optional[str], now: Optional[datetime] = None, half_life_hours: float = 24.0) -> float:
+    """Decay in [0, 1] based on an entry's ISO timestamp"""
+    if not timestamp:
+        return 0.0
+    try:
+        age = ((now or datetime.now()) - datetime.fromisoformat(timestamp)).total_seconds()
+    except (TypeError, ValueError):
+        return 0.0
+    return 0.5 ** (max(age, 0.0) / 3600.0 / half_life_hours)
+
+
+def rank_score(relevance: float, timestamp: Optional[str], access_count: int, now: Optional[datetime] = None) -> float:
+    """Combine term relevance with recency and access frequency"""
+    return relevance * (1.0 + 0.5 * recency_weight(timestamp, now)) + 0.1 * math.log1p(access_count or 0)
+
+
+class InvertedIndex:
+    """
+    Token -> {key: term frequency} postings for a single session
+    Keys and the string form of values are both indexed, and a trigram
+    index over the vocabulary resolves partial tokens without a full scan
+    """
+    
+    def __init__(self):
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.doc_terms: Dict[str, Dict[str, int]] = {}
+        self.term_grams: Dict[str, Set[str]] = {}
+    
+    def __len__(self) -> int:
+        return len(self.doc_terms)
+    
+    def add(self, key: str, value: Any):
+        """Index (or re-index) an entry"""
+        if key in self.doc_terms:
+            self.remove(key)
+        
+        terms: Dict[str, int] = {}
+        for token in tokenize(key) + tokenize(str(value)):
+            terms[token] = terms.get(token, 0) + 1
+        
+        self.doc_terms[key] = terms
+        for token, tf in terms.items():
+            docs = self.postings.get(token)
+            if docs is None:
+                docs = self.postings[token] = {}
+                for gram in grams(token):
+                    self.term_grams.setdefault(gram, set()).add(token)
+            docs[key] = tf
+    
+    def remove(self, key: str):
+        """Drop an entry from the index"""
+        terms = self.doc_terms.pop(key, None)
+        if not terms:
+            return
+        for token in terms:
+            docs = self.postings.get(token)
+            if docs is None:
+                continue
+            docs.pop(key, None)
+            if not docs:
+                del self.postings[token]
+                for gram in grams(token):
+                    terms_with_gram = self.term_grams.get(gram)
+                    if terms_with_gram is not None:
+                        terms_with_gram.discard(token)
+                        if not terms_with_gram:
+                            del self.term_grams[gram]
+    
+    def _terms_containing(self, token: str) -> List[str]:
+        """Vocabulary terms that contain token as a substring"""
+        if len(token) < GRAM_SIZE:
+            return [term for term in self.postings if token in term]
+        
+        candidates: Optional[Set[str]] = None
+        for gram in sorted(grams(token), key=lambda g: len(self.term_grams.get(g, ()))):
+            terms = self.term_grams.get(gram)
+            if not terms:
+                return []
+            candidates = set(terms) if candidates is None else candidates & terms
+            if not candidates:
+                return []
+        return [term for term in candidates if token in term]
+    
+    def _matching_terms(self, query_tokens: List[str]) -> List[List[str]]:
+        """
+        Vocabulary terms that can satisfy each query token
+        Inner tokens of a multi-word query must match whole terms; the
+        outer ones may be partial because the query is a substring
+        """
+        matches = []
+        last = len(query_tokens) - 1
+        for position, token in enumerate(query_tokens):
+            if 0 < position < last:
+                matches.append([token] if token in self.postings else [])
+            else:
+                matches.append(self._terms_containing(token))
+        return matches
+    
+    def candidates(self, query: str) -> Optional[Set[str]]:
+        """
+        Keys that may contain the query as a substring
+        Returns None when the query has no word tokens and cannot use the index
+        """
+        query_tokens = tokenize(query)
+        if not query_tokens:
+            return None
+        
+        # Most selective token first, so a common token only narrows a small set
+        matches = sorted(
+            self._matching_terms(query_tokens),
+            key=lambda terms: sum(len(self.postings[term]) for term in terms)
+        )
+        
+        result: Optional[Set[str]] = None
+        for terms in matches:
+            if result is not None and len(terms) == 1:
+                result = result.intersection(self.postings[terms[0]])
+            else:
+                keys: Set[str] = set()
+                for term in terms:
+                    keys.update(self.postings[term])
+                result = keys if result is None else result & keys
+            if not result:
+                return set()
+        return result
+    
+    def relevance(self, query: str, keys: Set[str]) -> Dict[str, float]:
+        """TF-IDF relevance of the candidate keys for a query"""
+        query_tokens = tokenize(query)
+        doc_count = max(len(self.doc_terms), 1)
+        scores = {key: 0.0 for key in keys}
+        for terms in self._matching_terms(query_tokens):
+            for term in terms:
+                docs = self.postings[term]
+                idf = math.log(1.0 + doc_count / len(docs))
+                for key in keys:
+                    tf = docs.get(key)
+                    if tf:
+                        scores[key] += tf * idf
+        return scores
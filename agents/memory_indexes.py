@@ -0,0 +1,288 @@
+"""
+Secondary Indexes for Memory Bank
+Hash and sorted indexes over entry metadata for cross-session queries
+"""
+from typing import Dict, Any, Optional, List, Tuple, Set, Iterable
+from abc import ABC, abstractmethod
+import bisect
+import threading
+
+Item = Tuple[str, str]
+
+# Entry fields that can be indexed alongside metadata fields
+ENTRY_FIELDS = ("timestamp", "expires_at")
+
+# Marker for "field absent", distinct from a stored None
+MISSING = object()
+
+
+def field_value(entry: Dict[str, Any], field: str) -> Any:
+    """Value of field for an entry; metadata wins over entry fields"""
+    metadata = entry.get("metadata") or {}
+    if field in metadata:
+        return metadata[field]
+    if field in ENTRY_FIELDS and field in entry:
+        return entry[field]
+    return MISSING
+
+
+def sort_key(value: Any) -> Optional[Tuple[int, Any]]:
+    """Total order for sortable values: numbers before strings; None when unsortable"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return (0, value)
+    if isinstance(value, str):
+        return (1, value)
+    return None
+
+
+class SecondaryIndex(ABC):
+    """Base class for a metadata field index"""
+    
+    kind = "base"
+    
+    def __init__(self, field: str):
+        self.field = field
+        self.values: Dict[Item, Any] = {}
+    
+    @abstractmethod
+    def add(self, item: Item, value: Any):
+        """Index item under value"""
+        pass
+    
+    @abstractmethod
+    def remove(self, item: Item):
+        """Drop item from the index"""
+        pass
+    
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class HashIndex(SecondaryIndex):
+    """Equality index: value -> items"""
+    
+    kind = "hash"
+    
+    def __init__(self, field: str):
+        super().__init__(field)
+        self.buckets: Dict[Any, Set[Item]] = {}
+    
+    def add(self, item: Item, value: Any):
+        self.remove(item)
+        try:
+            self.buckets.setdefault(value, set()).add(item)
+        except TypeError:
+            return  # Unhashable values are not indexed
+        self.values[item] = value
+    
+    def remove(self, item: Item):
+        if item not in self.values:
+            return
+        value = self.values.pop(item)
+        bucket = self.buckets.get(value)
+        if bucket is not None:
+            bucket.discard(item)
+            if not bucket:
+                del self.buckets[value]
+    
+    def lookup(self, value: Any) -> Set[Item]:
+        """Items whose field equals value"""
+        try:
+            return set(self.buckets.get(value, ()))
+        except TypeError:
+            return set()
+
+
+class SortedIndex(SecondaryIndex):
+    """Range index over numbers and strings, kept sorted with bisect"""
+    
+    kind = "sorted"
+    
+    def __init__(self, field: str):
+        super().__init__(field)
+        self.entries: List[Tuple[Tuple[int, Any], Item]] = []
+    
+    def add(self, item: Item, value: Any):
+        self.remove(item)
+        key = sort_key(value)
+        if key is None:
+            return
+        bisect.insort(self.entries, (key, item))
+        self.values[item] = key
+    
+    def remove(self, item: Item):
+        key = self.values.pop(item, None)
+        if key is None:
+            return
+        position = bisect.bisect_left(self.entries, (key, item))
+        if position < len(self.entries) and self.entries[position] == (key, item):
+            del self.entries[position]
+    
+    def lookup(self, value: Any) -> Set[Item]:
+        """Items whose field equals value"""
+        return self.range(value, value)
+    
+    def range(
+        self,
+        low: Any = None,
+        high: Any = None,
+        include_low: bool = True,
+        include_high: bool = True
+    ) -> Set[Item]:
+        """Items whose field lies between low and high (None means unbounded)"""
+        if low is not None:
+            low_key = sort_key(low)
+            if low_key is None:
+                return set()
+            start = self._position(low_key, include_low, lower=True)
+        else:
+            start = 0
+        if high is not None:
+            high_key = sort_key(high)
+            if high_key is None:
+                return set()
+            end = self._position(high_key, include_high, lower=False)
+        else:
+            end = len(self.entries)
+        return {item for _, item in self.entries[start:end]}
+    
+    def _position(self, key: Tuple[int, Any], inclusive: bool, lower: bool) -> int:
+        """Slice bound for key; (key,) sorts before every item under key, the sentinel after"""
+        if lower == inclusive:
+            return bisect.bisect_left(self.entries, (key,))
+        return bisect.bisect_left(self.entries, (key, (chr(0x10FFFF),)))
+
+
+INDEX_TYPES = {
+    "hash": HashIndex,
+    "sorted": SortedIndex
+}
+
+
+class IndexSet:
+    """
+    Secondary indexes for a memory bank, kept current through change notifications
+    """
+    
+    def __init__(self):
+        self.indexes: Dict[str, SecondaryIndex] = {}
+        self.session_items: Dict[str, Set[str]] = {}
+        self.lock = threading.RLock()
+    
+    def create(self, field: str, kind: str, entries: Iterable[Tuple[str, str, Dict[str, Any]]]) -> SecondaryIndex:
+        """Create an index on field and populate it from entries"""
+        if kind not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type: {kind}")
+        index = INDEX_TYPES[kind](field)
+        with self.lock:
+            for session_id, key, entry in entries:
+                self.session_items.setdefault(session_id, set()).add(key)
+                value = field_value(entry, field)
+                if value is not MISSING:
+                    index.add((session_id, key), value)
+            self.indexes[field] = index
+        return index
+    
+    def drop(self, field: str):
+        """Remove the index on field"""
+        with self.lock:
+            self.indexes.pop(field, None)
+            if not self.indexes:
+                self.session_items.clear()
+    
+    def on_change(self, op: str, session_id: str, key: Optional[str], entry: Optional[Dict[str, Any]]):
+        """MemoryBank listener; spilled entries stay indexed"""
+        if op == "spill":
+            return
+        with self.lock:
+            if not self.indexes:
+                return
+            if op == "set":
+                self.session_items.setdefault(session_id, set()).add(key)
+                for field, index in self.indexes.items():
+                    value = field_value(entry, field)
+                    if value is MISSING:
+                        index.remove((session_id, key))
+                    else:
+                        index.add((session_id, key), value)
+                return
+            keys = [key] if key else list(self.session_items.get(session_id, ()))
+            for item_key in keys:
+                for index in self.indexes.values():
+                    index.remove((session_id, item_key))
+                items = self.session_items.get(session_id)
+                if items is not None:
+                    items.discard(item_key)
+            if not self.session_items.get(session_id):
+                self.session_items.pop(session_id, None)
+    
+    def match(
+        self,
+        where: Optional[Dict[str, Any]] = None,
+        ranges: Optional[Dict[str, Tuple[Any, Any]]] = None
+    ) -> Tuple[Optional[Set[Item]], Dict[str, Any], Dict[str, Tuple[Any, Any]]]:
+        """
+        Intersect index lookups for the indexed conditions
+        Returns (items or None when nothing was indexed, leftover where, leftover ranges)
+        """
+        leftover_where: Dict[str, Any] = {}
+        leftover_ranges: Dict[str, Tuple[Any, Any]] = {}
+        candidate_sets: List[Set[Item]] = []
+        with self.lock:
+            for field, expected in (where or {}).items():
+                index = self.indexes.get(field)
+                if index is None:
+                    leftover_where[field] = expected
+                    continue
+                options = expected if isinstance(expected, (list, tuple, set, frozenset)) else [expected]
+                matched: Set[Item] = set()
+                for option in options:
+                    matched |= index.lookup(option)
+                candidate_sets.append(matched)
+            for field, bounds in (ranges or {}).items():
+                index = self.indexes.get(field)
+                if not isinstance(index, SortedIndex):
+                    leftover_ranges[field] = bounds
+                    continue
+                low, high = bounds
+                candidate_sets.append(index.range(low, high))
+        
+        if not candidate_sets:
+            return None, leftover_where, leftover_ranges
+        candidate_sets.sort(key=len)
+        items = candidate_sets[0]
+        for other in candidate_sets[1:]:
+            items = items & other
+            if not items:
+                break
+        return items, leftover_where, leftover_ranges
+    
+    def describe(self) -> Dict[str, Dict[str, Any]]:
+        """Index summary for stats"""
+        with self.lock:
+            return {
+                field: {"type": index.kind, "entries": len(index)}
+                for field, index in self.indexes.items()
+            }
+
+
+def matches(entry: Dict[str, Any], where: Dict[str, Any], ranges: Dict[str, Tuple[Any, Any]]) -> bool:
+    """Check unindexed conditions against a loaded entry"""
+    for field, expected in where.items():
+        value = field_value(entry, field)
+        if isinstance(expected, (list, tuple, set, frozenset)):
+            if value is MISSING or value not in expected:
+                return False
+        elif value is MISSING or value != expected:
+            return False
+    for field, (low, high) in ranges.items():
+        key = sort_key(field_value(entry, field))
+        if key is None:
+            return False
+        if low is not None and (sort_key(low) is None or key < sort_key(low)):
+            return False
+        if high is not None and (sort_key(high) is None or key > sort_key(high)):
+            return False
+    return True
@@ -0,0 +1,220 @@
+"""
+Relevance-ranked Memory Retrieval
+Hashed BM25 vectors over memory entries, used to pick the memories
+worth spending prompt tokens on for the current user message
+"""
+from typing import Dict, Any, Optional, List, Tuple
+from collections import OrderedDict
+import threading
+import zlib
+import numpy as np
+from agents.memory_index import tokenize
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough LLM token count (about four characters per token)"""
+    return max(1, len(text) // 4)
+
+
+def memory_line(key: str, value: Any) -> str:
+    """How a memory is rendered into a prompt"""
+    return f"- {key}: {value}"
+
+
+class SessionVectors:
+    """
+    Hashed term postings and document lengths for one session
+    Documents occupy reusable slots in NumPy arrays so scoring is vectorized
+    """
+    
+    def __init__(self, n_features: int):
+        self.n_features = n_features
+        self.slots: Dict[str, int] = {}
+        self.keys: List[Optional[str]] = []
+        self.free: List[int] = []
+        self.doc_len = np.zeros(16, dtype=np.float32)
+        self.doc_terms: Dict[int, Dict[int, int]] = {}
+        self.postings: Dict[int, Dict[int, int]] = {}
+        self.total_len = 0.0
+    
+    def _features(self, key: str, value: Any) -> Dict[int, int]:
+        counts: Dict[int, int] = {}
+        for token in tokenize(key) + tokenize(str(value)):
+            feature = zlib.crc32(token.encode("utf-8")) % self.n_features
+            counts[feature] = counts.get(feature, 0) + 1
+        return counts
+    
+    def add(self, key: str, value: Any):
+        if key in self.slots:
+            self.remove(key)
+        
+        if self.free:
+            slot = self.free.pop()
+            self.keys[slot] = key
+        else:
+            slot = len(self.keys)
+            self.keys.append(key)
+            if slot >= len(self.doc_len):
+                self.doc_len = np.concatenate([self.doc_len, np.zeros(len(self.doc_len), dtype=np.float32)])
+        
+        terms = self._features(key, value)
+        length = float(sum(terms.values()))
+        self.slots[key] = slot
+        self.doc_terms[slot] = terms
+        self.doc_len[slot] = length
+        self.total_len += length
+        for feature, tf in terms.items():
+            self.postings.setdefault(feature, {})[slot] = tf
+    
+    def remove(self, key: str):
+        slot = self.slots.pop(key, None)
+        if slot is None:
+            return
+        for feature in self.doc_terms.pop(slot, {}):
+            docs = self.postings.get(feature)
+            if docs is not None:
+                docs.pop(slot, None)
+                if not docs:
+                    del self.postings[feature]
+        self.total_len -= float(self.doc_len[slot])
+        self.doc_len[slot] = 0.0
+        self.keys[slot] = None
+        self.free.append(slot)
+    
+    def score(self, query: str, k1: float, b: float) -> np.ndarray:
+        """BM25 score for every slot"""
+        scores = np.zeros(len(self.keys), dtype=np.float32)
+        doc_count = len(self.slots)
+        if not doc_count:
+            return scores
+        
+        avg_len = max(self.total_len / doc_count, 1.0)
+        doc_len = self.doc_len[:len(self.keys)]
+        query_features = {zlib.crc32(t.encode("utf-8")) % self.n_features for t in tokenize(query)}
+        for feature in query_features:
+            docs = self.postings.get(feature)
+            if not docs:
+                continue
+            slots = np.fromiter(docs.keys(), dtype=np.int64, count=len(docs))
+            tf = np.fromiter(docs.values(), dtype=np.float32, count=len(docs))
+            idf = np.log(1.0 + (doc_count - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = tf + k1 * (1.0 - b + b * doc_len[slots] / avg_len)
+            scores[slots] += idf * tf * (k1 + 1.0) / norm
+        return scores
+
+
+class MemoryRetriever:
+    """
+    Per-session BM25 retrieval over memory bank entries
+    Sessions are vectorized on first query and kept current through
+    MemoryBank change notifications afterwards. Only the max_sessions most
+    recently queried sessions keep their vectors, so memory tracks the
+    working set rather than every session ever queried
+    """
+    
+    def __init__(
+        self,
+        n_features: int = 2 ** 18,
+        k1: float = 1.5,
+        b: float = 0.75,
+        max_sessions: Optional[int] = 512
+    ):
+        self.n_features = n_features
+        self.k1 = k1
+        self.b = b
+        self.max_sessions = max_sessions
+        self.sessions: "OrderedDict[str, SessionVectors]" = OrderedDict()
+        self.dropped = 0
+        self.lock = threading.RLock()
+    
+    def _session(self, session_id: str, memory: Optional[Dict[str, Any]] = None) -> SessionVectors:
+        vectors = self.sessions.get(session_id)
+        if vectors is not None:
+            self.sessions.move_to_end(session_id)
+            return vectors
+        
+        vectors = SessionVectors(self.n_features)
+        for key, value in (memory or {}).items():
+            vectors.add(key, value)
+        self.sessions[session_id] = vectors
+        # Least recently queried sessions are rebuilt from memory if queried again
+        while self.max_sessions is not None and len(self.sessions) > self.max_sessions:
+            self.sessions.popitem(last=False)
+            self.dropped += 1
+        return vectors
+    
+    def on_change(self, op: str, session_id: str, key: Optional[str], entry: Optional[Dict[str, Any]]):
+        """MemoryBank listener; only sessions already vectorized are updated"""
+        with self.lock:
+            vectors = self.sessions.get(session_id)
+            if vectors is None:
+                return
+            if op == "set":
+                vectors.add(key, entry["value"])
+            elif key:
+                vectors.remove(key)
+            else:
+                del self.sessions[session_id]
+    
+    def query(
+        self,
+        session_id: str,
+        text: str,
+        top_k: int = 5,
+        memory: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[str, float]]:
+        """Top-k (key, score) pairs with a positive score"""
+        with self.lock:
+            vectors = self._session(session_id, memory)
+            scores = vectors.score(text, self.k1, self.b)
+            keys = list(vectors.keys)
+        
+        matched = np.flatnonzero(scores > 0)
+        if len(matched) > top_k:
+            matched = matched[np.argpartition(-scores[matched], top_k - 1)[:top_k]]
+        order = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(keys[slot], float(scores[slot])) for slot in order]
+    
+    def select(
+        self,
+        session_id: str,
+        text: str,
+        memory: Dict[str, Any],
+        top_k: int = 5,
+        token_budget: Optional[int] = None
+    ) -> List[Tuple[str, Any]]:
+        """
+        Memories to inject into a prompt: the best matches for text first,
+        then the most recently stored entries, within top_k and token_budget
+        """
+        ranked = [key for key, _ in self.query(session_id, text, top_k, memory) if key in memory]
+        seen = set(ranked)
+        recent = [key for key in reversed(list(memory)) if key not in seen]
+        
+        selected = []
+        used = 0
+        for key in ranked + recent:
+            if len(selected) >= top_k:
+                break
+            cost = estimate_tokens(memory_line(key, memory[key]))
+            if token_budget is not None and used + cost > token_budget:
+                continue
+            selected.append((key, memory[key]))
+            used += cost
+        return selected
+    
+    def forget(self, session_id: str):
+        """Drop cached vectors for a session"""
+        with self.lock:
+            self.sessions.pop(session_id, None)
+
+
+def rank_memories(
+    memory: Dict[str, Any],
+    text: str,
+    top_k: int = 5,
+    token_budget: Optional[int] = None
+) -> List[Tuple[str, Any]]:
+    """One-off retrieval over a plain memory dict (no memory bank attached)"""
+    retriever = MemoryRetriever(n_features=2 ** 16)
+    return retriever.select("_", text, memory, top_k=top_k, token_budget=token_budget)
@@ -4,9 +4,9 @@ Observability System: Logging, Tracing, and Metrics
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 import logging
-import json
 from collections import defaultdict
 from dataclasses import dataclass, asdict
+from agents.serialization import serializer_for_path
 
 
 @dataclass
@@ -186,15 +186,17 @@ class ObservabilitySystem:
         
         return filtered[-limit:]
     
-    def export_traces(self, filepath: str):
-        """Export traces to JSON file"""
-        with open(filepath, 'w') as f:
-            json.dump([t.to_dict() for t in self.traces], f, indent=2)
+    def export_traces(self, filepath: str) -> int:
+        """Stream traces to a JSON file (msgpack for .msgpack paths)"""
+        serializer = serializer_for_path(filepath)
+        with open(filepath, 'wb') as f:
+            return serializer.write_stream((t.to_dict() for t in list(self.traces)), f)
     
-    def export_metrics(self, filepath: str):
-        """Export metrics to JSON file"""
-        with open(filepath, 'w') as f:
-            json.dump([m.to_dict() for m in self.metrics], f, indent=2)
+    def export_metrics(self, filepath: str) -> int:
+        """Stream metrics to a JSON file (msgpack for .msgpack paths)"""
+        serializer = serializer_for_path(filepath)
+        with open(filepath, 'wb') as f:
+            return serializer.write_stream((m.to_dict() for m in list(self.metrics)), f)
     
     def get_dashboard_data(self) -> Dict[str, Any]:
         """Get data for observability dashboard"""
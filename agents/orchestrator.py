@@ -3,11 +3,15 @@ Multi-Agent Orchestrator
 Implements parallel, sequential, and loop agent patterns
 """
 from typing import List, Dict, Any, Optional, Callable
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from enum import Enum
 import asyncio
 import logging
+import threading
+import time
 from agents.base_agent import BaseAgent, AgentMessage, AgentContext
 from agents.session_manager import InMemorySessionService
+from agents.execution_plan import ExecutionPlan, PlanResult
 
 
 class AgentPattern(Enum):
@@ -15,6 +19,7 @@ class AgentPattern(Enum):
     SEQUENTIAL = "sequential"  # Agents run one after another
     PARALLEL = "parallel"      # Agents run simultaneously
     LOOP = "loop"              # Agents run in a loop until condition met
+    DAG = "dag"                # Agents run as a dependency graph (independent ones concurrently)
     
     @classmethod
     def normalize(cls, pattern: Any) -> 'AgentPattern':
@@ -32,6 +37,8 @@ class AgentPattern(Enum):
                 return cls.PARALLEL
             elif pattern_lower in ["loop", "looping"]:
                 return cls.LOOP
+            elif pattern_lower in ["dag", "graph", "plan"]:
+                return cls.DAG
             # Check for enum string representation
             if "SEQUENTIAL" in pattern.upper():
                 return cls.SEQUENTIAL
@@ -39,6 +46,8 @@ class AgentPattern(Enum):
                 return cls.PARALLEL
             elif "LOOP" in pattern.upper():
                 return cls.LOOP
+            elif "DAG" in pattern.upper():
+                return cls.DAG
         
         # Try to extract from object
         if hasattr(pattern, 'value'):
@@ -49,6 +58,8 @@ class AgentPattern(Enum):
                 return cls.PARALLEL
             elif pattern_val == cls.LOOP.value:
                 return cls.LOOP
+            elif pattern_val == cls.DAG.value:
+                return cls.DAG
         
         # Try string representation
         pattern_str = str(pattern)
@@ -58,6 +69,8 @@ class AgentPattern(Enum):
             return cls.PARALLEL
         elif "LOOP" in pattern_str.upper():
             return cls.LOOP
+        elif "DAG" in pattern_str.upper():
+            return cls.DAG
         
         # Default to SEQUENTIAL if unknown
         return cls.SEQUENTIAL
@@ -66,13 +79,29 @@ class AgentPattern(Enum):
 class MultiAgentOrchestrator:
     """
     Orchestrates multiple agents with different execution patterns
-    Supports sequential, parallel, and loop patterns
+    Supports sequential, parallel, and loop patterns.
+    agent_timeout bounds how long a plan waits for each agent, but a thread cannot
+    be interrupted: an agent that overruns keeps its worker until it returns.
+    abandoned_workers counts those; while it equals max_workers, new plans time out
+    waiting for a worker
     """
     
-    def __init__(self, session_service: InMemorySessionService):
+    def __init__(
+        self,
+        session_service: InMemorySessionService,
+        max_workers: int = 8,
+        agent_timeout: Optional[float] = 60.0
+    ):
         self.agents: Dict[str, BaseAgent] = {}
         self.session_service = session_service
+        self.max_workers = max_workers
+        self.agent_timeout = agent_timeout
         self.logger = logging.getLogger("orchestrator")
+        
+        # Worker pool for the parallel pattern, created on first use
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self.abandoned_workers = 0
     
     def register_agent(self, agent: BaseAgent):
         """Register an agent with the orchestrator"""
@@ -122,50 +151,232 @@ class MultiAgentOrchestrator:
         
         return messages
     
-    def execute_parallel(
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Shared bounded worker pool"""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="orchestrator"
+                )
+            return self._executor
+    
+    def _abandon(self, future) -> int:
+        """Count a timed-out agent's worker until its thread returns; returns the new count"""
+        with self._executor_lock:
+            self.abandoned_workers += 1
+            count = self.abandoned_workers
+        future.add_done_callback(self._reclaim)
+        return count
+    
+    def _reclaim(self, future):
+        with self._executor_lock:
+            self.abandoned_workers -= 1
+    
+    def _run_timed(self, agent: BaseAgent, message: AgentMessage, context: AgentContext, started: Dict[str, float]):
+        """Worker body: record when the agent actually starts, then process"""
+        started[agent.agent_id] = time.perf_counter()
+        return agent.process(message, context)
+    
+    def _error_message(
         self,
-        agents: List[str],
+        agent_id: str,
+        message: AgentMessage,
+        context: AgentContext,
+        error: str,
+        metadata: Dict[str, Any]
+    ) -> AgentMessage:
+        """Stand-in result for an agent that failed or timed out"""
+        return AgentMessage(
+            sender=agent_id,
+            receiver=message.sender,
+            content=f"Error: {error}",
+            message_type="error",
+            metadata=dict(metadata, error=error),
+            session_id=context.session_id
+        )
+    
+    def _resolve_plan(self, plan: ExecutionPlan) -> ExecutionPlan:
+        """Drop unregistered agents from a plan and validate it"""
+        for agent_id in list(plan.nodes):
+            if agent_id not in self.agents:
+                self.logger.warning(f"Agent {agent_id} not found, skipping")
+                plan = plan.without(agent_id)
+        plan.order()
+        return plan
+    
+    def _plan_input(
+        self,
+        agent_id: str,
+        plan: ExecutionPlan,
+        outputs: Dict[str, AgentMessage],
         initial_message: AgentMessage,
         context: AgentContext
-    ) -> Dict[str, AgentMessage]:
+    ) -> AgentMessage:
         """
-        Execute agents in parallel (simultaneously)
-        All agents receive the same input message
+        Input for a plan node: the request itself for roots, the predecessor's output
+        for a single dependency, otherwise the dependencies' outputs merged.
+        Failed dependencies are left out
         """
-        self.logger.info(f"Executing parallel pattern with agents: {agents}")
+        upstream = [
+            (dependency, outputs[dependency]) for dependency in plan.nodes[agent_id].depends_on
+            if outputs[dependency].message_type != "error"
+        ]
+        if not upstream:
+            return self._message_for(agent_id, initial_message, context)
+        if len(upstream) == 1:
+            return self._message_for(agent_id, upstream[0][1], context)
         
-        results = {}
+        metadata = {}
+        for _, output in upstream:
+            metadata.update(output.metadata or {})
+        metadata.pop("wall_time_ms", None)
+        metadata["inputs"] = {dependency: output.content for dependency, output in upstream}
+        metadata["query"] = initial_message.content
+        return AgentMessage(
+            sender="orchestrator",
+            receiver=agent_id,
+            content="\n\n".join(f"[{dependency}]\n{output.content}" for dependency, output in upstream),
+            metadata=metadata,
+            session_id=context.session_id
+        )
+    
+    def _plan_result(
+        self,
+        plan: ExecutionPlan,
+        initial_message: AgentMessage,
+        outputs: Dict[str, AgentMessage],
+        started: float
+    ) -> PlanResult:
+        """Order a plan's outputs and work out its critical path"""
+        order = plan.order()
+        outputs = {agent_id: outputs[agent_id] for agent_id in order}
+        timings = {agent_id: output.metadata["wall_time_ms"] for agent_id, output in outputs.items()}
+        path, path_ms = plan.critical_path(timings)
+        wall_ms = (time.perf_counter() - started) * 1000
         
-        # Create tasks for parallel execution
-        tasks = []
-        for agent_id in agents:
-            if agent_id not in self.agents:
-                self.logger.warning(f"Agent {agent_id} not found, skipping")
-                continue
-            
-            agent = self.agents[agent_id]
-            agent_message = AgentMessage(
-                sender=initial_message.sender,
-                receiver=agent_id,
-                content=initial_message.content,
-                metadata=initial_message.metadata,
-                session_id=context.session_id
-            )
+        agent_times = ", ".join(f"{agent_id}={ms:.0f}ms" for agent_id, ms in timings.items())
+        self.logger.info(
+            f"Plan finished in {wall_ms:.0f}ms, critical path {' -> '.join(path)} "
+            f"{path_ms:.0f}ms ({agent_times})"
+        )
+        return PlanResult(
+            messages=[initial_message] + list(outputs.values()),
+            outputs=outputs,
+            timings=timings,
+            critical_path=path,
+            critical_path_ms=path_ms,
+            wall_time_ms=wall_ms
+        )
+    
+    def execute_plan(
+        self,
+        plan: ExecutionPlan,
+        initial_message: AgentMessage,
+        context: AgentContext,
+        timeout: Optional[float] = None
+    ) -> PlanResult:
+        """
+        Execute an execution plan (DAG of agents) on the worker pool
+        Each agent is submitted as soon as its dependencies finish, so independent
+        agents run concurrently. Each gets `timeout` seconds (default agent_timeout)
+        from when it starts, or from submission while it waits for a worker; agents
+        that fail or overrun get an error message and their dependents still run.
+        An overrunning agent's worker stays busy until it returns (see abandoned_workers)
+        """
+        plan = self._resolve_plan(plan)
+        self.logger.info(f"Executing plan: {plan}")
+        timeout = self.agent_timeout if timeout is None else timeout
+        
+        executor = self._get_executor()
+        waiting = {agent_id: len(node.depends_on) for agent_id, node in plan.nodes.items()}
+        dependents = plan.dependents()
+        outputs: Dict[str, AgentMessage] = {}
+        inputs: Dict[str, AgentMessage] = {}
+        started: Dict[str, float] = {}
+        submitted: Dict[str, float] = {}
+        futures = {}
+        pending = set()
+        begun = time.perf_counter()
+        
+        def submit(agent_id: str):
+            inputs[agent_id] = self._plan_input(agent_id, plan, outputs, initial_message, context)
+            submitted[agent_id] = time.perf_counter()
+            future = executor.submit(self._run_timed, self.agents[agent_id], inputs[agent_id], context, started)
+            futures[future] = agent_id
+            pending.add(future)
+        
+        def finish(agent_id: str, output: AgentMessage):
+            outputs[agent_id] = output
+            for dependent in dependents[agent_id]:
+                waiting[dependent] -= 1
+                if waiting[dependent] == 0:
+                    submit(dependent)
+        
+        for agent_id in [agent_id for agent_id, count in waiting.items() if count == 0]:
+            submit(agent_id)
+        
+        while pending:
+            wait_for = None
+            if timeout is not None:
+                now = time.perf_counter()
+                deadlines = {f: started.get(futures[f], submitted[futures[f]]) + timeout for f in pending}
+                expired = [f for f, deadline in deadlines.items() if deadline <= now]
+                for future in expired:
+                    agent_id = futures[future]
+                    pending.discard(future)
+                    elapsed_ms = (now - started.get(agent_id, submitted[agent_id])) * 1000
+                    if future.cancel():
+                        self.logger.warning(f"Agent {agent_id} timed out after {elapsed_ms:.0f}ms waiting for a worker")
+                    else:
+                        abandoned = self._abandon(future)
+                        self.logger.warning(
+                            f"Agent {agent_id} timed out after {elapsed_ms:.0f}ms; "
+                            f"{abandoned}/{self.max_workers} workers are still running timed-out agents"
+                        )
+                    finish(agent_id, self._error_message(
+                        agent_id, inputs[agent_id], context,
+                        f"{agent_id} timed out after {timeout:.1f}s",
+                        {"timed_out": True, "wall_time_ms": elapsed_ms}
+                    ))
+                if expired:
+                    # Dependents of the expired agents may have just been submitted
+                    continue
+                wait_for = max(min(deadlines.values()) - now, 0.0)
             
-            # Execute agent (synchronous for now, can be made async)
-            try:
-                response = agent.process(agent_message, context)
-                results[agent_id] = response
-            except Exception as e:
-                self.logger.error(f"Error in agent {agent_id}: {e}")
-                results[agent_id] = AgentMessage(
-                    sender=agent_id,
-                    receiver=initial_message.sender,
-                    content=f"Error: {str(e)}",
-                    session_id=context.session_id
-                )
+            done, _ = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+            finished = time.perf_counter()
+            for future in done:
+                pending.discard(future)
+                agent_id = futures[future]
+                elapsed_ms = (finished - started.get(agent_id, submitted[agent_id])) * 1000
+                try:
+                    response = future.result()
+                    response.metadata = dict(response.metadata or {}, wall_time_ms=elapsed_ms)
+                except Exception as e:
+                    self.logger.error(f"Error in agent {agent_id}: {e}")
+                    response = self._error_message(
+                        agent_id, inputs[agent_id], context, str(e), {"wall_time_ms": elapsed_ms}
+                    )
+                finish(agent_id, response)
         
-        return results
+        return self._plan_result(plan, initial_message, outputs, begun)
+    
+    def execute_parallel(
+        self,
+        agents: List[str],
+        initial_message: AgentMessage,
+        context: AgentContext,
+        timeout: Optional[float] = None
+    ) -> Dict[str, AgentMessage]:
+        """
+        Execute agents in parallel (simultaneously) on the worker pool
+        All agents receive the same input message; this is execute_plan with no
+        dependencies, so timeouts and errors are handled the same way.
+        Every result carries its wall time in metadata["wall_time_ms"]
+        """
+        self.logger.info(f"Executing parallel pattern with agents: {agents}")
+        return self.execute_plan(ExecutionPlan.parallel(agents), initial_message, context, timeout).outputs
     
     def execute_loop(
         self,
@@ -220,6 +431,169 @@ class MultiAgentOrchestrator:
         
         return messages
     
+    def _message_for(self, agent_id: str, source: AgentMessage, context: AgentContext) -> AgentMessage:
+        """Input message for an agent, forwarded from the previous output"""
+        return AgentMessage(
+            sender=source.sender,
+            receiver=agent_id,
+            content=source.content,
+            metadata=source.metadata,
+            session_id=context.session_id
+        )
+    
+    async def aexecute_sequential(
+        self,
+        agents: List[str],
+        initial_message: AgentMessage,
+        context: AgentContext
+    ) -> List[AgentMessage]:
+        """Async execute_sequential; each agent awaits aprocess"""
+        self.logger.info(f"Executing async sequential pattern with agents: {agents}")
+        
+        messages = [initial_message]
+        current_message = initial_message
+        for agent_id in agents:
+            if agent_id not in self.agents:
+                self.logger.warning(f"Agent {agent_id} not found, skipping")
+                continue
+            
+            response = await self.agents[agent_id].aprocess(
+                self._message_for(agent_id, current_message, context), context
+            )
+            messages.append(response)
+            current_message = response
+        
+        return messages
+    
+    async def _atimed(
+        self,
+        agent_id: str,
+        message: AgentMessage,
+        context: AgentContext,
+        timeout: Optional[float]
+    ) -> AgentMessage:
+        """Run one agent for aexecute_plan, turning failures into error messages"""
+        started = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(self.agents[agent_id].aprocess(message, context), timeout)
+        except asyncio.TimeoutError:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.logger.warning(f"Agent {agent_id} timed out after {elapsed_ms:.0f}ms")
+            return self._error_message(
+                agent_id, message, context,
+                f"{agent_id} timed out after {timeout:.1f}s",
+                {"timed_out": True, "wall_time_ms": elapsed_ms}
+            )
+        except Exception as e:
+            self.logger.error(f"Error in agent {agent_id}: {e}")
+            return self._error_message(
+                agent_id, message, context, str(e),
+                {"wall_time_ms": (time.perf_counter() - started) * 1000}
+            )
+        
+        response.metadata = dict(response.metadata or {}, wall_time_ms=(time.perf_counter() - started) * 1000)
+        return response
+    
+    async def aexecute_plan(
+        self,
+        plan: ExecutionPlan,
+        initial_message: AgentMessage,
+        context: AgentContext,
+        timeout: Optional[float] = None
+    ) -> PlanResult:
+        """
+        Async execute_plan: one task per agent on the running event loop
+        Tasks are created with ensure_future as their dependencies finish and
+        awaited with asyncio.wait; if the caller is cancelled, every agent task
+        is cancelled explicitly
+        """
+        plan = self._resolve_plan(plan)
+        self.logger.info(f"Executing async plan: {plan}")
+        timeout = self.agent_timeout if timeout is None else timeout
+        
+        waiting = {agent_id: len(node.depends_on) for agent_id, node in plan.nodes.items()}
+        dependents = plan.dependents()
+        outputs: Dict[str, AgentMessage] = {}
+        tasks = {}
+        begun = time.perf_counter()
+        
+        def submit(agent_id: str) -> asyncio.Future:
+            message = self._plan_input(agent_id, plan, outputs, initial_message, context)
+            task = asyncio.ensure_future(self._atimed(agent_id, message, context, timeout))
+            tasks[task] = agent_id
+            return task
+        
+        pending = {submit(agent_id) for agent_id, count in list(waiting.items()) if count == 0}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    agent_id = tasks[task]
+                    outputs[agent_id] = task.result()
+                    for dependent in dependents[agent_id]:
+                        waiting[dependent] -= 1
+                        if waiting[dependent] == 0:
+                            pending.add(submit(dependent))
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        
+        return self._plan_result(plan, initial_message, outputs, begun)
+    
+    async def aexecute_parallel(
+        self,
+        agents: List[str],
+        initial_message: AgentMessage,
+        context: AgentContext,
+        timeout: Optional[float] = None
+    ) -> Dict[str, AgentMessage]:
+        """Async execute_parallel; same result shape, built on aexecute_plan"""
+        self.logger.info(f"Executing async parallel pattern with agents: {agents}")
+        result = await self.aexecute_plan(ExecutionPlan.parallel(agents), initial_message, context, timeout)
+        return result.outputs
+    
+    async def aexecute_loop(
+        self,
+        agents: List[str],
+        initial_message: AgentMessage,
+        context: AgentContext,
+        condition: Callable[[List[AgentMessage]], bool],
+        max_iterations: int = 10
+    ) -> List[AgentMessage]:
+        """Async execute_loop; agents run sequentially in each iteration"""
+        self.logger.info(f"Executing async loop pattern with agents: {agents}, max_iterations: {max_iterations}")
+        
+        messages = [initial_message]
+        current_message = initial_message
+        iteration = 0
+        
+        while iteration < max_iterations:
+            iteration += 1
+            self.logger.debug(f"Loop iteration {iteration}")
+            
+            iteration_messages = []
+            for agent_id in agents:
+                if agent_id not in self.agents:
+                    continue
+                
+                response = await self.agents[agent_id].aprocess(
+                    self._message_for(agent_id, current_message, context), context
+                )
+                iteration_messages.append(response)
+                current_message = response
+            
+            messages.extend(iteration_messages)
+            
+            if condition(iteration_messages):
+                self.logger.info(f"Loop condition met at iteration {iteration}")
+                break
+        
+        if iteration >= max_iterations:
+            self.logger.warning(f"Loop reached max iterations: {max_iterations}")
+        
+        return messages
+    
     def route_message(
         self,
         message: AgentMessage,
@@ -229,11 +603,56 @@ class MultiAgentOrchestrator:
     ) -> Any:
         """
         Route message to agents based on pattern
+        The DAG pattern returns a PlanResult; the others return as before
         """
         if agent_ids is None:
             # Auto-route based on message content
             agent_ids = self._auto_route(message.content)
         
+        normalized_pattern = self._resolve_pattern(pattern)
+        
+        # Execute based on normalized pattern
+        if normalized_pattern == AgentPattern.SEQUENTIAL:
+            return self.execute_sequential(agent_ids, message, context)
+        elif normalized_pattern == AgentPattern.PARALLEL:
+            return self.execute_parallel(agent_ids, message, context)
+        elif normalized_pattern == AgentPattern.DAG:
+            return self.execute_plan(self._plan_route(agent_ids), message, context)
+        else:
+            return self.execute_loop(agent_ids, message, context, self._loop_condition)
+    
+    async def aroute_message(
+        self,
+        message: AgentMessage,
+        context: AgentContext,
+        pattern: AgentPattern = AgentPattern.SEQUENTIAL,
+        agent_ids: Optional[List[str]] = None
+    ) -> Any:
+        """
+        Async route_message for callers running an event loop
+        Many requests can be in flight on one loop without a thread each
+        """
+        if agent_ids is None:
+            agent_ids = self._auto_route(message.content)
+        
+        normalized_pattern = self._resolve_pattern(pattern)
+        if normalized_pattern == AgentPattern.SEQUENTIAL:
+            return await self.aexecute_sequential(agent_ids, message, context)
+        elif normalized_pattern == AgentPattern.PARALLEL:
+            return await self.aexecute_parallel(agent_ids, message, context)
+        elif normalized_pattern == AgentPattern.DAG:
+            return await self.aexecute_plan(self._plan_route(agent_ids), message, context)
+        else:
+            return await self.aexecute_loop(agent_ids, message, context, self._loop_condition)
+    
+    @staticmethod
+    def _loop_condition(msgs: List[AgentMessage]) -> bool:
+        """Default stop condition for the loop pattern"""
+        return any("complete" in msg.content.lower() or "done" in msg.content.lower() 
+                   for msg in msgs)
+    
+    def _resolve_pattern(self, pattern: Any) -> AgentPattern:
+        """Normalize a pattern argument, falling back to SEQUENTIAL"""
         # Normalize pattern using the helper method
         try:
             normalized_pattern = AgentPattern.normalize(pattern)
@@ -247,25 +666,19 @@ class MultiAgentOrchestrator:
                 normalized_pattern = AgentPattern.PARALLEL
             elif "LOOP" in pattern_str:
                 normalized_pattern = AgentPattern.LOOP
+            elif "DAG" in pattern_str:
+                normalized_pattern = AgentPattern.DAG
             else:
                 # Default to SEQUENTIAL
                 normalized_pattern = AgentPattern.SEQUENTIAL
                 self.logger.warning(f"Could not determine pattern from {pattern}, defaulting to SEQUENTIAL")
         
-        # Execute based on normalized pattern
-        if normalized_pattern == AgentPattern.SEQUENTIAL:
-            return self.execute_sequential(agent_ids, message, context)
-        elif normalized_pattern == AgentPattern.PARALLEL:
-            return self.execute_parallel(agent_ids, message, context)
-        elif normalized_pattern == AgentPattern.LOOP:
-            condition = lambda msgs: any("complete" in msg.content.lower() or "done" in msg.content.lower() 
-                                         for msg in msgs)
-            return self.execute_loop(agent_ids, message, context, condition)
-        else:
+        if normalized_pattern not in (AgentPattern.SEQUENTIAL, AgentPattern.PARALLEL, AgentPattern.LOOP, AgentPattern.DAG):
             # This should never happen, but just in case
             error_msg = f"Unknown normalized pattern: {normalized_pattern} (original: {pattern})"
             self.logger.error(error_msg)
             raise ValueError(error_msg)
+        return normalized_pattern
     
     def _auto_route(self, message_content: str) -> List[str]:
         """Auto-route message to appropriate agents based on content"""
@@ -288,6 +701,29 @@ class MultiAgentOrchestrator:
         
         return agents
     
+    def _plan_route(self, agent_ids: List[str]) -> ExecutionPlan:
+        """
+        Execution plan for a route: the specialist agents are independent of each
+        other, and the final agent (chat_agent for auto routes) combines their outputs
+        """
+        return ExecutionPlan.fan_in(agent_ids)
+    
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """Worker pool size and how many workers are held by timed-out agents"""
+        with self._executor_lock:
+            return {
+                "max_workers": self.max_workers,
+                "abandoned_workers": self.abandoned_workers,
+                "available_workers": max(self.max_workers - self.abandoned_workers, 0)
+            }
+    
+    def close(self):
+        """Shut down the worker pool; agents still running are left to finish"""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+    
     def get_agent_status(self) -> Dict[str, Any]:
         """Get status of all registered agents"""
         return {
@@ -0,0 +1,167 @@
+"""
+Serialization Layer
+Pluggable codecs for persistence and exports: orjson or msgpack when
+installed, compact stdlib JSON otherwise
+"""
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, Iterator, Optional, Union, BinaryIO
+import json
+import os
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class Serializer(ABC):
+    """Base class for codecs; dumps always returns bytes"""
+    
+    name = "base"
+    # Binary codecs do not produce JSON text and cannot back .json files
+    binary = False
+    
+    @abstractmethod
+    def dumps(self, obj: Any) -> bytes:
+        """Encode an object"""
+        pass
+    
+    @abstractmethod
+    def loads(self, data: Union[bytes, str]) -> Any:
+        """Decode an object"""
+        pass
+    
+    def dumps_text(self, obj: Any) -> str:
+        """Encode an object as text (JSON codecs only)"""
+        return self.dumps(obj).decode("utf-8")
+    
+    def write_stream(self, items: Iterable[Any], fp: BinaryIO) -> int:
+        """
+        Write items as a JSON array one element at a time, so a large export
+        never has to exist as a single list or buffer. Returns the item count
+        """
+        count = 0
+        fp.write(b"[")
+        for item in items:
+            if count:
+                fp.write(b",")
+            fp.write(self.dumps(item))
+            count += 1
+        fp.write(b"]")
+        return count
+    
+    def read_stream(self, fp: BinaryIO) -> Iterator[Any]:
+        """Yield the items written by write_stream"""
+        for item in self.loads(fp.read()):
+            yield item
+
+
+class JsonSerializer(Serializer):
+    """Compact stdlib JSON; always available"""
+    
+    name = "json"
+    
+    def dumps(self, obj: Any) -> bytes:
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8")
+    
+    def loads(self, data: Union[bytes, str]) -> Any:
+        return json.loads(data)
+
+
+class OrjsonSerializer(Serializer):
+    """orjson: JSON encoded and decoded in Rust"""
+    
+    name = "orjson"
+    
+    def dumps(self, obj: Any) -> bytes:
+        return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    
+    def loads(self, data: Union[bytes, str]) -> Any:
+        return orjson.loads(data)
+
+
+class MsgpackSerializer(Serializer):
+    """MessagePack: compact binary encoding"""
+    
+    name = "msgpack"
+    binary = True
+    
+    def dumps(self, obj: Any) -> bytes:
+        return msgpack.packb(obj, default=str, use_bin_type=True)
+    
+    def loads(self, data: Union[bytes, str]) -> Any:
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+    
+    def dumps_text(self, obj: Any) -> str:
+        raise ValueError("msgpack output is binary")
+    
+    def write_stream(self, items: Iterable[Any], fp: BinaryIO) -> int:
+        """Write items as consecutive msgpack objects"""
+        count = 0
+        packer = msgpack.Packer(default=str, use_bin_type=True)
+        for item in items:
+            fp.write(packer.pack(item))
+            count += 1
+        return count
+    
+    def read_stream(self, fp: BinaryIO) -> Iterator[Any]:
+        for item in msgpack.Unpacker(fp, raw=False, strict_map_key=False):
+            yield item
+
+
+SERIALIZERS = {
+    "orjson": OrjsonSerializer,
+    "msgpack": MsgpackSerializer,
+    "json": JsonSerializer
+}
+
+# Fastest first
+PREFERENCE = ("orjson", "msgpack", "json")
+
+BINARY_EXTENSIONS = {".msgpack": "msgpack", ".mpk": "msgpack"}
+
+_instances: Dict[str, Serializer] = {}
+
+
+def available_serializers() -> list:
+    """Names of codecs whose library is installed, fastest first"""
+    installed = {"orjson": orjson is not None, "msgpack": msgpack is not None, "json": True}
+    return [name for name in PREFERENCE if installed[name]]
+
+
+def get_serializer(name: Optional[str] = None, text: bool = False) -> Serializer:
+    """
+    Get a codec by name, or the fastest installed one
+    text=True restricts the choice to codecs producing JSON text
+    """
+    available = available_serializers()
+    if name is None:
+        name = next(
+            candidate for candidate in available
+            if not (text and SERIALIZERS[candidate].binary)
+        )
+    elif name not in SERIALIZERS:
+        raise ValueError(f"Unknown serializer: {name}")
+    elif name not in available:
+        raise ValueError(f"Serializer {name} is not installed")
+    
+    if name not in _instances:
+        _instances[name] = SERIALIZERS[name]()
+    return _instances[name]
+
+
+def serializer_for_path(path: str) -> Serializer:
+    """Codec matching a file extension: msgpack for .msgpack/.mpk, fastest JSON otherwise"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in BINARY_EXTENSIONS:
+        return get_serializer(BINARY_EXTENSIONS[extension])
+    return get_serializer(text=True)
+
+
+# Shared JSON text codec for persistence formats that must stay JSON
+json_codec = get_serializer(text=True)
@@ -0,0 +1,80 @@
+"""
+Session Hibernation
+On-disk parking for idle sessions so only recently used ones stay resident
+"""
+from typing import Dict, Any, Optional
+import glob
+import os
+import pickle
+import shutil
+import socket
+import tempfile
+import zlib
+
+HIBERNATION_EXTENSION = ".session"
+
+
+class SessionHibernator:
+    """
+    Compact on-disk store for hibernated sessions
+    Sessions are pickled (state may hold arbitrary objects such as long-running
+    operations) and zlib-compressed, one file per session. Each instance works
+    in its own subdirectory, so replicas sharing a data volume never touch
+    each other's files
+    """
+    
+    def __init__(self, directory: str, compression_level: int = 1, instance: Optional[str] = None):
+        self.root = directory
+        self.instance = instance or f"{socket.gethostname()}-{os.getpid()}"
+        self.directory = os.path.join(directory, self.instance)
+        self.compression_level = compression_level
+        os.makedirs(self.directory, exist_ok=True)
+        
+        # Sessions only live as long as the service, so files this instance left behind
+        # in an earlier run (same host and pid, e.g. a restarted container) are stale
+        for path in glob.glob(os.path.join(self.directory, "*")):
+            os.remove(path)
+    
+    def path(self, session_id: str) -> str:
+        """File holding a hibernated session"""
+        return os.path.join(self.directory, f"{session_id}{HIBERNATION_EXTENSION}")
+    
+    def encode(self, session: Dict[str, Any]) -> bytes:
+        """Serialize a session; raises if its state cannot be pickled"""
+        return zlib.compress(pickle.dumps(session, protocol=pickle.HIGHEST_PROTOCOL), self.compression_level)
+    
+    def decode(self, data: bytes) -> Dict[str, Any]:
+        """Inverse of encode"""
+        return pickle.loads(zlib.decompress(data))
+    
+    def write(self, session_id: str, data: bytes):
+        """Store encoded session bytes atomically (temp file, fsync, rename)"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=f".{session_id}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path(session_id))
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+    
+    def read(self, session_id: str) -> bytes:
+        """Load encoded session bytes"""
+        with open(self.path(session_id), "rb") as f:
+            return f.read()
+    
+    def discard(self, session_id: str):
+        """Remove a session's file if present"""
+        try:
+            os.remove(self.path(session_id))
+        except FileNotFoundError:
+            pass
+    
+    def close(self):
+        """Remove this instance's directory; its sessions die with the service"""
+        shutil.rmtree(self.directory, ignore_errors=True)
@@ -2,12 +2,51 @@
 Session Management for Agent System
 Implements InMemorySessionService for state management
 """
-from typing import Dict, Any, Optional
-from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, List, Tuple
+from collections import Counter, OrderedDict
+from datetime import datetime
+from types import MappingProxyType
+import heapq
+import threading
+import time
 import uuid
 import logging
 from agents.memory_bank import MemoryBank
 from agents.base_agent import AgentContext
+from agents.conversation_history import ConversationHistory
+from agents.context_compaction import ContextCompactor
+from agents.session_hibernation import SessionHibernator
+
+
+class SessionShard:
+    """
+    One hash partition of the session table
+    Everything in a shard is guarded by its own lock, so users in different
+    shards never wait on each other
+    """
+    
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.sessions: Dict[str, Dict[str, Any]] = {}
+        
+        # Expiry index: deadlines holds each session's authoritative monotonic deadline;
+        # the heap has one (deadline, session_id) record per session that may be stale.
+        # Touches only update deadlines, and a popped record whose session was touched
+        # since is pushed back with the newer deadline, so reaping costs O(expired)
+        self.deadlines: Dict[str, float] = {}
+        self.expiry_heap: List[Tuple[float, str]] = []
+        
+        # Hibernation: hibernated maps session_id -> encoded bytes while the file is
+        # being written, then None once it is on disk; resident is the LRU order
+        self.hibernated: Dict[str, Optional[bytes]] = {}
+        self.resident: "OrderedDict[str, None]" = OrderedDict()
+        
+        # Cached AgentContext per resident session; memory_versions counts memory
+        # writes per session so a build that raced a write is not cached
+        self.contexts: Dict[str, AgentContext] = {}
+        self.memory_versions: Dict[str, int] = {}
+        
+        self.counters: Counter = Counter()
 
 
 class InMemorySessionService:
@@ -16,11 +55,64 @@ class InMemorySessionService:
     Handles session creation, state management, and context compaction
     """
     
-    def __init__(self, memory_bank: Optional[MemoryBank] = None, session_timeout: int = 3600):
-        self.sessions: Dict[str, Dict[str, Any]] = {}
+    def __init__(
+        self,
+        memory_bank: Optional[MemoryBank] = None,
+        session_timeout: int = 3600,
+        reap_interval: Optional[float] = 60.0,
+        max_messages: int = 50,
+        token_budget: Optional[int] = None,
+        hibernate_dir: Optional[str] = None,
+        hibernate_after: Optional[float] = None,
+        max_resident: Optional[int] = None,
+        num_shards: int = 16
+    ):
         self.memory_bank = memory_bank
         self.session_timeout = session_timeout  # seconds
+        self.max_messages = max_messages
         self.logger = logging.getLogger("session_manager")
+        
+        # The session table is split into hash shards, each with its own lock
+        self.shards = [SessionShard() for _ in range(max(1, num_shards))]
+        
+        # Sessions carry time.monotonic() floats for created_at/last_accessed and
+        # time.time() floats for message timestamps; ISO strings are only produced
+        # by export_session. The offset maps monotonic readings to wall-clock time
+        self._wall_offset = time.time() - time.monotonic()
+        
+        # Hibernation: idle sessions (or the least recently used ones past max_resident)
+        # are parked on disk; the resident limit is split evenly across shards
+        self.hibernator = SessionHibernator(hibernate_dir) if hibernate_dir else None
+        self.hibernate_after = hibernate_after
+        self.max_resident = max_resident
+        self._shard_resident = -(-max_resident // len(self.shards)) if max_resident else None
+        
+        # Cached contexts expose history and state as live views, so only memory needs
+        # patching; memory bank writes patch it copy-on-write
+        self._memory_generation = memory_bank.generation if memory_bank is not None else 0
+        if memory_bank is not None:
+            memory_bank.subscribe(self._on_memory_change)
+        
+        self._stop = threading.Event()
+        self._reaper: Optional[threading.Thread] = None
+        if reap_interval:
+            self._reaper = threading.Thread(
+                target=self._run_reaper,
+                args=(reap_interval,),
+                name="session-reaper",
+                daemon=True
+            )
+            self._reaper.start()
+        
+        # Token-budget compaction folds old turns into a rolling summary off the request path
+        self.compactor: Optional[ContextCompactor] = None
+        if token_budget:
+            self.compactor = ContextCompactor(self, token_budget=token_budget)
+            self.compactor.start()
+    
+    def shard_for(self, session_id: str) -> SessionShard:
+        """Shard owning a session"""
+        return self.shards[hash(session_id) % len(self.shards)]
     
     def create_session(
         self,
@@ -29,73 +121,430 @@ class InMemorySessionService:
     ) -> str:
         """Create a new session"""
         session_id = str(uuid.uuid4())
+        now = time.monotonic()
         
-        self.sessions[session_id] = {
+        self._insert({
             "session_id": session_id,
             "user_id": user_id,
-            "created_at": datetime.now().isoformat(),
-            "last_accessed": datetime.now().isoformat(),
-            "conversation_history": [],
+            "created_at": now,
+            "last_accessed": now,
+            "conversation_history": ConversationHistory(self.max_messages),
             "state": initial_context or {},
             "metadata": {}
-        }
-        
+        })
         self.logger.info(f"Created session: {session_id}")
         return session_id
     
+    def _insert(self, session: Dict[str, Any]):
+        """Register a new session in its shard"""
+        session_id = session["session_id"]
+        shard = self.shard_for(session_id)
+        with shard.lock:
+            shard.sessions[session_id] = session
+            deadline = session["last_accessed"] + self.session_timeout
+            shard.deadlines[session_id] = deadline
+            heapq.heappush(shard.expiry_heap, (deadline, session_id))
+            if self.hibernator is not None:
+                shard.resident[session_id] = None
+        self._enforce_resident_limit(shard)
+    
+    def fork_session(self, session_id: str, user_id: Optional[str] = None) -> Optional[str]:
+        """
+        Create a what-if child of a session in O(1)
+        History and state are shared copy-on-write with the parent until either side
+        writes; memory bank entries stay with the parent's session id
+        """
+        child_id = str(uuid.uuid4())
+        now = time.monotonic()
+        shard = self.shard_for(session_id)
+        with shard.lock:
+            parent = self._resident_session(shard, session_id)
+            if parent is None:
+                return None
+            history = parent["conversation_history"].fork()
+            parent["state_shared"] = True
+            child = {
+                "session_id": child_id,
+                "user_id": user_id if user_id is not None else parent.get("user_id"),
+                "created_at": now,
+                "last_accessed": now,
+                "conversation_history": history,
+                "state": parent["state"],
+                "state_shared": True,
+                "metadata": dict(parent["metadata"], forked_from=session_id),
+                # Neither side mutates the shared state dict, so it doubles as the fork-time snapshot
+                "fork_base": {"parent_id": session_id, "state": parent["state"], "appended": history.appended}
+            }
+        
+        self._enforce_resident_limit(shard)
+        self._insert(child)
+        self.logger.info(f"Forked session {session_id} -> {child_id}")
+        return child_id
+    
+    def diff_fork(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Changes a fork made since it was forked (or last merged)"""
+        shard = self.shard_for(session_id)
+        with shard.lock:
+            session = self._resident_session(shard, session_id)
+            if session is None or "fork_base" not in session:
+                return None
+            base = session["fork_base"]
+            before, after = base["state"], session["state"]
+            added: Dict[str, Any] = {}
+            changed: Dict[str, Any] = {}
+            removed: List[str] = []
+            if after is not before:
+                for key, value in after.items():
+                    if key not in before:
+                        added[key] = value
+                    elif value is not before[key] and value != before[key]:
+                        changed[key] = value
+                removed = [key for key in before if key not in after]
+            messages = session["conversation_history"].since(base["appended"])
+        
+        self._enforce_resident_limit(shard)
+        return {
+            "parent_id": base["parent_id"],
+            "messages": messages,
+            "state": {"added": added, "changed": changed, "removed": removed}
+        }
+    
+    def merge_fork(
+        self,
+        session_id: str,
+        messages: bool = True,
+        state: bool = True,
+        delete: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Apply a fork's changes to its parent (the fork wins on conflicting state keys)
+        Returns the merged diff, or None if the fork or its parent is gone
+        """
+        diff = self.diff_fork(session_id)
+        if diff is None:
+            return None
+        parent_id = diff["parent_id"]
+        if state:
+            state_diff = diff["state"]
+            if not self._write_state(parent_id, {**state_diff["added"], **state_diff["changed"]}, state_diff["removed"]):
+                return None
+        elif self.get_session(parent_id) is None:
+            return None
+        if messages:
+            for message in diff["messages"]:
+                metadata = dict(message.get("metadata") or {}, merged_from=session_id)
+                self.add_message(parent_id, message.get("role", "user"), message.get("content", ""), metadata)
+        
+        if delete:
+            self.delete_session(session_id)
+        else:
+            # Rebase so the next diff only shows changes made after this merge
+            shard = self.shard_for(session_id)
+            with shard.lock:
+                child = self._resident_session(shard, session_id)
+                if child is not None:
+                    child["state_shared"] = True
+                    child["fork_base"] = {
+                        "parent_id": parent_id,
+                        "state": child["state"],
+                        "appended": child["conversation_history"].appended
+                    }
+            self._enforce_resident_limit(shard)
+        
+        self.logger.info(f"Merged fork {session_id} into {parent_id}")
+        return diff
+    
     def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
-        """Get session by ID"""
-        if session_id in self.sessions:
-            session = self.sessions[session_id]
-            # Check if session expired
-            last_accessed = datetime.fromisoformat(session["last_accessed"])
-            if datetime.now() - last_accessed > timedelta(seconds=self.session_timeout):
-                self.logger.warning(f"Session {session_id} expired")
+        """
+        Get session by ID
+        The dict may be hibernated once the lock is released; the service's own
+        writes look the session up again under the shard lock
+        """
+        shard = self.shard_for(session_id)
+        with shard.lock:
+            session = self._resident_session(shard, session_id)
+        self._enforce_resident_limit(shard)
+        return session
+    
+    def _resident_session(self, shard: SessionShard, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Touch a session, rehydrating it if hibernated (caller holds the shard lock)
+        Callers that mutate the session do so before releasing the lock, then call
+        _enforce_resident_limit
+        """
+        deadline = shard.deadlines.get(session_id)
+        if deadline is None:
+            return None
+        
+        # Check if session expired
+        now = time.monotonic()
+        if deadline <= now:
+            self._remove(shard, session_id)
+            shard.counters["expired"] += 1
+            self.logger.warning(f"Session {session_id} expired")
+            return None
+        
+        session = shard.sessions.get(session_id)
+        if session is None:
+            session = self._rehydrate(shard, session_id)
+            if session is None:
                 return None
-            
-            session["last_accessed"] = datetime.now().isoformat()
-            return session
-        return None
+        
+        shard.deadlines[session_id] = now + self.session_timeout
+        session["last_accessed"] = now
+        if self.hibernator is not None:
+            shard.resident[session_id] = None
+            shard.resident.move_to_end(session_id)
+        return session
     
-    def get_context(self, session_id: str) -> Optional[AgentContext]:
-        """Get agent context for a session"""
-        session = self.get_session(session_id)
-        if not session:
+    def _rehydrate(self, shard: SessionShard, session_id: str) -> Optional[Dict[str, Any]]:
+        """Load a hibernated session back into memory (caller holds the shard lock)"""
+        data = shard.hibernated.pop(session_id, None)
+        try:
+            if data is None:
+                data = self.hibernator.read(session_id)
+            session = self.hibernator.decode(data)
+        except Exception as e:
+            shard.counters["hibernation_failures"] += 1
+            shard.deadlines.pop(session_id, None)
+            self.logger.error(f"Could not rehydrate session {session_id}: {e}")
             return None
+        finally:
+            self.hibernator.discard(session_id)
+        
+        shard.sessions[session_id] = session
+        shard.counters["rehydrations"] += 1
+        return session
+    
+    def hibernate_session(self, session_id: str) -> bool:
+        """Move one resident session to disk"""
+        return self._hibernate(self.shard_for(session_id), [session_id]) == 1
+    
+    def hibernate_idle(self) -> int:
+        """Hibernate sessions idle for longer than hibernate_after"""
+        if self.hibernator is None or not self.hibernate_after:
+            return 0
+        cutoff = time.monotonic() - self.hibernate_after
+        hibernated = 0
+        for shard in self.shards:
+            with shard.lock:
+                idle = []
+                for session_id in shard.resident:
+                    if shard.sessions[session_id]["last_accessed"] > cutoff:
+                        break
+                    idle.append(session_id)
+            hibernated += self._hibernate(shard, idle, idle_before=cutoff)
+        return hibernated
+    
+    def _enforce_resident_limit(self, shard: SessionShard):
+        """Hibernate a shard's least recently used sessions beyond its share of max_resident"""
+        if self.hibernator is None or not self._shard_resident or len(shard.resident) <= self._shard_resident:
+            return
+        with shard.lock:
+            excess = len(shard.resident) - self._shard_resident
+            if excess <= 0:
+                return
+            victims = [session_id for session_id, _ in zip(shard.resident, range(excess))]
+        self._hibernate(shard, victims, over_limit=True)
+    
+    def _hibernate(
+        self,
+        shard: SessionShard,
+        session_ids: List[str],
+        idle_before: Optional[float] = None,
+        over_limit: bool = False
+    ) -> int:
+        """
+        Encode sessions under the shard lock, then write them out without holding it
+        Victims are picked before the lock is retaken, so idle_before skips sessions
+        touched since, and over_limit skips ones no longer at the LRU front or no
+        longer beyond the shard's share of max_resident
+        """
+        if self.hibernator is None:
+            return 0
         
-        return AgentContext(
+        parked = []
+        with shard.lock:
+            for session_id in session_ids:
+                session = shard.sessions.get(session_id)
+                if session is None:
+                    continue
+                if idle_before is not None and session["last_accessed"] > idle_before:
+                    continue
+                if over_limit and (
+                    len(shard.resident) <= self._shard_resident
+                    or next(iter(shard.resident)) != session_id
+                ):
+                    continue
+                try:
+                    data = self.hibernator.encode(session)
+                except Exception as e:
+                    # Unpicklable state keeps the session resident; move it out of the LRU front
+                    shard.counters["hibernation_failures"] += 1
+                    shard.resident.move_to_end(session_id)
+                    self.logger.debug(f"Session {session_id} cannot be hibernated: {e}")
+                    continue
+                del shard.sessions[session_id]
+                shard.resident.pop(session_id, None)
+                shard.contexts.pop(session_id, None)
+                shard.hibernated[session_id] = data
+                shard.counters["hibernations"] += 1
+                parked.append((session_id, data))
+        
+        for session_id, data in parked:
+            self.hibernator.write(session_id, data)
+            with shard.lock:
+                if shard.hibernated.get(session_id) is data:
+                    shard.hibernated[session_id] = None
+                elif session_id not in shard.hibernated:
+                    # Rehydrated or deleted while the file was being written
+                    self.hibernator.discard(session_id)
+        
+        if parked:
+            self.logger.debug(f"Hibernated {len(parked)} sessions")
+        return len(parked)
+    
+    def get_context(self, session_id: str) -> Optional[AgentContext]:
+        """
+        Get agent context for a session
+        The context is cached; its state and memory are read-only views
+        """
+        if self.memory_bank is not None and self.memory_bank.generation != self._memory_generation:
+            # Memory was resynced without per-key notifications
+            self._memory_generation = self.memory_bank.generation
+            for other in self.shards:
+                with other.lock:
+                    other.contexts.clear()
+        
+        shard = self.shard_for(session_id)
+        with shard.lock:
+            session = self._resident_session(shard, session_id)
+            if session is None:
+                return None
+            context = shard.contexts.get(session_id)
+            if context is not None and context.conversation_history is session["conversation_history"]:
+                shard.counters["context_hits"] += 1
+                return context
+            memory_version = shard.memory_versions.get(session_id, 0)
+            bank_generation = self.memory_bank.generation if self.memory_bank is not None else 0
+        
+        self._enforce_resident_limit(shard)
+        if self.memory_bank is not None:
+            memory = MappingProxyType(self.memory_bank.get_all(session_id))
+        else:
+            # Without a memory bank agents store memories on the context itself
+            memory = {}
+        context = AgentContext(
             session_id=session_id,
             user_id=session.get("user_id"),
-            conversation_history=session.get("conversation_history", []),
-            memory=self.memory_bank.get_all(session_id) if self.memory_bank else {},
-            state=session.get("state", {})
+            conversation_history=session["conversation_history"],
+            memory=memory,
+            state=MappingProxyType(session["state"]),
+            memory_bank=self.memory_bank
         )
+        
+        with shard.lock:
+            shard.counters["context_builds"] += 1
+            # Any memory write since the read above may be missing from this build
+            if (
+                shard.memory_versions.get(session_id, 0) == memory_version
+                and (self.memory_bank is None or self.memory_bank.generation == bank_generation)
+                and session_id in shard.sessions
+            ):
+                shard.contexts[session_id] = context
+        return context
+    
+    def _on_memory_change(self, op: str, session_id: str, key: Optional[str], entry: Optional[Dict[str, Any]]):
+        """MemoryBank listener keeping cached contexts' memory current"""
+        shard = self.shard_for(session_id)
+        with shard.lock:
+            if session_id in shard.sessions or session_id in shard.hibernated:
+                shard.memory_versions[session_id] = shard.memory_versions.get(session_id, 0) + 1
+            context = shard.contexts.get(session_id)
+            if context is None:
+                return
+            if key is None:
+                del shard.contexts[session_id]
+                return
+            
+            # Copy-on-write so agents iterating the previous view are unaffected
+            memory = dict(context.memory)
+            if op == "set":
+                memory[key] = entry["value"]
+            else:
+                memory.pop(key, None)
+            context.memory = MappingProxyType(memory)
     
     def add_message(self, session_id: str, role: str, content: str, metadata: Optional[Dict[str, Any]] = None):
         """Add message to conversation history"""
-        session = self.get_session(session_id)
-        if session:
-            message = {
-                "role": role,
-                "content": content,
-                "timestamp": datetime.now().isoformat(),
-                "metadata": metadata or {}
-            }
-            session["conversation_history"].append(message)
-            
-            # Context compaction: keep only last N messages
-            max_messages = 50
-            if len(session["conversation_history"]) > max_messages:
-                # Keep first message (system/initial) and last N-1 messages
-                first_msg = session["conversation_history"][0]
-                session["conversation_history"] = [first_msg] + session["conversation_history"][-max_messages+1:]
-                self.logger.debug(f"Compacted context for session {session_id}")
+        message = {
+            "role": role,
+            "content": content,
+            "timestamp": time.time(),
+            "metadata": metadata or {}
+        }
+        shard = self.shard_for(session_id)
+        with shard.lock:
+            session = self._resident_session(shard, session_id)
+            if session is None:
+                return
+            # Context compaction: the ring keeps the first message (system/initial)
+            # and the last N-1 messages, dropping the oldest turn in O(1)
+            history = session["conversation_history"]
+            dropped = history.append(message)
+            over_budget = self.compactor is not None and self.compactor.over_budget(history)
+        self._enforce_resident_limit(shard)
+        if dropped is not None:
+            self.logger.debug(f"Compacted context for session {session_id}")
+        if over_budget:
+            self.compactor.schedule(session_id)
+    
+    def export_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Copy of a session with ISO-8601 timestamps, for display or serialization"""
+        shard = self.shard_for(session_id)
+        with shard.lock:
+            session = self._resident_session(shard, session_id)
+            if session is None:
+                return None
+            exported = dict(session)
+            exported["conversation_history"] = [
+                dict(message, timestamp=self._iso(message.get("timestamp"), wall=True))
+                for message in session["conversation_history"]
+            ]
+            exported["state"] = dict(session["state"])
+        
+        self._enforce_resident_limit(shard)
+        exported["created_at"] = self._iso(session["created_at"])
+        exported["last_accessed"] = self._iso(session["last_accessed"])
+        return exported
+    
+    def _iso(self, ts: Any, wall: bool = False) -> Any:
+        """Format a monotonic (or wall-clock) float as ISO-8601"""
+        if not isinstance(ts, (int, float)):
+            return ts
+        return datetime.fromtimestamp(ts if wall else ts + self._wall_offset).isoformat()
     
     def update_state(self, session_id: str, key: str, value: Any):
         """Update session state"""
-        session = self.get_session(session_id)
-        if session:
-            session["state"][key] = value
+        self._write_state(session_id, {key: value})
+    
+    def _write_state(self, session_id: str, updates: Dict[str, Any], removed: Optional[List[str]] = None) -> bool:
+        """Apply state writes, first copying a state dict still shared with a fork"""
+        shard = self.shard_for(session_id)
+        with shard.lock:
+            session = self._resident_session(shard, session_id)
+            if session is None:
+                return False
+            if session.get("state_shared"):
+                session["state"] = dict(session["state"])
+                session["state_shared"] = False
+                # The cached context holds a view of the old dict
+                shard.contexts.pop(session_id, None)
+            session["state"].update(updates)
+            for key in removed or ():
+                session["state"].pop(key, None)
+        self._enforce_resident_limit(shard)
+        return True
     
     def get_state(self, session_id: str, key: Optional[str] = None) -> Any:
         """Get session state"""
@@ -108,44 +557,120 @@ class InMemorySessionService:
     
     def compact_context(self, session_id: str, keep_recent: int = 20):
         """Manually compact context for a session"""
-        session = self.get_session(session_id)
-        if session:
-            history = session["conversation_history"]
-            if len(history) > keep_recent:
-                # Keep first message and recent messages
-                first_msg = history[0] if history else None
-                recent = history[-keep_recent:]
-                session["conversation_history"] = ([first_msg] + recent) if first_msg else recent
-                self.logger.info(f"Compacted context for session {session_id}: {len(history)} -> {len(session['conversation_history'])} messages")
+        shard = self.shard_for(session_id)
+        with shard.lock:
+            session = self._resident_session(shard, session_id)
+            history = session["conversation_history"] if session is not None else None
+            if history is None or len(history) <= keep_recent:
+                return
+            # Keep first message and recent messages
+            before = len(history)
+            history.compact(keep_recent)
+            after = len(history)
+        self._enforce_resident_limit(shard)
+        self.logger.info(f"Compacted context for session {session_id}: {before} -> {after} messages")
     
     def delete_session(self, session_id: str):
         """Delete a session"""
-        if session_id in self.sessions:
-            del self.sessions[session_id]
-            self.logger.info(f"Deleted session: {session_id}")
+        shard = self.shard_for(session_id)
+        with shard.lock:
+            if self._remove(shard, session_id):
+                self.logger.info(f"Deleted session: {session_id}")
     
-    def cleanup_expired_sessions(self):
-        """Remove expired sessions"""
-        now = datetime.now()
-        expired = []
-        
-        for session_id, session in self.sessions.items():
-            last_accessed = datetime.fromisoformat(session["last_accessed"])
-            if now - last_accessed > timedelta(seconds=self.session_timeout):
-                expired.append(session_id)
-        
-        for session_id in expired:
-            self.delete_session(session_id)
+    def _remove(self, shard: SessionShard, session_id: str) -> bool:
+        """Drop a session; its heap record goes stale and is skipped when popped"""
+        shard.deadlines.pop(session_id, None)
+        shard.contexts.pop(session_id, None)
+        shard.memory_versions.pop(session_id, None)
+        if self.hibernator is not None:
+            shard.resident.pop(session_id, None)
+            if session_id in shard.hibernated:
+                del shard.hibernated[session_id]
+                self.hibernator.discard(session_id)
+                return True
+        return shard.sessions.pop(session_id, None) is not None
+    
+    def _expire_due(self, shard: SessionShard) -> int:
+        """Pop a shard's heap records that are due and remove the sessions that really expired"""
+        now = time.monotonic()
+        expired = 0
+        heap = shard.expiry_heap
+        while heap and heap[0][0] <= now:
+            _, session_id = heapq.heappop(heap)
+            deadline = shard.deadlines.get(session_id)
+            if deadline is None:
+                continue
+            if deadline > now:
+                heapq.heappush(heap, (deadline, session_id))
+                continue
+            self._remove(shard, session_id)
+            expired += 1
+        shard.counters["expired"] += expired
+        return expired
+    
+    def cleanup_expired_sessions(self) -> int:
+        """Remove expired sessions, holding one shard lock at a time"""
+        expired = 0
+        for shard in self.shards:
+            with shard.lock:
+                expired += self._expire_due(shard)
         
         if expired:
-            self.logger.info(f"Cleaned up {len(expired)} expired sessions")
+            self.logger.info(f"Cleaned up {expired} expired sessions")
+        return expired
+    
+    def _run_reaper(self, interval: float):
+        """Background loop expiring idle sessions and hibernating inactive ones"""
+        while not self._stop.wait(interval):
+            try:
+                self.cleanup_expired_sessions()
+                self.hibernate_idle()
+            except Exception as e:
+                self.logger.error(f"Error reaping sessions: {e}")
+    
+    def close(self):
+        """Stop the background reaper and compactor and drop hibernated sessions"""
+        self._stop.set()
+        if self._reaper is not None:
+            self._reaper.join(timeout=5)
+            self._reaper = None
+        if self.compactor is not None:
+            self.compactor.stop()
+        if self.hibernator is not None:
+            self.hibernator.close()
     
     def get_session_stats(self) -> Dict[str, Any]:
-        """Get statistics about sessions"""
-        return {
-            "total_sessions": len(self.sessions),
-            "active_sessions": len([
-                s for s in self.sessions.values()
-                if datetime.now() - datetime.fromisoformat(s["last_accessed"]) < timedelta(seconds=self.session_timeout)
-            ])
+        """Get statistics about sessions, holding one shard lock at a time"""
+        resident = hibernated = active = cached = 0
+        counters: Counter = Counter()
+        for shard in self.shards:
+            with shard.lock:
+                self._expire_due(shard)
+                resident += len(shard.sessions)
+                hibernated += len(shard.hibernated)
+                active += len(shard.deadlines)
+                cached += len(shard.contexts)
+                counters.update(shard.counters)
+        
+        stats = {
+            "total_sessions": resident + hibernated,
+            "active_sessions": active,
+            "expired_sessions": counters["expired"],
+            "shards": len(self.shards),
+            "context_cache": {
+                "hits": counters["context_hits"],
+                "builds": counters["context_builds"],
+                "cached": cached
+            }
         }
+        if self.hibernator is not None:
+            stats["hibernation"] = {
+                "hibernations": counters["hibernations"],
+                "rehydrations": counters["rehydrations"],
+                "failures": counters["hibernation_failures"],
+                "resident_sessions": resident,
+                "hibernated_sessions": hibernated
+            }
+        if self.compactor is not None:
+            stats["compaction"] = self.compactor.get_stats()
+        return stats
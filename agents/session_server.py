@@ -0,0 +1,560 @@
+"""
+Session Store Server
+Serves an InMemorySessionService over a local TCP or Unix socket so several
+app replicas can share sessions, plus a pooled, pipelining client
+"""
+from typing import Dict, Any, Optional, List, Tuple
+import argparse
+import hashlib
+import hmac
+import logging
+import os
+import pickle
+import queue
+import socket
+import socketserver
+import struct
+import threading
+from types import MappingProxyType
+from agents.base_agent import AgentContext
+from agents.memory_bank import MemoryBank
+from agents.memory_backends import SQLiteBackend
+from agents.session_manager import InMemorySessionService
+
+# Frames are a 4-byte big-endian length followed by a pickled payload:
+# requests are (request_id, method, args, kwargs), replies (request_id, ok, result)
+# where a failed request's result is a SessionStoreError
+FRAME_HEADER = struct.Struct("!I")
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+DEFAULT_ADDRESS = "tcp://127.0.0.1:7420"
+# Handshake frames are raw bytes: the server's challenge (empty without a key),
+# then HMAC(challenge) + client nonce, then the server's HMAC(client nonce)
+AUTH_NONCE_SIZE = 32
+AUTH_DIGEST_SIZE = hashlib.sha256().digest_size
+
+# InMemorySessionService methods exposed to clients
+SESSION_METHODS = frozenset({
+    "create_session",
+    "get_session",
+    "get_context",
+    "add_message",
+    "update_state",
+    "get_state",
+    "compact_context",
+    "delete_session",
+    "export_session",
+    "fork_session",
+    "diff_fork",
+    "merge_fork",
+    "hibernate_session",
+    "cleanup_expired_sessions",
+    "get_session_stats"
+})
+
+
+class SessionStoreError(Exception):
+    """An operation failed on the session store server"""
+
+
+def as_error(result: Any) -> SessionStoreError:
+    """Error reply payload as a SessionStoreError"""
+    return result if isinstance(result, SessionStoreError) else SessionStoreError(result)
+
+
+def parse_address(address: str) -> Tuple[int, Any]:
+    """Map tcp://host:port or unix:///path to a socket family and address"""
+    if address.startswith("unix://"):
+        return socket.AF_UNIX, address[len("unix://"):]
+    if address.startswith("tcp://"):
+        address = address[len("tcp://"):]
+    host, _, port = address.rpartition(":")
+    return socket.AF_INET, (host or "127.0.0.1", int(port))
+
+
+def auth_digest(auth_key: bytes, role: bytes, nonce: bytes) -> bytes:
+    """Handshake proof that the sender holds the key"""
+    return hmac.new(auth_key, role + nonce, hashlib.sha256).digest()
+
+
+def encode_frame(payload: Any) -> bytes:
+    """Serialize one frame"""
+    return raw_frame(pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def raw_frame(data: bytes) -> bytes:
+    """Frame bytes without encoding them"""
+    return FRAME_HEADER.pack(len(data)) + data
+
+
+def read_frame(stream) -> Optional[Any]:
+    """Read and unpickle one frame from a binary file object; None on a clean EOF"""
+    data = read_raw_frame(stream)
+    return pickle.loads(data) if data is not None else None
+
+
+def read_raw_frame(stream) -> Optional[bytes]:
+    """Read one frame's bytes without decoding them"""
+    header = stream.read(FRAME_HEADER.size)
+    if not header:
+        return None
+    if len(header) < FRAME_HEADER.size:
+        raise EOFError("connection closed mid-frame")
+    (size,) = FRAME_HEADER.unpack(header)
+    if size > MAX_FRAME_SIZE:
+        raise ValueError(f"frame of {size} bytes exceeds the {MAX_FRAME_SIZE} byte limit")
+    data = stream.read(size)
+    if len(data) < size:
+        raise EOFError("connection closed mid-frame")
+    return data
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+    request_queue_size = 128
+
+
+if hasattr(socketserver, "ThreadingUnixStreamServer"):
+    class _UnixServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+        request_queue_size = 128
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """Serves one client connection; pipelined requests are answered in order"""
+    
+    def setup(self):
+        super().setup()
+        if isinstance(self.client_address, tuple):
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    
+    def handle(self):
+        store = self.server.store
+        if not self._handshake(store):
+            return
+        
+        while True:
+            try:
+                request = read_frame(self.rfile)
+            except (EOFError, ValueError, OSError) as e:
+                store.logger.debug(f"Dropping session store client: {e}")
+                return
+            if request is None:
+                return
+            self.wfile.write(store.reply(request))
+    
+    def _handshake(self, store: "SessionStoreServer") -> bool:
+        """Challenge-response on raw frames, so nothing is unpickled before the client checks out"""
+        if store.auth_key is None:
+            self.wfile.write(raw_frame(b""))
+            return True
+        
+        challenge = os.urandom(AUTH_NONCE_SIZE)
+        self.wfile.write(raw_frame(challenge))
+        try:
+            answer = read_raw_frame(self.rfile)
+        except (EOFError, ValueError, OSError):
+            answer = None
+        if (
+            answer is None
+            or len(answer) != AUTH_DIGEST_SIZE + AUTH_NONCE_SIZE
+            or not hmac.compare_digest(answer[:AUTH_DIGEST_SIZE], auth_digest(store.auth_key, b"client", challenge))
+        ):
+            store.logger.warning("Rejected session store client with a bad auth key")
+            return False
+        self.wfile.write(raw_frame(auth_digest(store.auth_key, b"server", answer[AUTH_DIGEST_SIZE:])))
+        return True
+
+
+class SessionStoreServer:
+    """
+    Session store process
+    Wraps an InMemorySessionService and answers framed requests on a socket.
+    Payloads are pickled, so TCP addresses require auth_key; without one, serve
+    on a Unix socket, which is created readable by this user only
+    """
+    
+    def __init__(
+        self,
+        address: str = DEFAULT_ADDRESS,
+        session_service: Optional[InMemorySessionService] = None,
+        auth_key: Optional[bytes] = None
+    ):
+        self.session_service = session_service or InMemorySessionService()
+        self.auth_key = auth_key
+        self.logger = logging.getLogger("session_server")
+        
+        family, bind_address = parse_address(address)
+        if family == socket.AF_INET:
+            # Any local process can reach a TCP port, loopback included
+            if auth_key is None:
+                raise ValueError(
+                    f"Refusing to serve sessions on {address} without an auth key; "
+                    "set SESSION_STORE_KEY or use a unix:// address"
+                )
+            self._server = _TCPServer(bind_address, _RequestHandler)
+        else:
+            if os.path.exists(bind_address):
+                os.remove(bind_address)
+            # Bind under a restrictive umask so the socket is never open to other users
+            umask = os.umask(0o077)
+            try:
+                self._server = _UnixServer(bind_address, _RequestHandler)
+            finally:
+                os.umask(umask)
+        self._server.store = self
+        self._thread: Optional[threading.Thread] = None
+    
+    @property
+    def address(self) -> str:
+        """Bound address in tcp://host:port or unix:///path form"""
+        bound = self._server.server_address
+        if isinstance(bound, tuple):
+            return f"tcp://{bound[0]}:{bound[1]}"
+        return f"unix://{bound}"
+    
+    def dispatch(self, request: Tuple[int, str, tuple, dict]) -> Tuple[Optional[int], bool, Any]:
+        """Run one request against the session service"""
+        try:
+            request_id, method, args, kwargs = request
+        except (TypeError, ValueError):
+            return None, False, SessionStoreError("Malformed session store request")
+        if method not in SESSION_METHODS:
+            return request_id, False, SessionStoreError(f"Unknown session store method: {method}")
+        try:
+            return request_id, True, getattr(self.session_service, method)(*args, **kwargs)
+        except Exception as e:
+            self.logger.error(f"Session store {method} failed: {e}")
+            return request_id, False, SessionStoreError(f"{type(e).__name__}: {e}")
+    
+    def reply(self, request: Any) -> bytes:
+        """Encoded reply frame for one request; results that cannot be encoded become errors"""
+        request_id, ok, result = self.dispatch(request)
+        try:
+            return encode_frame((request_id, ok, result))
+        except Exception as e:
+            self.logger.error(f"Cannot encode session store reply to request {request_id}: {e}")
+            error = SessionStoreError(f"Cannot encode result: {type(e).__name__}: {e}")
+            return encode_frame((request_id, False, error))
+    
+    def serve_forever(self):
+        """Serve on the calling thread until stop()"""
+        self.logger.info(f"Session store listening on {self.address}")
+        self._server.serve_forever()
+    
+    def start(self):
+        """Serve on a daemon thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.serve_forever, name="session-store-server", daemon=True)
+            self._thread.start()
+    
+    def stop(self):
+        """Stop serving and release the socket"""
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if isinstance(self._server.server_address, str):
+            try:
+                os.remove(self._server.server_address)
+            except OSError:
+                pass
+        self.session_service.close()
+
+
+class _Connection:
+    """One pooled client socket"""
+    
+    def __init__(self, address: str, timeout: float, auth_key: Optional[bytes]):
+        family, connect_address = parse_address(address)
+        if family == socket.AF_INET and auth_key is None:
+            # Replies are unpickled, so never trust an unauthenticated TCP peer
+            raise ConnectionError(f"Session store at {address} needs an auth key; set SESSION_STORE_KEY")
+        self.sock = socket.socket(family, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(connect_address)
+        if family == socket.AF_INET:
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.rfile = self.sock.makefile("rb")
+        try:
+            self._handshake(auth_key)
+        except (EOFError, ValueError, OSError) as e:
+            self.close()
+            raise ConnectionError(f"Session store handshake failed: {e}") from e
+    
+    def _handshake(self, auth_key: Optional[bytes]):
+        """Answer the server's challenge and check its proof before trusting any pickled reply"""
+        challenge = read_raw_frame(self.rfile)
+        if challenge is None:
+            raise EOFError("connection closed during the handshake")
+        if not challenge:
+            if auth_key is not None:
+                raise ValueError("server does not use an auth key")
+            return
+        if auth_key is None:
+            raise ValueError("server requires an auth key")
+        
+        nonce = os.urandom(AUTH_NONCE_SIZE)
+        self.sock.sendall(raw_frame(auth_digest(auth_key, b"client", challenge) + nonce))
+        proof = read_raw_frame(self.rfile)
+        if proof is None:
+            raise EOFError("server rejected the auth key")
+        if not hmac.compare_digest(proof, auth_digest(auth_key, b"server", nonce)):
+            raise ValueError("server failed to prove it holds the auth key")
+    
+    def close(self):
+        try:
+            self.rfile.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class RemoteSessionService:
+    """
+    Client for SessionStoreServer with the InMemorySessionService interface
+    Connections are pooled; pipeline() batches calls into one round trip.
+    Returned sessions and contexts are copies, so change them through the methods.
+    With a memory_bank, context memory is read from it instead of the server's bank
+    """
+    
+    def __init__(
+        self,
+        address: str = DEFAULT_ADDRESS,
+        pool_size: int = 8,
+        timeout: float = 10.0,
+        auth_key: Optional[bytes] = None,
+        memory_bank: Optional[MemoryBank] = None
+    ):
+        self.address = address
+        self.timeout = timeout
+        self.auth_key = auth_key
+        self.memory_bank = memory_bank
+        self._pool: "queue.LifoQueue[_Connection]" = queue.LifoQueue(maxsize=pool_size)
+        self._next_id = 0
+        self._id_lock = threading.Lock()
+    
+    def _acquire(self) -> _Connection:
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            return _Connection(self.address, self.timeout, self.auth_key)
+    
+    def _release(self, conn: _Connection):
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+    
+    def _request_ids(self, count: int) -> range:
+        with self._id_lock:
+            start = self._next_id
+            self._next_id += count
+        return range(start, start + count)
+    
+    def execute(self, calls: List[Tuple[str, tuple, dict]]) -> List[Tuple[bool, Any]]:
+        """Send calls back to back on one connection, then read every reply"""
+        if not calls:
+            return []
+        request_ids = self._request_ids(len(calls))
+        payload = b"".join(
+            encode_frame((request_id, method, args, kwargs))
+            for request_id, (method, args, kwargs) in zip(request_ids, calls)
+        )
+        
+        try:
+            conn = self._acquire()
+        except OSError as e:
+            raise ConnectionError(f"Cannot connect to session store at {self.address}: {e}") from e
+        try:
+            conn.sock.sendall(payload)
+            replies = [read_frame(conn.rfile) for _ in calls]
+        except (OSError, EOFError) as e:
+            conn.close()
+            raise ConnectionError(f"Session store at {self.address} is unreachable: {e}") from e
+        if any(reply is None for reply in replies):
+            conn.close()
+            raise ConnectionError(f"Session store at {self.address} closed the connection")
+        self._release(conn)
+        
+        results = []
+        for request_id, (reply_id, ok, result) in zip(request_ids, replies):
+            if reply_id != request_id:
+                raise SessionStoreError(f"Out-of-order reply {reply_id} for request {request_id}")
+            results.append((ok, result))
+        return results
+    
+    def _call(self, method: str, *args, **kwargs) -> Any:
+        ok, result = self.execute([(method, args, kwargs)])[0]
+        if not ok:
+            raise as_error(result)
+        return result
+    
+    def pipeline(self) -> "SessionPipeline":
+        """Queue calls and send them in one round trip"""
+        return SessionPipeline(self)
+    
+    def create_session(self, user_id: Optional[str] = None, initial_context: Optional[Dict[str, Any]] = None) -> str:
+        """Create a new session"""
+        return self._call("create_session", user_id, initial_context)
+    
+    def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Get a copy of a session"""
+        return self._call("get_session", session_id)
+    
+    def get_context(self, session_id: str) -> Optional[AgentContext]:
+        """Get agent context for a session"""
+        return self._with_memory(self._call("get_context", session_id))
+    
+    def _with_memory(self, context: Optional[AgentContext]) -> Optional[AgentContext]:
+        """Point a context at the local memory bank, which agents write to"""
+        if context is not None and self.memory_bank is not None:
+            context.memory = MappingProxyType(self.memory_bank.get_all(context.session_id))
+            context.memory_bank = self.memory_bank
+        return context
+    
+    def add_message(self, session_id: str, role: str, content: str, metadata: Optional[Dict[str, Any]] = None):
+        """Add message to conversation history"""
+        return self._call("add_message", session_id, role, content, metadata)
+    
+    def update_state(self, session_id: str, key: str, value: Any):
+        """Update session state"""
+        return self._call("update_state", session_id, key, value)
+    
+    def get_state(self, session_id: str, key: Optional[str] = None) -> Any:
+        """Get session state"""
+        return self._call("get_state", session_id, key)
+    
+    def compact_context(self, session_id: str, keep_recent: int = 20):
+        """Manually compact context for a session"""
+        return self._call("compact_context", session_id, keep_recent)
+    
+    def delete_session(self, session_id: str):
+        """Delete a session"""
+        return self._call("delete_session", session_id)
+    
+    def export_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Copy of a session with ISO-8601 timestamps"""
+        return self._call("export_session", session_id)
+    
+    def fork_session(self, session_id: str, user_id: Optional[str] = None) -> Optional[str]:
+        """Create a what-if child of a session"""
+        return self._call("fork_session", session_id, user_id)
+    
+    def diff_fork(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Changes a fork made since it was forked"""
+        return self._call("diff_fork", session_id)
+    
+    def merge_fork(self, session_id: str, messages: bool = True, state: bool = True, delete: bool = False) -> Optional[Dict[str, Any]]:
+        """Apply a fork's changes to its parent"""
+        return self._call("merge_fork", session_id, messages, state, delete)
+    
+    def hibernate_session(self, session_id: str) -> bool:
+        """Move one resident session to disk on the server"""
+        return self._call("hibernate_session", session_id)
+    
+    def cleanup_expired_sessions(self) -> int:
+        """Remove expired sessions"""
+        return self._call("cleanup_expired_sessions")
+    
+    def get_session_stats(self) -> Dict[str, Any]:
+        """Get statistics about sessions"""
+        return self._call("get_session_stats")
+    
+    def close(self):
+        """Close pooled connections"""
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class SessionPipeline:
+    """
+    Batch of session calls sent back to back on one connection
+    Use as a context manager or call execute(); results line up with the calls
+    """
+    
+    def __init__(self, client: RemoteSessionService):
+        self.client = client
+        self.calls: List[Tuple[str, tuple, dict]] = []
+        self.results: List[Any] = []
+    
+    def __getattr__(self, name: str):
+        if name not in SESSION_METHODS:
+            raise AttributeError(name)
+        
+        def queue_call(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+            return self
+        return queue_call
+    
+    def execute(self, raise_on_error: bool = True) -> List[Any]:
+        """Send the queued calls; failed calls yield SessionStoreError instances"""
+        calls, self.calls = self.calls, []
+        self.results = [
+            result if ok else as_error(result)
+            for ok, result in self.client.execute(calls)
+        ]
+        for (method, _, _), result in zip(calls, self.results):
+            if method == "get_context" and isinstance(result, AgentContext):
+                self.client._with_memory(result)
+        if raise_on_error:
+            for result in self.results:
+                if isinstance(result, SessionStoreError):
+                    raise result
+        return self.results
+    
+    def __enter__(self) -> "SessionPipeline":
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.execute()
+
+
+def main():
+    """Run a standalone session store server"""
+    parser = argparse.ArgumentParser(description="Nilam session store server")
+    parser.add_argument("--address", default=os.getenv("SESSION_STORE", DEFAULT_ADDRESS),
+                        help="tcp://host:port or unix:///path/to/socket")
+    parser.add_argument("--session-timeout", type=int, default=3600)
+    parser.add_argument("--token-budget", type=int, default=None)
+    parser.add_argument("--hibernate-dir", default=None)
+    parser.add_argument("--hibernate-after", type=float, default=None)
+    parser.add_argument("--max-resident", type=int, default=None)
+    parser.add_argument("--memory-db", default=None,
+                        help="SQLite memory bank for clients that do not pass their own memory_bank")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    
+    memory_bank = MemoryBank(backend=SQLiteBackend(args.memory_db)) if args.memory_db else None
+    
+    service = InMemorySessionService(
+        memory_bank=memory_bank,
+        session_timeout=args.session_timeout,
+        token_budget=args.token_budget,
+        hibernate_dir=args.hibernate_dir,
+        hibernate_after=args.hibernate_after,
+        max_resident=args.max_resident
+    )
+    # The key comes from the environment so it never shows up in process listings
+    auth_key = os.getenv("SESSION_STORE_KEY")
+    try:
+        server = SessionStoreServer(args.address, service, auth_key.encode("utf-8") if auth_key else None)
+    except ValueError as e:
+        service.close()
+        parser.error(str(e))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
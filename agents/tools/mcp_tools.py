@@ -3,9 +3,9 @@ MCP (Model Context Protocol) Tools
 Implements MCP-compatible tools for agent integration
 """
 from typing import Dict, Any, Optional, List
-import json
 import logging
 from .builtin_tools import BaseTool
+from ..serialization import json_codec
 
 
 class MCPTool(BaseTool):
@@ -37,7 +37,7 @@ class MCPTool(BaseTool):
             "content": [
                 {
                     "type": "text",
-                    "text": json.dumps(self.execute(**arguments))
+                    "text": json_codec.dumps_text(self.execute(**arguments))
                 }
             ],
             "isError": False
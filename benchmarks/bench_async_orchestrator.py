@@ -0,0 +1,74 @@
+"""
+Async orchestrator load test
+Many concurrent aroute_message calls with agents that simulate a slow LLM call,
+comparing an async aprocess override with the default executor adapter
+"""
+import argparse
+import asyncio
+import logging
+import threading
+import time
+from agents.base_agent import AgentContext, AgentMessage, BaseAgent
+from agents.orchestrator import MultiAgentOrchestrator
+
+
+class BlockingAgent(BaseAgent):
+    """Agent whose model call blocks a thread (uses the default aprocess adapter)"""
+    
+    def __init__(self, agent_id: str, delay: float):
+        super().__init__(agent_id=agent_id, agent_name=agent_id)
+        self.delay = delay
+    
+    def process(self, message: AgentMessage, context: AgentContext) -> AgentMessage:
+        time.sleep(self.delay)
+        return AgentMessage(sender=self.agent_id, receiver=message.sender, content="ok")
+
+
+class AsyncAgent(BlockingAgent):
+    """Agent whose model call is awaited, so it holds no thread"""
+    
+    async def aprocess(self, message: AgentMessage, context: AgentContext) -> AgentMessage:
+        await asyncio.sleep(self.delay)
+        return AgentMessage(sender=self.agent_id, receiver=message.sender, content="ok")
+
+
+async def load(orchestrator: MultiAgentOrchestrator, requests: int):
+    """Send every request at once; returns (seconds, completed agent calls, peak threads)"""
+    peak_threads = threading.active_count()
+    
+    async def one(i: int):
+        nonlocal peak_threads
+        message = AgentMessage(sender="user", receiver="orchestrator", content="crop to plant")
+        outputs = await orchestrator.aroute_message(
+            message, AgentContext(session_id=f"s{i}"), pattern="parallel", agent_ids=["crop_agent", "chat_agent"]
+        )
+        peak_threads = max(peak_threads, threading.active_count())
+        return sum(output.content == "ok" for output in outputs.values())
+    
+    started = time.perf_counter()
+    completed = await asyncio.gather(*[one(i) for i in range(requests)])
+    return time.perf_counter() - started, sum(completed), peak_threads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--delay", type=float, default=0.2, help="simulated LLM latency (s)")
+    parser.add_argument("--timeout", type=float, default=5.0, help="per-agent timeout (s)")
+    args = parser.parse_args()
+    # Timed-out blocking calls are expected; keep their warnings out of the report
+    logging.getLogger("orchestrator").setLevel(logging.ERROR)
+    
+    print(f"{args.requests} concurrent requests x 2 agents x {args.delay * 1000:.0f}ms, timeout {args.timeout}s")
+    for agent_class in (AsyncAgent, BlockingAgent):
+        orchestrator = MultiAgentOrchestrator(None, agent_timeout=args.timeout)
+        orchestrator.register_agents([agent_class("crop_agent", args.delay), agent_class("chat_agent", args.delay)])
+        elapsed, completed, threads = asyncio.run(load(orchestrator, args.requests))
+        print(
+            f"{agent_class.__name__:14s} {completed}/{2 * args.requests} calls completed in {elapsed:.2f}s "
+            f"({args.requests / elapsed:.0f} req/s), peak threads {threads}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+MemoryBank thread scaling benchmark
+Mixed store/get/save/get_stats throughput at several thread counts on each engine
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from agents.memory_backends import InMemoryBackend, ShardedFileBackend, SQLiteBackend
+from agents.memory_bank import MemoryBank
+
+
+def make_bank(engine: str, directory: str) -> MemoryBank:
+    if engine == "memory":
+        backend = InMemoryBackend()
+    elif engine == "json":
+        # Without a journal every write re-saves the JSON file
+        backend = InMemoryBackend(os.path.join(directory, "memory.json"))
+    elif engine == "journal":
+        backend = InMemoryBackend(os.path.join(directory, "memory.json"), journal=True)
+    elif engine == "sharded":
+        backend = ShardedFileBackend(os.path.join(directory, "shards"))
+    else:
+        backend = SQLiteBackend(os.path.join(directory, "memory.db"))
+    return MemoryBank(backend=backend, refresh_interval=None)
+
+
+def run(engine: str, threads: int, ops: int) -> float:
+    """ops operations split over threads, each on its own session; returns ops/s"""
+    with tempfile.TemporaryDirectory() as directory:
+        bank = make_bank(engine, directory)
+        per_thread = ops // threads
+        
+        def worker(worker: int):
+            session_id = f"user{worker}"
+            for i in range(per_thread):
+                bank.store(session_id, f"k{i % 100}", {"i": i})
+                bank.get(session_id, f"k{(i * 7) % 100}")
+                if i % 500 == 499:
+                    bank.save()
+                if i % 100 == 99:
+                    bank.get_stats()
+        
+        workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        bank.close()
+    return per_thread * threads * 2 / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--ops", type=int, default=20000, help="store+get pairs per run")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--engines", nargs="+", default=["memory", "json", "journal", "sharded", "sqlite"])
+    args = parser.parse_args()
+    
+    print(f"{'engine':8s} " + " ".join(f"{threads:>9d}T" for threads in args.threads) + "   (ops/s)")
+    for engine in args.engines:
+        rates = [run(engine, threads, args.ops) for threads in args.threads]
+        print(f"{engine:8s} " + " ".join(f"{rate:10.0f}" for rate in rates))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+MemoryBank persistence benchmark
+Store/get latency against total memory size, journal mode versus full-file rewrites
+"""
+import argparse
+import os
+import tempfile
+import time
+from agents.memory_bank import MemoryBank
+
+
+def measure(journal: bool, size: int, samples: int):
+    """Fill a bank with size entries, then time samples stores and gets (ms per op)"""
+    with tempfile.TemporaryDirectory() as directory:
+        bank = MemoryBank(os.path.join(directory, "memory.json"), journal=journal, compact_threshold=10 ** 9)
+        sessions = max(size // 100, 1)
+        for start in range(0, size, 100):
+            bank.store_many(f"user{start // 100}", {f"k{i}": {"note": "soil ph 6.5", "i": i} for i in range(100)})
+        
+        started = time.perf_counter()
+        for i in range(samples):
+            bank.store(f"user{i % sessions}", f"new{i}", {"note": "drip irrigation", "i": i})
+        store_ms = (time.perf_counter() - started) * 1000 / samples
+        
+        started = time.perf_counter()
+        for i in range(samples):
+            bank.get(f"user{i % sessions}", f"k{i % 100}")
+        get_ms = (time.perf_counter() - started) * 1000 / samples
+        bank.close()
+    return store_ms, get_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--samples", type=int, default=200)
+    args = parser.parse_args()
+    
+    print(f"{'entries':>8s} {'mode':>9s} {'store ms':>9s} {'get ms':>8s}")
+    for size in args.sizes:
+        for journal in (False, True):
+            store_ms, get_ms = measure(journal, size, args.samples)
+            print(f"{size:8d} {'journal' if journal else 'rewrite':>9s} {store_ms:9.3f} {get_ms:8.4f}")
+
+
+if __name__ == "__main__":
+    main()
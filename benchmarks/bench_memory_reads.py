@@ -0,0 +1,78 @@
+"""
+MemoryBank read-heavy benchmark
+95% get / 5% store workload with batched access statistics, against writing
+the access statistics through to storage on every read (the old read path)
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from agents.memory_backends import InMemoryBackend, ShardedFileBackend, SQLiteBackend
+from agents.memory_bank import MemoryBank
+
+SESSIONS = 50
+KEYS = 50
+
+
+def make_bank(engine: str, directory: str) -> MemoryBank:
+    if engine == "json":
+        backend = InMemoryBackend(os.path.join(directory, "memory.json"))
+    elif engine == "journal":
+        backend = InMemoryBackend(os.path.join(directory, "memory.json"), journal=True)
+    elif engine == "sharded":
+        backend = ShardedFileBackend(os.path.join(directory, "shards"))
+    else:
+        backend = SQLiteBackend(os.path.join(directory, "memory.db"))
+    return MemoryBank(backend=backend, refresh_interval=None)
+
+
+def run(engine: str, write_through: bool, threads: int, ops: int) -> float:
+    """Returns ops/s for the mixed workload"""
+    with tempfile.TemporaryDirectory() as directory:
+        bank = make_bank(engine, directory)
+        for session in range(SESSIONS):
+            bank.store_many(f"user{session}", {f"k{i}": {"note": "loamy soil", "i": i} for i in range(KEYS)})
+        per_thread = ops // threads
+        
+        def worker(worker: int):
+            rng = random.Random(worker)
+            for _ in range(per_thread):
+                session_id = f"user{rng.randrange(SESSIONS)}"
+                key = f"k{rng.randrange(KEYS)}"
+                if rng.random() < 0.05:
+                    bank.store(session_id, key, {"note": "updated", "i": 0})
+                else:
+                    bank.get(session_id, key)
+                    if write_through:
+                        bank.access_stats.flush()
+        
+        workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        bank.close()
+    return per_thread * threads / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--ops", type=int, default=4000)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--engines", nargs="+", default=["json", "journal", "sharded", "sqlite"])
+    args = parser.parse_args()
+    
+    print(f"{'engine':8s} {'threads':>7s} {'batched':>10s} {'per-read':>10s}   (ops/s)")
+    for engine in args.engines:
+        for threads in args.threads:
+            batched = run(engine, False, threads, args.ops)
+            per_read = run(engine, True, threads, args.ops)
+            print(f"{engine:8s} {threads:7d} {batched:10.0f} {per_read:10.0f}")
+
+
+if __name__ == "__main__":
+    main()
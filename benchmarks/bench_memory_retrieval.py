@@ -0,0 +1,78 @@
+"""
+Memory retrieval microbenchmark
+BM25 retrieval latency over one session of 10k memories: the first query
+(vectors built), warm queries, the raw ranking step and the one-off path
+"""
+import argparse
+import random
+import statistics
+import time
+from agents.memory_backends import InMemoryBackend
+from agents.memory_bank import MemoryBank
+from agents.memory_retrieval import rank_memories
+
+WORDS = [
+    "soil", "ph", "cotton", "rice", "nitrogen", "drip", "irrigation", "wheat", "kharif", "rabi",
+    "urea", "potassium", "loamy", "monsoon", "groundnut", "pest", "aphid", "yield", "market", "price"
+]
+QUERIES = [
+    "what fertilizer for nitrogen deficient soil",
+    "cotton market price this week",
+    "drip irrigation schedule for groundnut",
+    "aphid pest on rice"
+]
+
+
+def timed(fn, repeat: int) -> list:
+    """Per-call latencies in ms"""
+    samples = []
+    for i in range(repeat):
+        started = time.perf_counter()
+        fn(i)
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def report(label: str, samples: list):
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    print(f"  {label:34s} p50 {statistics.median(samples):8.3f} ms   p99 {p99:8.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--memories", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    
+    rng = random.Random(1)
+    memory = {
+        f"note_{i}": " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 12)))
+        for i in range(args.memories)
+    }
+    bank = MemoryBank(backend=InMemoryBackend(), refresh_interval=None)
+    for start in range(0, args.memories, 1000):
+        bank.store_many("farmer", dict(list(memory.items())[start:start + 1000]))
+    bank.retriever.forget("farmer")
+    
+    print(f"{args.memories} memories in one session")
+    report("first retrieve (builds vectors)", timed(lambda i: bank.retrieve("farmer", QUERIES[0]), 1))
+    report("bank.retrieve top 5", timed(lambda i: bank.retrieve("farmer", QUERIES[i % 4]), args.repeat))
+    report("bank.retrieve top 5, 500 tokens", timed(
+        lambda i: bank.retrieve("farmer", QUERIES[i % 4], token_budget=500), args.repeat
+    ))
+    report("retriever.query (ranking only)", timed(
+        lambda i: bank.retriever.query("farmer", QUERIES[i % 4]), args.repeat
+    ))
+    report("rank_memories (no bank, one-off)", timed(
+        lambda i: rank_memories(memory, QUERIES[i % 4]), max(args.repeat // 20, 3)
+    ))
+    
+    started = time.perf_counter()
+    bank.store("farmer", "note_new", "urea top dressing for rice")
+    print(f"  store with incremental vector update   {(time.perf_counter() - started) * 1000:8.3f} ms")
+    bank.close()
+
+
+if __name__ == "__main__":
+    main()
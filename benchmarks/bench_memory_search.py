@@ -0,0 +1,67 @@
+"""
+MemoryBank search benchmark
+Inverted-index search against the old linear scan at 10k and 100k entries per session
+"""
+import argparse
+import random
+import time
+from typing import Dict, Any, List
+from agents.memory_backends import InMemoryBackend
+from agents.memory_bank import MemoryBank
+
+WORDS = [
+    "soil", "ph", "cotton", "rice", "nitrogen", "drip", "irrigation", "wheat", "kharif",
+    "rabi", "urea", "dap", "loamy", "monsoon", "groundnut", "Visakhapatnam", "Guntur"
+]
+QUERIES = ["visakhapatnam", "cotton rice", "key_urea_123", "drip", "zzz"]
+
+
+def linear_search(bank: MemoryBank, session_id: str, query: str) -> List[Dict[str, Any]]:
+    """The scan search used before the index: substring match on key or value"""
+    query = query.lower()
+    return [
+        {
+            "key": key,
+            "value": entry["value"],
+            "metadata": entry.get("metadata", {}),
+            "timestamp": entry.get("timestamp")
+        }
+        for key, entry in bank.memory[session_id].items()
+        if query in key.lower() or query in str(entry["value"]).lower()
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    
+    rng = random.Random(1)
+    for size in args.sizes:
+        bank = MemoryBank(backend=InMemoryBackend(), refresh_interval=None)
+        for start in range(0, size, 1000):
+            bank.store_many("user", {
+                f"key_{rng.choice(WORDS).lower()}_{i}": " ".join(rng.choice(WORDS) for _ in range(6))
+                for i in range(start, min(start + 1000, size))
+            })
+        
+        print(f"{size} entries in one session (ms per search)")
+        for query in QUERIES:
+            indexed = sorted(result["key"] for result in bank.search("user", query))
+            assert indexed == sorted(result["key"] for result in linear_search(bank, "user", query)), query
+            
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                bank.search("user", query)
+            index_ms = (time.perf_counter() - started) * 1000 / args.repeat
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                linear_search(bank, "user", query)
+            scan_ms = (time.perf_counter() - started) * 1000 / args.repeat
+            print(f"  {query!r:18s} {len(indexed):6d} hits  index {index_ms:8.3f}  scan {scan_ms:8.3f}")
+        bank.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Parallel orchestrator benchmark
+Wall time of execute_sequential against execute_parallel with synthetic slow
+agents, per-agent wall_time_ms, and a plan where one agent exceeds the timeout
+"""
+import argparse
+import logging
+import time
+from agents.base_agent import AgentContext, AgentMessage, BaseAgent
+from agents.orchestrator import MultiAgentOrchestrator
+
+
+class SlowAgent(BaseAgent):
+    """Agent that simulates a blocking LLM or API call"""
+    
+    def __init__(self, agent_id: str, delay: float):
+        super().__init__(agent_id=agent_id, agent_name=agent_id)
+        self.delay = delay
+    
+    def process(self, message: AgentMessage, context: AgentContext) -> AgentMessage:
+        time.sleep(self.delay)
+        return AgentMessage(sender=self.agent_id, receiver=message.sender, content="ok")
+
+
+def report(label: str, elapsed: float, outputs: dict):
+    print(f"{label:34s} {elapsed * 1000:8.1f} ms")
+    for agent_id, output in outputs.items():
+        flag = "  timed out" if output.metadata.get("timed_out") else ""
+        print(f"  {agent_id:32s} {output.metadata['wall_time_ms']:8.1f} ms{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--agents", type=int, default=4)
+    parser.add_argument("--delay", type=float, default=0.2, help="simulated call latency (s)")
+    parser.add_argument("--timeout", type=float, default=0.5, help="per-agent timeout (s)")
+    args = parser.parse_args()
+    # The timeout case logs a warning per timed-out agent
+    logging.getLogger("orchestrator").setLevel(logging.ERROR)
+    
+    agent_ids = [f"agent{i}" for i in range(args.agents)]
+    # One spare worker for the stuck agent, so it never queues behind the others
+    orchestrator = MultiAgentOrchestrator(None, max_workers=args.agents + 1, agent_timeout=args.timeout)
+    orchestrator.register_agents([SlowAgent(agent_id, args.delay) for agent_id in agent_ids])
+    message = AgentMessage(sender="user", receiver="orchestrator", content="crop to plant")
+    context = AgentContext(session_id="bench")
+    print(f"{args.agents} agents x {args.delay * 1000:.0f} ms, timeout {args.timeout * 1000:.0f} ms")
+    
+    # Warm the worker pool so thread start-up is not billed to the first run
+    orchestrator.execute_parallel(agent_ids, message, context)
+    
+    started = time.perf_counter()
+    orchestrator.execute_sequential(agent_ids, message, context)
+    sequential = time.perf_counter() - started
+    print(f"{'execute_sequential':34s} {sequential * 1000:8.1f} ms")
+    
+    started = time.perf_counter()
+    outputs = orchestrator.execute_parallel(agent_ids, message, context)
+    parallel = time.perf_counter() - started
+    report("execute_parallel", parallel, outputs)
+    print(f"speedup {sequential / parallel:.1f}x")
+    
+    # One agent hangs past the timeout; the plan returns once the timeout expires
+    orchestrator.register_agent(SlowAgent("stuck_agent", args.timeout * 4))
+    started = time.perf_counter()
+    outputs = orchestrator.execute_parallel(agent_ids + ["stuck_agent"], message, context)
+    report("execute_parallel, one agent stuck", time.perf_counter() - started, outputs)
+    print(f"pool after timeout: {orchestrator.get_pool_stats()}")
+    orchestrator.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Serializer benchmark
+Encode/decode throughput and output size of each installed codec on agent
+payloads: an exported session, a memory shard and a bulk conversation export
+"""
+import argparse
+import json
+import time
+from datetime import datetime
+from agents.serialization import available_serializers, get_serializer
+from agents.session_manager import InMemorySessionService
+
+
+def payloads() -> dict:
+    service = InMemorySessionService()
+    session_id = service.create_session("farmer_42", {"location": "Guntur", "crop": "Cotton", "acres": 4.5})
+    for turn in range(20):
+        service.add_message(session_id, "user", f"My cotton leaves are curling after {turn} days of rain, what should I spray?")
+        service.add_message(
+            session_id, "assistant",
+            "Leaf curl after heavy rain usually points to jassids or a potassium deficiency. " * 3,
+            {"agent": "chat_agent", "tokens": 180 + turn}
+        )
+    session = service.export_session(session_id)
+    
+    now = datetime.now().isoformat()
+    shard = {
+        f"user{s}": {
+            f"memory_{k}": {
+                "value": {"crop": "Rice", "soil_ph": 6.5 + k / 100, "notes": "Loamy soil, drip irrigation"},
+                "metadata": {"source": "crop_agent", "confidence": 0.87},
+                "timestamp": now,
+                "access_count": k,
+                "version": 1
+            }
+            for k in range(20)
+        }
+        for s in range(50)
+    }
+    return {"session export": session, "memory shard": shard, "bulk export": [session] * 50}
+
+
+def measure(dumps, loads, payload, repeat: int):
+    """(encode ms, decode ms, size in bytes)"""
+    data = dumps(payload)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        dumps(payload)
+    encode_s = (time.perf_counter() - started) / repeat
+    started = time.perf_counter()
+    for _ in range(repeat):
+        loads(data)
+    decode_s = (time.perf_counter() - started) / repeat
+    return encode_s * 1000, decode_s * 1000, len(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    
+    codecs = [(
+        "json indent=2 (before)",
+        lambda obj: json.dumps(obj, indent=2, default=str).encode("utf-8"),
+        json.loads
+    )]
+    for name in available_serializers():
+        codec = get_serializer(name)
+        codecs.append((name, codec.dumps, codec.loads))
+    
+    print(f"installed codecs: {', '.join(available_serializers())}")
+    for label, payload in payloads().items():
+        print(f"{label}")
+        for name, dumps, loads in codecs:
+            encode, decode, size = measure(dumps, loads, payload, args.repeat)
+            print(f"  {name:24s} encode {encode:8.3f} ms   decode {decode:8.3f} ms   {size / 1024:8.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Session expiry benchmark
+100k sessions: stats and cleanup latency when nothing is due, reaping a mass
+expiry through the deadline heap, and the background reaper keeping up
+"""
+import argparse
+import logging
+import time
+from agents.session_manager import InMemorySessionService
+
+
+def ms(started: float) -> str:
+    return f"{(time.perf_counter() - started) * 1000:9.2f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=100000)
+    parser.add_argument("--timeout", type=float, default=5.0, help="session timeout (s)")
+    args = parser.parse_args()
+    logging.getLogger("session_manager").setLevel(logging.ERROR)
+    
+    service = InMemorySessionService(session_timeout=args.timeout, reap_interval=None)
+    started = time.perf_counter()
+    session_ids = [service.create_session(f"user{i}") for i in range(args.sessions)]
+    print(f"create {args.sessions} sessions          {ms(started)}")
+    
+    started = time.perf_counter()
+    service.get_session_stats()
+    print(f"get_session_stats                   {ms(started)}")
+    started = time.perf_counter()
+    reaped = service.cleanup_expired_sessions()
+    print(f"cleanup, nothing due ({reaped} reaped)    {ms(started)}")
+    
+    # Keep 5% of the sessions active so the rest expire together
+    time.sleep(args.timeout / 2)
+    for session_id in session_ids[::20]:
+        service.get_session(session_id)
+    time.sleep(args.timeout / 2 + 0.1)
+    started = time.perf_counter()
+    reaped = service.cleanup_expired_sessions()
+    print(f"cleanup, {reaped} expired             {ms(started)}")
+    print(f"remaining sessions: {service.get_session_stats()['total_sessions']}")
+    service.close()
+    
+    # The background reaper should clear a full expiry within a couple of intervals
+    service = InMemorySessionService(session_timeout=args.timeout, reap_interval=0.5)
+    for i in range(args.sessions):
+        service.create_session(f"user{i}")
+    started = time.perf_counter()
+    while service.get_session_stats()["total_sessions"] and time.perf_counter() - started < args.timeout + 10:
+        time.sleep(0.05)
+    print(f"background reaper emptied {args.sessions} sessions after {time.perf_counter() - started:.2f} s")
+    service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Session hibernation benchmark
+Resident memory of a 50k-session population with every session in RAM versus
+a max_resident cap, and the latency of rehydrating a hibernated session
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import resource
+import statistics
+import tempfile
+import time
+from agents.session_manager import InMemorySessionService
+
+
+def rss_mb() -> float:
+    """Current resident set size (peak where /proc is unavailable)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def populate(service: InMemorySessionService, sessions: int, turns: int) -> list:
+    session_ids = []
+    for i in range(sessions):
+        session_id = service.create_session(f"farmer{i}", {"location": "Guntur", "crop": "Cotton"})
+        for turn in range(turns):
+            service.add_message(session_id, "user", f"Question {turn} about pest control on my cotton crop")
+            service.add_message(session_id, "assistant", "Use neem oil spray and yellow sticky traps. " * 4)
+        session_ids.append(session_id)
+    return session_ids
+
+
+def child(max_resident, sessions: int, turns: int, samples: int, results):
+    with tempfile.TemporaryDirectory() as directory:
+        baseline = rss_mb()
+        service = InMemorySessionService(
+            reap_interval=None,
+            hibernate_dir=os.path.join(directory, "sessions") if max_resident else None,
+            max_resident=max_resident
+        )
+        started = time.perf_counter()
+        session_ids = populate(service, sessions, turns)
+        populate_s = time.perf_counter() - started
+        rss = rss_mb() - baseline
+        
+        # Random sessions are almost always hibernated when a cap is set
+        rng = random.Random(1)
+        latencies = []
+        for session_id in rng.sample(session_ids, samples):
+            started = time.perf_counter()
+            service.get_session(session_id)
+            latencies.append((time.perf_counter() - started) * 1000)
+        latencies.sort()
+        stats = service.get_session_stats()
+        service.close()
+    results.put((populate_s, rss, statistics.median(latencies), latencies[int(len(latencies) * 0.99)], stats))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=50000)
+    parser.add_argument("--turns", type=int, default=5, help="user/assistant exchanges per session")
+    parser.add_argument("--max-resident", type=int, default=1000)
+    parser.add_argument("--samples", type=int, default=2000)
+    args = parser.parse_args()
+    
+    print(f"{args.sessions} sessions x {2 * args.turns} messages")
+    for max_resident in (None, args.max_resident):
+        # Each configuration runs in a fresh process so RSS figures do not mix
+        results = multiprocessing.Queue()
+        process = multiprocessing.Process(
+            target=child, args=(max_resident, args.sessions, args.turns, args.samples, results)
+        )
+        process.start()
+        populate_s, rss, p50, p99, stats = results.get()
+        process.join()
+        label = f"max_resident={max_resident}" if max_resident else "all resident"
+        resident = stats.get("hibernation", {}).get("resident_sessions", stats["total_sessions"])
+        print(
+            f"  {label:20s} populate {populate_s:6.1f} s   RSS +{rss:7.1f} MB   resident {resident:6d}   "
+            f"get_session p50 {p50:6.3f} ms  p99 {p99:6.3f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
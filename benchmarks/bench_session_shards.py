@@ -0,0 +1,64 @@
+"""
+Session shard scaling benchmark
+Throughput of a mixed create/get/add_message workload from several threads
+against the session service with different shard counts
+"""
+import argparse
+import logging
+import random
+import threading
+import time
+from agents.session_manager import InMemorySessionService
+
+
+def worker(service: InMemorySessionService, session_ids: list, ops: int, seed: int, barrier: threading.Barrier):
+    rng = random.Random(seed)
+    barrier.wait()
+    for i in range(ops):
+        roll = rng.random()
+        if roll < 0.1:
+            session_ids.append(service.create_session(f"farmer{seed}_{i}"))
+        elif roll < 0.6:
+            service.get_session(rng.choice(session_ids))
+        else:
+            service.add_message(rng.choice(session_ids), "user", "When should I sow groundnut?")
+
+
+def run(num_shards: int, threads: int, ops: int, seed_sessions: int) -> float:
+    """Operations per second across all threads"""
+    service = InMemorySessionService(reap_interval=None, num_shards=num_shards)
+    session_ids = [service.create_session(f"farmer{i}") for i in range(seed_sessions)]
+    barrier = threading.Barrier(threads + 1)
+    pool = [
+        threading.Thread(target=worker, args=(service, session_ids, ops, seed, barrier))
+        for seed in range(threads)
+    ]
+    for thread in pool:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    service.close()
+    return threads * ops / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--ops", type=int, default=5000, help="operations per thread")
+    parser.add_argument("--sessions", type=int, default=1000, help="sessions created before the run")
+    args = parser.parse_args()
+    logging.getLogger("session_manager").setLevel(logging.ERROR)
+    
+    print("ops/s (10% create, 50% get_session, 40% add_message)")
+    print("shards " + "".join(f"{t:>10d}t" for t in args.threads))
+    for num_shards in args.shards:
+        row = "".join(f"{run(num_shards, t, args.ops, args.sessions):11.0f}" for t in args.threads)
+        print(f"{num_shards:6d} {row}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Session turn microbenchmark
+Per-turn cost of the session service hot path (get_context, two add_message,
+update_state, get_state) with the float clocks sessions carry now, against the
+same service stamping ISO-8601 strings the way it used to
+"""
+import argparse
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+from agents.session_manager import InMemorySessionService, SessionShard
+
+
+class IsoClockSessionService(InMemorySessionService):
+    """The service plus the ISO string stamping each access and message used to do"""
+    
+    def _resident_session(self, shard: SessionShard, session_id: str) -> Optional[Dict[str, Any]]:
+        session = super()._resident_session(shard, session_id)
+        if session is not None:
+            session["last_accessed_iso"] = datetime.now().isoformat()
+        return session
+    
+    def add_message(self, session_id: str, role: str, content: str, metadata: Optional[Dict[str, Any]] = None):
+        metadata = dict(metadata or {}, timestamp=datetime.now().isoformat())
+        super().add_message(session_id, role, content, metadata)
+
+
+def per_turn_us(service: InMemorySessionService, turns: int) -> float:
+    session_id = service.create_session("farmer")
+    started = time.perf_counter()
+    for i in range(turns):
+        service.get_context(session_id)
+        service.add_message(session_id, "user", "Which fertilizer for cotton?")
+        service.add_message(session_id, "assistant", "Apply 60 kg/ha nitrogen in split doses.")
+        service.update_state(session_id, "turn", i)
+        service.get_state(session_id, "turn")
+    elapsed = time.perf_counter() - started
+    service.close()
+    return elapsed / turns * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=50000)
+    args = parser.parse_args()
+    logging.getLogger("session_manager").setLevel(logging.ERROR)
+    
+    iso = per_turn_us(IsoClockSessionService(reap_interval=None), args.turns)
+    floats = per_turn_us(InMemorySessionService(reap_interval=None), args.turns)
+    print(f"session turn, ISO string clocks (before)   {iso:7.2f} us")
+    print(f"session turn, float clocks                 {floats:7.2f} us")
+
+
+if __name__ == "__main__":
+    main()
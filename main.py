@@ -829,8 +829,8 @@ def run_agent_system():
         # Pattern selection
         pattern_option = st.sidebar.selectbox(
             "🔄 Agent Pattern:",
-            ["Sequential", "Parallel", "Loop"],
-            help="Sequential: Agents run one after another\nParallel: Agents run simultaneously\nLoop: Agents run until condition met",
+            ["Sequential", "Parallel", "Loop", "DAG"],
+            help="Sequential: Agents run one after another\nParallel: Agents run simultaneously\nLoop: Agents run until condition met\nDAG: Independent agents run simultaneously, then the chat agent combines their results",
             index=0
         )
         
@@ -838,7 +838,8 @@ def run_agent_system():
         pattern_map = {
             "Sequential": AgentPattern.SEQUENTIAL,
             "Parallel": AgentPattern.PARALLEL,
-            "Loop": AgentPattern.LOOP
+            "Loop": AgentPattern.LOOP,
+            "DAG": AgentPattern.DAG
         }
         selected_pattern = pattern_map[pattern_option]
         
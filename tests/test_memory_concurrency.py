@@ -0,0 +1,112 @@
+"""
+MemoryBank thread-safety stress tests
+Many threads mixing writes, reads, saves and stats on every engine, with
+striped session locks and copy-on-write snapshots
+"""
+import os
+import threading
+import pytest
+from agents.memory_backends import InMemoryBackend, ShardedFileBackend, SQLiteBackend
+from agents.memory_bank import MemoryBank, SessionLocks
+from agents.memory_eviction import MemoryLimits
+
+THREADS = 16
+KEYS = 60
+HOT_SESSIONS = 4
+
+
+def _backend(engine: str, directory: str):
+    if engine == "json":
+        return InMemoryBackend(os.path.join(directory, "memory.json"))
+    if engine == "journal":
+        return InMemoryBackend(os.path.join(directory, "memory.json"), journal=True, compact_threshold=200)
+    if engine == "sharded":
+        return ShardedFileBackend(os.path.join(directory, "shards"), shard_count=8, flush_interval=0.05)
+    return SQLiteBackend(os.path.join(directory, "memory.db"))
+
+
+def _run_threads(target, count: int = THREADS):
+    errors = []
+    
+    def guarded(worker: int):
+        try:
+            target(worker)
+        except Exception as e:
+            errors.append(e)
+    
+    threads = [threading.Thread(target=guarded, args=(worker,)) for worker in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=120)
+        assert not thread.is_alive(), "worker thread hung"
+    assert not errors, errors[:3]
+
+
+@pytest.mark.parametrize("engine", ["json", "journal", "sharded", "sqlite"])
+def test_mixed_workload_loses_nothing(tmp_path, engine):
+    bank = MemoryBank(backend=_backend(engine, str(tmp_path)), refresh_interval=None)
+    
+    def worker(worker: int):
+        own = f"user{worker}"
+        hot = f"hot{worker % HOT_SESSIONS}"
+        for i in range(KEYS):
+            bank.store(own, f"k{i}", {"worker": worker, "i": i})
+            assert bank.get(own, f"k{i}")["i"] == i
+            bank.store_many(hot, {f"w{worker}_{i}": i})
+            bank.update("counters", "total", lambda value: value + 1, default=0, retries=10000)
+            if i % 20 == 0:
+                bank.save()
+            if i % 10 == 0:
+                stats = bank.get_stats()
+                assert stats["total_entries"] >= 0
+                assert len(bank.get_all(own)) == i + 1
+    
+    _run_threads(worker)
+    
+    assert bank.get("counters", "total") == THREADS * KEYS
+    for worker in range(THREADS):
+        assert len(bank.get_all(f"user{worker}")) == KEYS
+    for hot in range(HOT_SESSIONS):
+        assert len(bank.get_all(f"hot{hot}")) == KEYS * THREADS // HOT_SESSIONS
+    expected_entries = 2 * THREADS * KEYS + 1
+    assert bank.get_stats()["total_entries"] == expected_entries
+    bank.close()
+    
+    # Everything written must survive a reopen
+    reopened = MemoryBank(backend=_backend(engine, str(tmp_path)), refresh_interval=None)
+    assert reopened.get_stats()["total_entries"] == expected_entries
+    assert reopened.get("counters", "total") == THREADS * KEYS
+    reopened.close()
+
+
+def test_limits_hold_under_concurrent_writers(tmp_path):
+    limits = MemoryLimits(max_entries_per_session=25, max_total_entries=200)
+    bank = MemoryBank(backend=InMemoryBackend(), limits=limits, refresh_interval=None)
+    
+    def worker(worker: int):
+        for i in range(KEYS):
+            bank.store(f"s{worker % 8}", f"w{worker}_{i}", i)
+            bank.get(f"s{(worker + 1) % 8}", f"w{worker}_{i}")
+    
+    _run_threads(worker)
+    
+    sizes = [len(bank.get_all(f"s{session}")) for session in range(8)]
+    assert all(size <= 25 for size in sizes)
+    assert bank.get_stats()["total_entries"] == sum(sizes) <= 200
+    bank.close()
+
+
+def test_multi_session_locks_cannot_deadlock():
+    locks = SessionLocks(stripes=4)
+    sessions = [f"s{i}" for i in range(8)]
+    held = []
+    
+    def worker(worker: int):
+        order = sessions if worker % 2 else list(reversed(sessions))
+        for i in range(500):
+            with locks.hold([order[i % 8], order[(i + 3) % 8], order[(i + 5) % 8]]):
+                held.append(worker)
+    
+    _run_threads(worker, count=8)
+    assert len(held) == 8 * 500
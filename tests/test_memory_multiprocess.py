@@ -0,0 +1,74 @@
+"""
+Multi-process MemoryBank harness
+Spawns several processes hammering one SQLite store and checks that no update is lost
+"""
+import multiprocessing
+import os
+from agents.memory_backends import SQLiteBackend
+from agents.memory_bank import MemoryBank
+from agents.memory_eviction import MemoryLimits
+
+PROCESSES = 4
+INCREMENTS = 100
+
+
+def _hammer(db_path: str, worker: int, increments: int):
+    """Increment a shared counter and write private keys from one process"""
+    bank = MemoryBank(backend=SQLiteBackend(db_path), refresh_interval=None)
+    try:
+        for i in range(increments):
+            bank.update("shared", "counter", lambda value: value + 1, default=0, retries=10000)
+            bank.store("shared", f"worker{worker}_{i}", i)
+    finally:
+        bank.close()
+
+
+def _run_workers(db_path: str):
+    processes = [
+        multiprocessing.Process(target=_hammer, args=(db_path, worker, INCREMENTS))
+        for worker in range(PROCESSES)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=120)
+        assert process.exitcode == 0
+
+
+def test_concurrent_writers_lose_no_updates(tmp_path):
+    db_path = os.path.join(str(tmp_path), "memory.db")
+    follower = MemoryBank(backend=SQLiteBackend(db_path), refresh_interval=None)
+    try:
+        _run_workers(db_path)
+        
+        value, version = follower.get_versioned("shared", "counter")
+        assert value == PROCESSES * INCREMENTS
+        assert version == PROCESSES * INCREMENTS
+        stored = follower.get_all("shared")
+        for worker in range(PROCESSES):
+            for i in range(INCREMENTS):
+                assert stored[f"worker{worker}_{i}"] == i
+        
+        # The change feed hands the follower every key the workers touched
+        assert follower.refresh() == 1 + PROCESSES * INCREMENTS
+        assert follower.retrieve("shared", "counter", top_k=1)[0][0] == "counter"
+    finally:
+        follower.close()
+
+
+def test_read_of_entry_written_by_another_process_with_limits(tmp_path):
+    db_path = os.path.join(str(tmp_path), "memory.db")
+    limits = MemoryLimits(max_entries_per_session=5)
+    writer = MemoryBank(backend=SQLiteBackend(db_path), limits=limits, refresh_interval=None)
+    reader = MemoryBank(backend=SQLiteBackend(db_path), limits=limits, refresh_interval=None)
+    try:
+        writer.store("s1", "k", "v")
+        assert reader.get("s1", "k") == "v"
+        
+        for i in range(10):
+            writer.store("s1", f"extra{i}", i)
+            assert reader.get("s1", f"extra{i}") == i
+        assert len(reader._session_policies["s1"]) <= limits.max_entries_per_session
+    finally:
+        writer.close()
+        reader.close()
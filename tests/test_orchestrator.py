@@ -0,0 +1,61 @@
+"""
+Orchestrator tests
+Parallel execution, timeouts and workers held by timed-out agents
+"""
+import threading
+import time
+from typing import Optional
+from agents.base_agent import AgentContext, AgentMessage, BaseAgent
+from agents.orchestrator import MultiAgentOrchestrator
+from agents.session_manager import InMemorySessionService
+
+
+class SleepyAgent(BaseAgent):
+    """Agent that sleeps, or blocks until released; records when it ran"""
+    
+    def __init__(self, agent_id: str, delay: float = 0.0, release: Optional[threading.Event] = None):
+        super().__init__(agent_id=agent_id, agent_name=agent_id)
+        self.delay = delay
+        self.release = release
+        self.started: Optional[float] = None
+    
+    def process(self, message: AgentMessage, context: AgentContext) -> AgentMessage:
+        self.started = time.perf_counter()
+        if self.release is not None:
+            self.release.wait(10)
+        time.sleep(self.delay)
+        return AgentMessage(sender=self.agent_id, receiver=message.sender, content=self.agent_id)
+
+
+def _request():
+    return AgentMessage(sender="user", receiver="orchestrator", content="hello")
+
+
+def test_parallel_agents_overlap():
+    orchestrator = MultiAgentOrchestrator(InMemorySessionService(), max_workers=4)
+    agents = [SleepyAgent(f"agent{i}", delay=0.5) for i in range(4)]
+    orchestrator.register_agents(agents)
+    outputs = orchestrator.execute_parallel([f"agent{i}" for i in range(4)], _request(), AgentContext("s1"))
+    # Every agent started before the first one could have finished
+    starts = [agent.started for agent in agents]
+    assert max(starts) - min(starts) < 0.5
+    assert [output.content for output in outputs.values()] == [f"agent{i}" for i in range(4)]
+    orchestrator.close()
+
+
+def test_timed_out_agent_is_counted_until_its_worker_returns():
+    release = threading.Event()
+    orchestrator = MultiAgentOrchestrator(InMemorySessionService(), max_workers=2, agent_timeout=0.1)
+    orchestrator.register_agents([SleepyAgent("hung", release=release), SleepyAgent("quick")])
+    outputs = orchestrator.execute_parallel(["hung", "quick"], _request(), AgentContext("s1"))
+    assert outputs["hung"].metadata["timed_out"]
+    assert outputs["quick"].content == "quick"
+    assert orchestrator.get_pool_stats()["abandoned_workers"] == 1
+    assert orchestrator.get_pool_stats()["available_workers"] == 1
+    
+    release.set()
+    deadline = time.time() + 5
+    while orchestrator.abandoned_workers and time.time() < deadline:
+        time.sleep(0.01)
+    assert orchestrator.abandoned_workers == 0
+    orchestrator.close()
@@ -0,0 +1,60 @@
+"""
+Session manager tests
+Hibernation racing with session writes
+"""
+import time
+from agents.session_manager import InMemorySessionService
+
+
+def test_idle_hibernation_skips_a_session_touched_since(tmp_path):
+    service = InMemorySessionService(reap_interval=None, hibernate_dir=str(tmp_path), hibernate_after=60)
+    session_id = service.create_session("farmer")
+    shard = service.shard_for(session_id)
+    cutoff = time.monotonic()
+    
+    # Picked as idle at cutoff, then used before the hibernation pass retakes the lock
+    service.add_message(session_id, "user", "hello")
+    assert service._hibernate(shard, [session_id], idle_before=cutoff) == 0
+    service.add_message(session_id, "user", "still here")
+    assert [m["content"] for m in service.get_session(session_id)["conversation_history"]] == ["hello", "still here"]
+    service.close()
+
+
+def test_resident_limit_skips_a_session_no_longer_least_recent(tmp_path):
+    service = InMemorySessionService(reap_interval=None, hibernate_dir=str(tmp_path), max_resident=3, num_shards=1)
+    first, second = service.create_session("a"), service.create_session("b")
+    shard = service.shard_for(first)
+    
+    # first was the LRU victim but got touched before the pass retook the lock
+    service.get_session(first)
+    service._shard_resident = 1
+    assert service._hibernate(shard, [first], over_limit=True) == 0
+    assert service._hibernate(shard, [second], over_limit=True) == 1
+    assert first in shard.sessions and second not in shard.sessions
+    
+    # Back within the limit, so a stale victim list hibernates nothing more
+    assert service._hibernate(shard, [first], over_limit=True) == 0
+    service.close()
+
+
+def test_writes_are_not_lost_to_a_hibernation_after_lookup(tmp_path):
+    service = InMemorySessionService(reap_interval=None, hibernate_dir=str(tmp_path))
+    session_id = service.create_session("farmer")
+    lookup = service.get_session
+    
+    def lookup_then_hibernate(sid):
+        # The reaper parks the session right after any lookup hands it out
+        session = lookup(sid)
+        service.hibernate_session(sid)
+        return session
+    
+    service.get_session = lookup_then_hibernate
+    service.add_message(session_id, "user", "hello")
+    service.update_state(session_id, "crop", "Rice")
+    service.compact_context(session_id, keep_recent=5)
+    del service.get_session
+    
+    session = service.get_session(session_id)
+    assert [m["content"] for m in session["conversation_history"]] == ["hello"]
+    assert session["state"] == {"crop": "Rice"}
+    service.close()
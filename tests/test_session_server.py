@@ -0,0 +1,92 @@
+"""
+Session store server tests
+Auth handshake, bind checks and error replies over a real socket
+"""
+import os
+import socket
+import stat
+import pytest
+from agents.memory_backends import SQLiteBackend
+from agents.memory_bank import MemoryBank
+from agents.session_manager import InMemorySessionService
+from agents.session_server import RemoteSessionService, SessionStoreError, SessionStoreServer
+
+KEY = b"test-key"
+
+
+@pytest.fixture
+def server():
+    server = SessionStoreServer("tcp://127.0.0.1:0", InMemorySessionService(), auth_key=KEY)
+    server.start()
+    yield server
+    server.stop()
+
+
+def test_round_trip_with_auth_key(server):
+    client = RemoteSessionService(server.address, auth_key=KEY)
+    session_id = client.create_session("farmer", {"crop": "Rice"})
+    client.add_message(session_id, "user", "hello")
+    context = client.get_context(session_id)
+    assert context.state["crop"] == "Rice"
+    assert [m["content"] for m in context.conversation_history] == ["hello"]
+    client.close()
+
+
+@pytest.mark.parametrize("auth_key", [b"wrong-key", None])
+def test_client_without_the_key_is_rejected(server, auth_key):
+    client = RemoteSessionService(server.address, auth_key=auth_key)
+    with pytest.raises(ConnectionError):
+        client.get_session_stats()
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="needs Unix sockets")
+def test_keyless_unix_socket_is_private(tmp_path):
+    path = os.path.join(str(tmp_path), "sessions.sock")
+    server = SessionStoreServer(f"unix://{path}", InMemorySessionService())
+    server.start()
+    try:
+        assert stat.S_IMODE(os.stat(path).st_mode) & 0o077 == 0
+        with pytest.raises(ConnectionError):
+            RemoteSessionService(server.address, auth_key=KEY).get_session_stats()
+        assert RemoteSessionService(server.address).get_session_stats()["total_sessions"] == 0
+    finally:
+        server.stop()
+
+
+@pytest.mark.parametrize("address", ["tcp://127.0.0.1:0", "tcp://0.0.0.0:0"])
+def test_tcp_bind_requires_a_key(address):
+    with pytest.raises(ValueError):
+        SessionStoreServer(address, InMemorySessionService())
+
+
+def test_client_without_a_key_refuses_tcp():
+    with pytest.raises(ConnectionError, match="auth key"):
+        RemoteSessionService("tcp://127.0.0.1:9", timeout=1.0).get_session_stats()
+
+
+def test_unencodable_result_is_an_error_reply(server):
+    client = RemoteSessionService(server.address, auth_key=KEY)
+    session_id = client.create_session("farmer")
+    client.update_state(session_id, "crop", "Rice")
+    server.session_service.update_state(session_id, "callback", lambda: None)
+    with pytest.raises(SessionStoreError, match="Cannot encode"):
+        client.get_state(session_id, "callback")
+    assert client.get_state(session_id, "crop") == "Rice"
+    with pytest.raises(SessionStoreError, match="Unknown session store method"):
+        client._call("close")
+    client.close()
+
+
+def test_context_memory_comes_from_the_client_memory_bank(server, tmp_path):
+    memory_bank = MemoryBank(backend=SQLiteBackend(os.path.join(str(tmp_path), "memory.db")))
+    client = RemoteSessionService(server.address, auth_key=KEY, memory_bank=memory_bank)
+    session_id = client.create_session("farmer")
+    memory_bank.store(session_id, "soil", "clay")
+    context = client.get_context(session_id)
+    assert dict(context.memory) == {"soil": "clay"}
+    assert context.memory_bank is memory_bank
+    with client.pipeline() as pipeline:
+        pipeline.get_context(session_id)
+    assert dict(pipeline.results[0].memory) == {"soil": "clay"}
+    client.close()
+    memory_bank.close()